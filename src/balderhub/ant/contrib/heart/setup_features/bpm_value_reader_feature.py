@@ -30,8 +30,9 @@ class BpmValueReaderFeature(balderhub.heart.lib.scenario_features.BpmValueReader
         if self._channel_was_active_before is not None:
             raise ValueError('can not check if ANT is active because this call was not embedded within prepare/cleanup '
                              'calls')
-        new_msg = self.ant_controller.wait_for_new_broadcast_message(timeout=self.time_to_wait_for_new_msg_sec)
-        return new_msg.computed_heart_rate
+        # make sure that a new message was received, the last beat of the index is updated by it
+        self.ant_controller.wait_for_new_broadcast_message(timeout=self.time_to_wait_for_new_msg_sec)
+        return self.ant_controller.heart_beat_index.last_beat.computed_heart_rate
 
     def cleanup(self):
         if not self._channel_was_active_before:
@@ -1,9 +1,11 @@
 from typing import Union
 import time
 
+import numpy as np
+
 import balderhub.heart.lib.scenario_features
 from balderhub.ant.lib.scenario_features import AntplusControllerHrmFeature
-from balderhub.ant.lib.utils.pages.hrm import BaseHrmPage
+from balderhub.ant.lib.utils import HeartBeatEvent
 
 
 class RRValueReaderFeature(balderhub.heart.lib.scenario_features.RRValueReaderFeature):
@@ -35,44 +37,37 @@ class RRValueReaderFeature(balderhub.heart.lib.scenario_features.RRValueReaderFe
             raise ValueError('can not check if ANT is active because this call was not embedded within prepare/cleanup '
                              'calls')
 
-    def _msg_has_next_beat(self, msg: BaseHrmPage, msg_before: BaseHrmPage):
-        if msg.heart_beat_count == 0:
-            return msg_before.heart_beat_count == 255
-        return msg_before.heart_beat_count == (msg.heart_beat_count - 1)
-
-    def _calc_rr_value_for(self, msg: BaseHrmPage, msg_before: BaseHrmPage) -> float:
-        if not self._msg_has_next_beat(msg, msg_before):
-            raise ValueError('can not calculate RR value because previous message has not the expected heart '
-                             f'beat count of {msg_before.heart_beat_count} (current has {msg.heart_beat_count})')
-        cur_msg_event_time = msg.heart_beat_event_time
-        cur_msg_event_time += 0xFFFF if cur_msg_event_time < msg_before.heart_beat_event_time else 0
-
-        return (cur_msg_event_time - msg_before.heart_beat_event_time) / 1024
+    def _calc_rr_value_for(self, beat: HeartBeatEvent, beat_before: HeartBeatEvent) -> float:
+        if beat.beat_count != beat_before.beat_count + 1:
+            raise ValueError('can not calculate RR value because previous beat has not the expected heart '
+                             f'beat count of {beat_before.beat_count_raw} (current has {beat.beat_count_raw})')
+        return (beat.event_time - beat_before.event_time) / 1024
 
     def wait_for_next_rr_value_in_sec(self) -> Union[float, None]:
         self.__check_for_channel()
-        # first wait for first message
+        # first wait for first beat
         start_time = time.perf_counter()
         while time.perf_counter() - start_time < self.time_to_wait_for_new_msg_sec:
-            if len(self.ant_controller.received_broadcast_messages) > 0:
-                # one or more messages here -> break
+            if len(self.ant_controller.heart_beat_index) > 0:
+                # one or more beats here -> break
                 break
             time.sleep(self.time_to_wait_for_new_msg_sec / 100)
         else:
             return None
-        last_rcvd_msg = self.ant_controller.received_broadcast_messages[-1]
+        # use the total count, because old beats may be discarded by the retention policy of the controller
+        known_beat_count = self.ant_controller.heart_beat_index.total_count
 
         # now wait for the next one
         while time.perf_counter() - start_time < self.time_to_wait_for_new_msg_sec:
-            newest_msg = self.ant_controller.received_broadcast_messages[-1]
-            if newest_msg.heart_beat_count != last_rcvd_msg.heart_beat_count:
-                # one or more messages here -> break
-                if not self._msg_has_next_beat(newest_msg, last_rcvd_msg):
-                    raise ValueError(
-                        'detect unexpected heart beats for two messages - received new message with heart beat count '
-                        f'of {newest_msg.heart_beat_count} (msg before was {last_rcvd_msg.heart_beat_count})'
-                    )
-                return self._calc_rr_value_for(newest_msg, last_rcvd_msg)
+            beats = self.ant_controller.heart_beat_index
+            if beats.total_count > known_beat_count:
+                new_beat_idx = known_beat_count - beats.discarded_count
+                if new_beat_idx >= 1:
+                    return self._calc_rr_value_for(beats[new_beat_idx], beats[new_beat_idx - 1])
+                # the beat before is not retained anymore -> fall back to the last two retained beats
+                if len(beats) < 2:
+                    return None
+                return self._calc_rr_value_for(beats[-1], beats[-2])
             time.sleep(self.time_to_wait_for_new_msg_sec / 100)
         return None
 
@@ -81,27 +76,23 @@ class RRValueReaderFeature(balderhub.heart.lib.scenario_features.RRValueReaderFe
 
         start_time = time.perf_counter()
         while time.perf_counter() - start_time < self.time_to_wait_for_new_msg_sec:
-            if len(set(msg.heart_beat_count for msg in self.ant_controller.received_broadcast_messages)) > 1:
-                # more than one messages here -> break
-                break
+            beats = self.ant_controller.heart_beat_index
+            if len(beats) > 1:
+                # more than one beat here -> calculate the rr value between the last two of them
+                return self._calc_rr_value_for(beats[-1], beats[-2])
             time.sleep(self.time_to_wait_for_new_msg_sec / 100)
-        else:
-            return None
-
-        messages = self.ant_controller.received_broadcast_messages
-        last_msg = messages[-1]
-        heart_beat_count_before = (last_msg.heart_beat_count - 1) % 0x100
-
-        all_msgs = reversed(messages)
-        for msg in all_msgs:
-            if msg.heart_beat_count not in [heart_beat_count_before, last_msg.heart_beat_count]:
-                raise ValueError(f'detect message with unexpected heart beat count of {msg.heart_beat_count} '
-                                 f'(current message is {last_msg.heart_beat_count})')
-            if msg.heart_beat_count == heart_beat_count_before:
-                # get time of message with heart beat before
-                return self._calc_rr_value_for(last_msg, msg)
         return None
 
+    def read_all_rr_values_in_sec(self) -> np.ndarray:
+        """
+        This method returns all RR values that were received within the current session (beats lost by packet loss are
+        recovered if possible, see :class:`balderhub.ant.lib.utils.RRIntervalSeries`).
+
+        :return: an array with all RR values in seconds
+        """
+        self.__check_for_channel()
+        return self.ant_controller.get_rr_interval_series().rr_intervals_sec
+
     def cleanup(self):
         if not self._channel_was_active_before:
             self.ant_controller.close_channel()
@@ -1,12 +1,22 @@
 from __future__ import annotations
+from concurrent.futures import Future
+from datetime import datetime
 from typing import Union, OrderedDict, Callable, Generator
 import logging
+import pathlib
+import time
 
 import balder
 from balderhub.ant.lib.scenario_features.antplus_device_config import AntplusDeviceConfig
 from balderhub.ant.lib.scenario_features.base_antplus_device_profile import BaseAntplusDeviceProfile
-from balderhub.ant.lib.utils.page_message_collection import PageMessageCollection
-from balderhub.ant.lib.utils.pages import BaseAntplusPage
+from balderhub.ant.lib.utils.capture_file import CaptureHeader, RecordKind, WaitCall, pack_wait_payload
+from balderhub.ant.lib.utils.channel_event_log import AntChannelEvent
+from balderhub.ant.lib.utils.channel_session import AntplusChannelSession
+from balderhub.ant.lib.utils.clock_anchor import ClockAnchor
+from balderhub.ant.lib.utils.flight_recorder import FlightRecorder, FlightRecorderConfig
+from balderhub.ant.lib.utils.page_message_collection import PageMessageCollection, RetentionPolicy, \
+    RingPageMessageCollection
+from balderhub.ant.lib.utils.pages import BaseAntplusPage, BaseReceivedAntplusPage
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +40,10 @@ class AntplusControllerFeature(balder.Feature):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self._already_saved_broadcast_messages = PageMessageCollection()
-        self._already_saved_ack_messages = PageMessageCollection()
+        # will be created with the first channel session (the device config is required for that)
+        self._session: Union[AntplusChannelSession, None] = None
         self._already_saved_burst_messages = PageMessageCollection()
+        self._flight_recorder: Union[FlightRecorder, None] = None
 
     @property
     def validation_methods(self) -> OrderedDict[str, Callable[[], None]]:
@@ -84,19 +95,52 @@ class AntplusControllerFeature(balder.Feature):
         """
         raise NotImplementedError
 
+    @property
+    def retention_policy(self) -> Union[RetentionPolicy, None]:
+        """
+        :return: returns the policy that defines which of the received messages are retained within
+                 :meth:`AntplusControllerFeature.received_broadcast_messages` and
+                 :meth:`AntplusControllerFeature.received_ack_messages` or None if all messages of a channel session
+                 should be retained
+        """
+        return None
+
+    @property
+    def flight_recorder_config(self) -> Union[FlightRecorderConfig, None]:
+        """
+        :return: returns the configuration of the flight recorder, that keeps the last received messages, channel
+                 events, sent messages and wait calls of all channel sessions (see
+                 :meth:`AntplusControllerFeature.dump_flight_recorder`), or None if no flight recorder should be used
+        """
+        return FlightRecorderConfig()
+
     @property
     def received_broadcast_messages(self) -> PageMessageCollection:
         """
         :return: returns the current available BROADCAST messages that has been received since the channel is active
+                 (only the retained ones, if a :meth:`AntplusControllerFeature.retention_policy` is defined)
         """
-        return self._already_saved_broadcast_messages
+        return self.session.broadcast_messages
 
     @property
     def received_ack_messages(self) -> PageMessageCollection:
         """
         :return: returns the current available ACK messages that has been received since the channel is active
         """
-        return self._already_saved_ack_messages
+        return self.session.ack_messages
+
+    @property
+    def session(self) -> AntplusChannelSession:
+        """
+        :return: returns the current channel session, that holds all received messages, channel events and the
+                 statistics derived from them (f.e. the gap index or the link quality monitor) - implementations make
+                 sure that all available messages are processed before returning it (callbacks that are registered
+                 within the session are taken over by the following sessions) - an empty session is created if no
+                 channel was opened yet
+        """
+        if self._session is None:
+            self._reset_received_messages()
+        return self._session
 
     # TODO not supported yet
     #@property
@@ -115,17 +159,65 @@ class AntplusControllerFeature(balder.Feature):
         """
         raise NotImplementedError()
 
+    def observe_channel(self, duration_sec: float) -> None:
+        """
+        This method waits for the given time while the open channel keeps receiving messages. Scenarios should use this
+        method for observing a channel session (instead of sleeping themselves), so that setup implementations, that do
+        not depend on the real time (f.e. a replay of a recorded session), can skip the waiting.
+
+        :param duration_sec: the time in seconds the channel should be observed
+        """
+        start_time = self.get_current_timestamp()
+        self._sleep(duration_sec)
+        self._record_wait_call(WaitCall.OBSERVE_CHANNEL, start_time, self.get_current_timestamp())
+
+    def get_current_timestamp(self) -> float:
+        """
+        This method returns the current time of the clock the controller works with. Features, that wait for or
+        correlate the received messages, should use this clock (together with :meth:`AntplusControllerFeature._sleep`)
+        instead of ``time.perf_counter()``, so that they also work with setup implementations that do not depend on the
+        real time (f.e. a replay of a recorded session).
+
+        :return: the current monotonic timestamp (in the same time base as the timestamps of the received messages)
+        """
+        return time.perf_counter()
+
+    def _sleep(self, duration_sec: float) -> None:
+        """
+        Waits for the given time on the clock of the controller (see
+        :meth:`AntplusControllerFeature.get_current_timestamp`) without recording the wait call.
+
+        :param duration_sec: the time in seconds to wait
+        """
+        if duration_sec > 0:
+            time.sleep(duration_sec)
+
     def send_broadcast_message(self, message: BaseAntplusPage) -> None:
         """
-        This method sends a given message as BROADCAST message within the open channel
+        This method sends a given message as BROADCAST message within the open channel. The message is queued (one
+        outgoing message is released per channel period) and dropped if the same payload is still queued.
+
         :param message: the message that should be sent
         """
         raise NotImplementedError()
 
-    def send_ack_message(self, message: BaseAntplusPage) -> None:
+    def send_ack_message(
+            self,
+            message: BaseAntplusPage,
+            max_retries: Union[int, None] = None,
+            retry_backoff_sec: Union[float, None] = None
+    ) -> Future:
         """
-        This method sends a given message as ACK message within the open channel
+        This method sends a given message as ACK message within the open channel. It does not wait for the transfer to
+        be completed, but returns a future that resolves with an :class:`AckTransferResult` as soon as the remote device
+        acknowledged the message. If the transfer still fails after all retries, the future raises an
+        :class:`AckTransferFailedError`.
+
         :param message: the message that should be sent
+        :param max_retries: the number of retries for a failed transfer (defaults to the
+                            :class:`AckTransferQueue` of the channel)
+        :param retry_backoff_sec: the time to wait before the first retry (defaults to one channel period)
+        :return: the future of the transfer
         """
         raise NotImplementedError()
 
@@ -163,6 +255,160 @@ class AntplusControllerFeature(balder.Feature):
         """
         raise NotImplementedError()
 
+    def _reset_received_messages(self, clock_anchor: Union[ClockAnchor, None] = None) -> None:
+        """
+        Starts a new channel session and resets all received messages and all data that is derived from them. The
+        BROADCAST message callbacks of the previous session are taken over. Implementations call this method whenever a
+        new channel session starts.
+
+        :param clock_anchor: the clock anchor of the new session (anchored now if None)
+        """
+        self._session = AntplusChannelSession(
+            channel_period_sec=self.channel_period / 32768,
+            retention_policy=self.retention_policy,
+            clock_anchor=clock_anchor,
+            broadcast_message_callbacks=None if self._session is None else self._session.broadcast_message_callbacks
+        )
+        self._already_saved_burst_messages = PageMessageCollection()
+
+    def _prepare_flight_recorder(self) -> None:
+        """
+        Preallocates the flight recorder (if it is enabled). Implementations call this method before the first channel
+        session starts.
+        """
+        config = self.flight_recorder_config
+        if self._flight_recorder is None and config is not None:
+            self._flight_recorder = FlightRecorder(window_sec=config.window_sec, capacity=config.capacity)
+
+    def _record_in_flight_recorder(
+            self,
+            timestamp: float,
+            kind: RecordKind,
+            payload: bytes,
+            extended_data: bytes = b'',
+            channel: int = 0
+    ) -> None:
+        """
+        Records a new entry within the flight recorder (if it is enabled). Implementations call this method for every
+        received message, channel event and sent message.
+
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp of the entry
+        :param kind: the kind of the entry
+        :param payload: the 8 payload bytes
+        :param extended_data: the raw extended data
+        :param channel: the number of the channel
+        """
+        flight_recorder = self._flight_recorder
+        if flight_recorder is not None:
+            flight_recorder.record(timestamp, kind, channel, payload, extended_data)
+
+    def _record_wait_call(self, call: WaitCall, start_timestamp: float, end_timestamp: float,
+                          timed_out: bool = False) -> None:
+        """
+        Records a finished wait call within the flight recorder (if it is enabled).
+
+        :param call: the wait method that was called
+        :param start_timestamp: the monotonic ``time.perf_counter()`` timestamp the call has started
+        :param end_timestamp: the monotonic ``time.perf_counter()`` timestamp the call has finished
+        :param timed_out: True if the call ended with a timeout
+        """
+        flight_recorder = self._flight_recorder
+        if flight_recorder is not None:
+            flight_recorder.record(start_timestamp, RecordKind.WAIT, 0,
+                                   pack_wait_payload(call, end_timestamp - start_timestamp, timed_out))
+
+    def _create_capture_header(self) -> CaptureHeader:
+        """
+        :return: a new capture header, that describes the current channel session
+        """
+        raise NotImplementedError
+
+    def dump_flight_recorder(self, name: str) -> Union[pathlib.Path, None]:
+        """
+        Writes the content of the flight recorder into a new capture file within the directory of the
+        :meth:`AntplusControllerFeature.flight_recorder_config`.
+
+        :param name: the name that identifies the dump (f.e. the name of the failed test)
+        :return: the path of the new capture file or None if there is no flight recorder
+        """
+        config = self.flight_recorder_config
+        if self._flight_recorder is None or config is None:
+            return None
+        directory = pathlib.Path(config.directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{datetime.now():%Y%m%d-%H%M%S}-dev{self.AntPlusDevice.config.device_num}-{name}.bhcap"
+        record_count = self._flight_recorder.dump(path, self._create_capture_header())
+        logger.info(f'dumped {record_count} records of the flight recorder to `{path}`')
+        return path
+
+    def _save_received_broadcast_message(self, message: BaseReceivedAntplusPage) -> None:
+        """
+        Saves a new received BROADCAST message. Implementations need to provide the messages in the order they were
+        received.
+
+        :param message: the received message
+        """
+        page_idx = self._session.add_broadcast_message(message)
+        self._on_new_broadcast_message(message, page_idx)
+        self._session.dispatch_broadcast_message(message)
+        if isinstance(self._session.broadcast_messages, RingPageMessageCollection):
+            self._apply_retention(self._session.broadcast_messages)
+
+    def _apply_retention(self, messages: RingPageMessageCollection) -> None:
+        """
+        Discards the details of all data, that is derived from BROADCAST messages that are not retained anymore. The
+        aggregated values (f.e. counters) keep considering them. This method is executed for every new BROADCAST
+        message if a :meth:`AntplusControllerFeature.retention_policy` is defined.
+
+        :param messages: the collection of the retained BROADCAST messages
+        """
+        self._session.discard_before(messages.evicted_count)
+
+    def _save_received_ack_message(self, message: BaseReceivedAntplusPage) -> None:
+        """
+        Saves a new received ACK message. Implementations need to provide the messages in the order they were received.
+
+        :param message: the received message
+        """
+        page_idx = self._session.add_ack_message(message)
+        self._on_new_ack_message(message, page_idx)
+
+    def _save_channel_event(self, event: AntChannelEvent, timestamp: float) -> None:
+        """
+        Saves a new received channel event. Implementations need to provide the events in the order they were received.
+
+        :param event: the received event code
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp the event was received at
+        """
+        self._session.add_channel_event(event, timestamp)
+        self._on_new_channel_event(event, timestamp)
+
+    def _on_new_broadcast_message(self, message: BaseReceivedAntplusPage, page_idx: int) -> None:
+        """
+        Callback that is executed for every new BROADCAST message after it was saved. It can be overwritten to maintain
+        data that is derived from the received messages incrementally.
+
+        :param message: the new message
+        :param page_idx: the index of the message within all BROADCAST messages of the session
+        """
+
+    def _on_new_ack_message(self, message: BaseReceivedAntplusPage, page_idx: int) -> None:
+        """
+        Callback that is executed for every new ACK message after it was saved. It can be overwritten to maintain data
+        that is derived from the received messages incrementally.
+
+        :param message: the new message
+        :param page_idx: the index of the message within all ACK messages of the session
+        """
+
+    def _on_new_channel_event(self, event: AntChannelEvent, timestamp: float) -> None:
+        """
+        Callback that is executed for every new channel event after it was saved.
+
+        :param event: the new event code
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp the event was received at
+        """
+
     def get_profile_consistency_validation_report(self) -> OrderedDict[str, Union[str, None]]:
         """
         This method is used to execute a set of validation_functions that makes sure that check that can be applied
@@ -1,7 +1,7 @@
 from __future__ import annotations
 import logging
 
-from typing import Union, OrderedDict, Callable
+from typing import Union, OrderedDict, Callable, Iterable
 
 try:
     # Python 3.10+
@@ -15,7 +15,15 @@ from balderhub.ant.lib.utils import pages
 from .antplus_hrm_device_config import AntplusHrmDeviceConfig
 from .heart_rate_monitor_device_profile import HeartRateMonitorDeviceProfile
 from .antplus_controller_feature import AntplusControllerFeature
-from ..utils.support import filter_hrm_messages_by_toggle_bit_change
+from ..utils.ack_transfer import AckTransferResult
+from ..utils.clock_anchor import ClockAnchor
+from ..utils.heart_beat_index import HeartBeatIndex
+from ..utils.hrv import RRIntervalSeries
+from ..utils.page_message_collection import PageMessageCollection, RingPageMessageCollection
+from ..utils.page_request_sweep import PageRequest, PageRequestResult
+from ..utils.request_latency import RequestLatencyTracker
+from ..utils.transmission_pattern import HrmTransmissionPattern, HrmTransmissionPatternAlignment, \
+    HrmTransmissionPhaseEstimator
 
 HrmPagesType: TypeAlias = Union[
     pages.hrm.Hrm0DefaultDataPage,
@@ -47,6 +55,16 @@ class AntplusControllerHrmFeature(AntplusControllerFeature):
         config = AntplusHrmDeviceConfig()
         profile = HeartRateMonitorDeviceProfile()
 
+    def __init__(self, **kwargs):
+        # will be created as soon as the first message arrives (the device config is required for that)
+        self._phase_estimator: Union[HrmTransmissionPhaseEstimator, None] = None
+        self._heart_beat_index = HeartBeatIndex()
+        self._request_latency_tracker = RequestLatencyTracker()
+        # the first message is always counted as toggle bit change (see `filter_hrm_messages_by_toggle_bit_change`)
+        self._last_toggle_bit: Union[int, None] = None
+        self._toggle_bit_change_page_counts: dict[type[HrmPagesType], int] = {}
+        super().__init__(**kwargs)
+
     @property
     def channel_type(self) -> int:  # TODO maybe use own enums
         return 0x00  # Slave
@@ -71,16 +89,73 @@ class AntplusControllerHrmFeature(AntplusControllerFeature):
     def channel_is_active(self) -> bool:
         raise NotImplementedError
 
+    def get_page_for_no(self, page_no: int) -> type[pages.BaseReceivedAntplusPage]:
+        """
+        This method returns the page type object for the given page number. It raises a KeyError in case that
+        there is no page specified for the given page-number.
+
+        :param page_no: the page number the page type should be returned
+        :return: the page type that describes the given page number
+        """
+        all_hrm_pages = self.AntPlusDevice.profile.get_existing_pages_for_profile()
+        if page_no not in all_hrm_pages:
+            raise KeyError(f'unable to find page #{page_no}')
+        return all_hrm_pages[page_no]
+
+    def _get_page_from_raw_data(self, raw_data: bytes) -> type[pages.BaseReceivedAntplusPage]:
+        page_no = raw_data[0] & ~(1 << 7)  # on HRM profile -> first bit is toggle bit
+        return self.get_page_for_no(page_no)
+
+    def _reset_received_messages(self, clock_anchor: Union[ClockAnchor, None] = None) -> None:
+        super()._reset_received_messages(clock_anchor=clock_anchor)
+        self._phase_estimator = None
+        self._heart_beat_index = HeartBeatIndex()
+        self._request_latency_tracker = RequestLatencyTracker()
+        self._last_toggle_bit = None
+        self._toggle_bit_change_page_counts = {}
+
+    def _get_phase_estimator(self) -> HrmTransmissionPhaseEstimator:
+        if self._phase_estimator is None:
+            self._phase_estimator = HrmTransmissionPhaseEstimator(
+                pattern=self.get_transmission_pattern(),
+                channel_period_sec=self.channel_period / 32768
+            )
+        return self._phase_estimator
+
+    def _on_new_broadcast_message(self, message: HrmPagesType, page_idx: int) -> None:
+        super()._on_new_broadcast_message(message, page_idx)
+        timestamp = message.monotonic_timestamp
+        self._get_phase_estimator().update(message.__class__, timestamp)
+        self._heart_beat_index.update(message, page_idx=page_idx, timestamp=timestamp)
+        if message.raw_data[0] & 0x80 != self._last_toggle_bit:
+            self._last_toggle_bit = message.raw_data[0] & 0x80
+            self._toggle_bit_change_page_counts[message.__class__] = \
+                self._toggle_bit_change_page_counts.get(message.__class__, 0) + 1
+
+    def _apply_retention(self, messages: RingPageMessageCollection) -> None:
+        super()._apply_retention(messages)
+        self._heart_beat_index.discard_before(messages.evicted_count)
+
     def _get_msg_type_count(self, consider_only_toggle_bit_change_msgs: bool = False) -> dict[type[HrmPagesType], int]:
-        relevant_messages = self.received_broadcast_messages
+        # the counters are maintained incrementally, so that they also consider messages that are not retained anymore
         if consider_only_toggle_bit_change_msgs:
-            relevant_messages = filter_hrm_messages_by_toggle_bit_change(relevant_messages)
-
-        types_of_messages = [msg.__class__ for msg in relevant_messages]
-        type_count = {type: types_of_messages.count(type) for type in set(types_of_messages)}
+            type_count = self.toggle_bit_change_page_counts
+        else:
+            type_count = self.session.broadcast_page_counts
         self._validate_page_distribution()
         return type_count
 
+    @property
+    def toggle_bit_change_page_counts(self) -> dict[type[HrmPagesType], int]:
+        """
+        :return: returns the number of BROADCAST messages per page type that were received with a changed toggle bit
+                 (see :func:`filter_hrm_messages_by_toggle_bit_change`) since the channel is active (including the
+                 messages that are not retained anymore)
+        """
+        # make sure that all available messages are processed
+        _ = self.received_broadcast_messages
+        return self._toggle_bit_change_page_counts.copy()
+
     def _get_msg_type_count_for_continues_sequences(self):
         """returns the count of continuous sequences received the same type"""
         result = {}
@@ -140,6 +215,244 @@ class AntplusControllerHrmFeature(AntplusControllerFeature):
 
         return list(relevant_continues_sequence_counts.keys())
 
+    def get_transmission_pattern(self) -> HrmTransmissionPattern:
+        """
+        :return: returns the transmission pattern the device is expected to send (according to its
+                 :class:`AntplusHrmDeviceConfig`) - the rotation order of its background pages is the order of
+                 :meth:`AntplusHrmDeviceConfig.expected_background_pages`
+        """
+        return HrmTransmissionPattern.from_device_config(self.AntPlusDevice.config)
+
+    def align_received_messages_to_transmission_pattern(self) -> HrmTransmissionPatternAlignment:
+        """
+        This method aligns all received BROADCAST messages against the expected transmission pattern (see
+        :meth:`AntplusControllerHrmFeature.get_transmission_pattern`).
+
+        The slot of every message is determined by the gap index of the received messages (see
+        :meth:`AntplusChannelSession.create_gap_index_for`), so that every missing message is reported exactly. The
+        rotation order of the background pages is derived from the received messages (see
+        :meth:`HrmTransmissionPattern.with_observed_rotation`), because the device configuration only defines the set
+        of the background pages.
+
+        :return: the alignment result that holds the phase, all deviations and all missing slots
+        """
+        messages = self.received_broadcast_messages
+        page_types = [msg.__class__ for msg in messages]
+        slot_offsets = self.session.create_gap_index_for(messages).get_slot_offsets().tolist()
+        pattern = self.get_transmission_pattern().with_observed_rotation(page_types, slot_offsets=slot_offsets)
+        return pattern.align(page_types, slot_offsets=slot_offsets)
+
+    @property
+    def heart_beat_index(self) -> HeartBeatIndex:
+        """
+        :return: returns the index that holds one entry per unique heart beat that was received within the BROADCAST
+                 messages of the current session (page indices refer to
+                 :meth:`AntplusControllerHrmFeature.received_broadcast_messages`, timestamps are monotonic
+                 ``time.perf_counter()`` seconds)
+        """
+        # make sure that all available messages are processed
+        _ = self.received_broadcast_messages
+        return self._heart_beat_index
+
+    def get_rr_interval_series(self) -> RRIntervalSeries:
+        """
+        This method calculates the RR intervals (and with that the HRV metrics) of all received BROADCAST messages of
+        the current session.
+
+        :return: the RR interval series of the current session
+        """
+        return RRIntervalSeries.from_messages(self.received_broadcast_messages)
+
+    @property
+    def transmission_phase_estimator(self) -> HrmTransmissionPhaseEstimator:
+        """
+        :return: returns the estimator that follows the transmission pattern of the device (uses the monotonic
+                 ``time.perf_counter()`` as time base)
+        """
+        # make sure that all available messages are processed
+        _ = self.received_broadcast_messages
+        return self._get_phase_estimator()
+
+    def wait_for_background_free_window(self, duration_sec: float, timeout: float = 20) -> None:
+        """
+        This method returns as soon as the device is expected to send only main pages for at least ``duration_sec``
+        seconds. It uses the transmission phase, that was observed so far, to predict the next background burst. If the
+        current window is long enough, it returns immediately, otherwise it waits till the upcoming burst is over.
+
+        If no background burst was observed yet, it waits for the next background page and the following main page.
+
+        :param duration_sec: the time in seconds the window without background pages is required for
+        :param timeout: the maximum time in seconds to wait for a background page (only if no phase is known yet)
+        """
+        estimator = self.transmission_phase_estimator
+        pattern = estimator.pattern
+        # consider one channel period as safety margin on each side of the window
+        margin_sec = estimator.channel_period_sec
+        max_window_sec = pattern.MAIN_PAGES_PER_BLOCK * estimator.channel_period_sec - 2 * margin_sec
+        if duration_sec > max_window_sec:
+            raise ValueError(f'a window of {duration_sec:.2f} seconds without background pages is not possible (max '
+                             f'{max_window_sec:.2f} seconds)')
+
+        if not estimator.is_synchronized:
+            logger.info('transmission phase is unknown - wait for next background page to synchronize')
+            self.wait_for_new_broadcast_message(of_page_type=list(pattern.background_pages), timeout=timeout)
+            self.wait_for_new_broadcast_message(of_page_type=pattern.main_page)
+            return
+
+        now = self.get_current_timestamp()
+        window_start, window_end = estimator.get_background_free_window(now)
+        if window_start > now:
+            # a burst is running at the moment
+            window_start += margin_sec
+        if window_end - max(window_start, now) - margin_sec < duration_sec:
+            # window is too short -> use the window after the upcoming burst
+            upcoming_burst_end, _ = estimator.get_background_free_window(window_end)
+            window_start = upcoming_burst_end + margin_sec
+        time_to_wait = window_start - now
+        if time_to_wait > 0:
+            logger.debug(f'wait {time_to_wait:.2f} seconds for the next window without background pages')
+            self._sleep(time_to_wait)
+
+    @property
+    def request_latency_tracker(self) -> RequestLatencyTracker:
+        """
+        :return: returns the tracker that holds the response latencies of all page requests of the current session (see
+                 :meth:`AntplusControllerHrmFeature.run_page_request_sweep`)
+        """
+        return self._request_latency_tracker
+
+    @property
+    def requestable_pages(self) -> list[type[HrmPagesType]]:
+        """
+        :return: returns all pages that can be requested with a Common70 page request (see
+                 :meth:`AntplusControllerHrmFeature.run_page_request_sweep`) - the device is expected to only answer the
+                 requests for the pages within :meth:`AntplusHrmDeviceConfig.manual_request_possible_for`
+        """
+        return [
+            pages.hrm.Hrm1CumulativeOperationTimePage,
+            pages.hrm.Hrm2ManufacturerInformationPage,
+            pages.hrm.Hrm3ProductInformationPage,
+            pages.hrm.Hrm6CapabilitiesPage,
+            pages.hrm.Hrm7BatteryStatusPage,
+            pages.hrm.Hrm9DeviceInformationPage,
+        ]
+
+    def _send_page_request(
+            self,
+            request: PageRequest,
+            ack_transfer_timeout: float
+    ) -> tuple[float, Union[AckTransferResult, BaseException, None]]:
+        """
+        Sends the request page of a page request.
+
+        :param request: the request that should be sent
+        :param ack_transfer_timeout: the maximum time in seconds to wait for the completion of an ACK request
+        :return: a tuple with the timestamp the response window starts at (for ACK requests the time the transfer was
+                 completed) and the result (or the error) of the ACK transfer
+        """
+        request_page = request.create_request_page()
+        sent_timestamp = self.get_current_timestamp()
+        if not request.as_ack:
+            self.send_broadcast_message(request_page)
+            return sent_timestamp, None
+        try:
+            transfer = self.send_ack_message(request_page).result(timeout=ack_transfer_timeout)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.warning(f'failed to send request for {request.page_type.__name__}: {exc!r}')
+            return sent_timestamp, exc
+        return transfer.completed_timestamp, transfer
+
+    def _get_page_responses_since(self, request: PageRequest, timestamp: float) -> PageMessageCollection:
+        source = self.received_ack_messages if request.as_ack else self.received_broadcast_messages
+        return source.filter_for_timestamp(start=timestamp).filter_by_type(request.page_type)
+
+    def _wait_for_page_responses(self, request: PageRequest, sent_timestamp: float, window_sec: float,
+                                 response_margin_sec: float) -> float:
+        """
+        Waits till the response window of a request is closed.
+
+        :return: the timestamp the response window ended at
+        """
+        channel_period_sec = self.channel_period / 32768
+        deadline = sent_timestamp + window_sec
+        now = self.get_current_timestamp()
+        while now < deadline:
+            responses = self._get_page_responses_since(request, sent_timestamp)
+            if len(responses) >= request.expected_response_count:
+                deadline = min(deadline, responses[-1].monotonic_timestamp + response_margin_sec)
+            self._sleep(min(channel_period_sec, deadline - now))
+            now = self.get_current_timestamp()
+        return deadline
+
+    def _drain_page_responses(self, request: PageRequest, window_end_timestamp: float, guard_interval_sec: float):
+        """
+        Waits till no further response of a request was received for the guard interval, so that late responses are
+        not correlated to the following request (the guard is extended by every late response, but at most to ten
+        guard intervals).
+        """
+        guard_end = window_end_timestamp + guard_interval_sec
+        max_guard_end = window_end_timestamp + 10 * guard_interval_sec
+        now = self.get_current_timestamp()
+        while now < guard_end:
+            self._sleep(guard_end - now)
+            late_responses = self._get_page_responses_since(request, window_end_timestamp)
+            if len(late_responses) > 0:
+                logger.warning(f'received {len(late_responses)} late responses for request of '
+                               f'{request.page_type.__name__} after its response window')
+                guard_end = min(max_guard_end, late_responses[-1].monotonic_timestamp + guard_interval_sec)
+            now = self.get_current_timestamp()
+
+    def run_page_request_sweep(
+            self,
+            requests: Iterable[PageRequest],
+            response_margin_sec: float = 1.,
+            avoid_background_pages: bool = True,
+            ack_transfer_timeout: float = 5,
+            guard_interval_sec: Union[float, None] = None
+    ) -> list[PageRequestResult]:
+        """
+        This method sends all given Common70 page requests back to back within the current channel session and
+        correlates the received messages to them.
+
+        Every request gets its own response window, that starts with sending the request and ends
+        ``response_margin_sec`` after all expected responses were received (or at the latest after the time the device
+        needs for all responses plus the margin). The next request is sent after a guard interval, that only ends if no
+        further response of the previous request was received within it, so that every response is correlated to
+        exactly one request by its page id and the window it was received in. The response latency of every request is
+        recorded within the :meth:`AntplusControllerHrmFeature.request_latency_tracker`.
+
+        :param requests: the requests that should be sent (in this order)
+        :param response_margin_sec: the additional time in seconds every response window is kept open (messages
+                                    within this time show how the device continues after answering the request)
+        :param avoid_background_pages: True if every request should be sent within a window without background pages
+                                       (see :meth:`AntplusControllerHrmFeature.wait_for_background_free_window`), if
+                                       the response window fits into it
+        :param ack_transfer_timeout: the maximum time in seconds to wait for the completion of an ACK request
+        :param guard_interval_sec: the minimal time in seconds between the end of a response window and the next
+                                   request (defaults to two channel periods)
+        :return: a list with one result per request (in the order of the requests)
+        """
+        channel_period_sec = self.channel_period / 32768
+        if guard_interval_sec is None:
+            guard_interval_sec = 2 * channel_period_sec
+        max_background_free_window_sec = \
+            (self.get_transmission_pattern().MAIN_PAGES_PER_BLOCK - 2) * channel_period_sec
+        results = []
+        for request in requests:
+            window_sec = (request.expected_response_count + 1) * channel_period_sec + response_margin_sec
+            if avoid_background_pages and window_sec <= max_background_free_window_sec:
+                self.wait_for_background_free_window(duration_sec=window_sec)
+
+            sent_timestamp, transfer = self._send_page_request(request, ack_transfer_timeout)
+            window_end_timestamp = self._wait_for_page_responses(request, sent_timestamp, window_sec,
+                                                                 response_margin_sec)
+            result = PageRequestResult(request, sent_timestamp, window_end_timestamp, self.session, transfer=transfer)
+            if result.transfer_error is None:
+                self._request_latency_tracker.update(result)
+            results.append(result)
+            self._drain_page_responses(request, window_end_timestamp, guard_interval_sec)
+        return results
+
     # =============================================== VALIDATION METHODS ===============================================
 
     @property
@@ -80,7 +80,9 @@ class AntplusHrmDeviceConfig(AntplusDeviceConfig):
             self
     ) -> list[type[pages.hrm.BaseHrmPage]]:
         """
-        :return: returns a list of all pages that are expected to be a BACKGROUND page
+        :return: returns a list of all pages that are expected to be a BACKGROUND page (the order is used as rotation
+                 order by :meth:`AntplusControllerHrmFeature.get_transmission_pattern`, but the received rotation
+                 order is derived from the received messages before they are aligned)
         """
         return [
             pages.hrm.Hrm2ManufacturerInformationPage,
@@ -22,6 +22,13 @@ class AntplusTestCriteriaConfig(balder.Feature):
         """
         return [1, 5]
 
+    @property
+    def max_request_response_latency_sec(self) -> float:
+        """
+        :return: the maximum time in seconds between sending a page request and receiving the first response
+        """
+        return 1.
+
     @property
     def allowed_packet_loss_percent(self) -> float:
         """value between 0 and 1 that defines the accepted package loss during transmission"""
@@ -34,3 +41,25 @@ class AntplusTestCriteriaConfig(balder.Feature):
                  consecutive beat counts, ... are validated
         """
         return 0
+
+    @property
+    def min_rssi_dbm(self) -> float:
+        """
+        :return: the minimal RSSI value in dBm the 10th percentile of the received pages needs to be above (only
+                 validated if the controller provides RSSI values)
+        """
+        return -90.
+
+    @property
+    def soak_duration_sec(self) -> float:
+        """
+        :return: the time in seconds the channel is kept open within :class:`ScenarioHrmSoak`
+        """
+        return 4 * 60 * 60.
+
+    @property
+    def soak_summary_interval_sec(self) -> float:
+        """
+        :return: the interval in seconds a summary of all validators is logged within :class:`ScenarioHrmSoak`
+        """
+        return 5 * 60.
@@ -1,7 +1,9 @@
 from .openant_manager_feature import OpenantManagerFeature
 from .openant_plus_controller_hrm_feature import OpenantPlusControllerHrmFeature
+from .replay_antplus_controller_hrm_feature import ReplayAntplusControllerHrmFeature
 
 __all__ = [
     'OpenantManagerFeature',
-    'OpenantPlusControllerHrmFeature'
+    'OpenantPlusControllerHrmFeature',
+    'ReplayAntplusControllerHrmFeature'
 ]
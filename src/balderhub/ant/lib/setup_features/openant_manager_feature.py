@@ -1,13 +1,54 @@
 import logging
 import threading
-from typing import Union
+from typing import Union, Callable
 
 from openant.easy.node import Node
 
 from ..scenario_features.ant_node_manager_feature import AntNodeManagerFeature
+from ..utils.channel_event_log import AntChannelEvent
+from ..utils.metrics import Counter, MetricsRegistry, MetricsServer
 
 logger = logging.getLogger(__name__)
 
+_CHANNEL_EVENT_CODES = frozenset(int(event) for event in AntChannelEvent)
+
+
+class _ChannelEventNode(Node):
+    """
+    ``openant.easy.node.Node`` that forwards all channel events to a callback before they are processed by openant.
+
+    Events that are consumed by the callback are not queued within the event deque of openant, because that deque is
+    only drained by the ``wait_for_event()`` methods of openant (which are bypassed for these channels, f.e. the ACK
+    transfers are sent directly) and would grow for the whole lifetime of the node otherwise.
+    """
+
+    def __init__(self, on_channel_event: Callable[[int, int, bytes], bool]):
+        # needs to be set before the node starts its worker thread
+        self._on_channel_event = on_channel_event
+        super().__init__()
+
+    def _worker_event(self, channel, event, data):
+        if event in _CHANNEL_EVENT_CODES:
+            consumed = self._on_channel_event(channel, event, data)
+            # TX events are dispatched as data by openant
+            if consumed and event != AntChannelEvent.TX:
+                return
+        super()._worker_event(channel, event, data)
+
+    def discard_events_of_channel(self, channel_no: int) -> int:
+        """
+        Removes all events of the given channel from the event deque of openant.
+
+        :param channel_no: the number of the channel
+        :return: the number of removed events
+        """
+        with self._event_cond:
+            remaining = [cur_event for cur_event in self._events if cur_event[0] != channel_no]
+            removed_count = len(self._events) - len(remaining)
+            self._events.clear()
+            self._events.extend(remaining)
+        return removed_count
+
 
 class OpenantManagerFeature(AntNodeManagerFeature):
     """
@@ -19,6 +60,32 @@ class OpenantManagerFeature(AntNodeManagerFeature):
         super().__init__(**kwargs)
         self._thread = None
         self._node = None
+        self._channel_event_callbacks: dict[int, Callable[[AntChannelEvent], None]] = {}
+        self._metrics = MetricsRegistry()
+        self._metrics_server: Union[MetricsServer, None] = None
+        self._channel_event_counters: dict[tuple[int, AntChannelEvent], Counter] = {}
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """
+        :return: returns the registry that holds the metrics of the manager and of all controllers that use it
+        """
+        return self._metrics
+
+    @property
+    def metrics_port(self) -> Union[int, None]:
+        """
+        :return: returns the local port the metrics should be provided on in the Prometheus text format (see
+                 :class:`MetricsServer` - 0 selects a free port) or None if they should not be provided
+        """
+        return None
+
+    @property
+    def metrics_server(self) -> Union[MetricsServer, None]:
+        """
+        :return: returns the server that provides the metrics or None if it is not running
+        """
+        return self._metrics_server
 
     @property
     def node(self) -> Union[Node, None]:
@@ -29,6 +96,42 @@ class OpenantManagerFeature(AntNodeManagerFeature):
             raise ValueError('manager needs to start service before node can be accessed')
         return self._node
 
+    def register_channel_event_callback(self, channel_no: int, callback: Callable[[AntChannelEvent], None]) -> None:
+        """
+        Registers a callback that is executed (within the openant thread) for every channel event of the given channel.
+        The events of the channel are consumed by the callback - they are not available for the ``wait_for_event()``
+        methods of openant anymore.
+
+        :param channel_no: the number of the channel
+        :param callback: the callback that gets the event code
+        """
+        self._channel_event_callbacks[channel_no] = callback
+
+    def unregister_channel_event_callback(self, channel_no: int) -> None:
+        """
+        Removes the channel event callback of the given channel.
+
+        :param channel_no: the number of the channel
+        """
+        self._channel_event_callbacks.pop(channel_no, None)
+        if self._node is not None:
+            self._node.discard_events_of_channel(channel_no)
+
+    def _on_channel_event(self, channel_no: int, event: int, data: bytes) -> bool:  # pylint: disable=unused-argument
+        channel_event = AntChannelEvent(event)
+        counter = self._channel_event_counters.get((channel_no, channel_event))
+        if counter is None:
+            counter = self._channel_event_counters[(channel_no, channel_event)] = self._metrics.counter(
+                'ant_channel_events_total', 'number of received channel events',
+                channel=channel_no, event=channel_event.name
+            )
+        counter.inc()
+        callback = self._channel_event_callbacks.get(channel_no)
+        if callback is None:
+            return False
+        callback(channel_event)
+        return True
+
     def _threaded_method(self):
         logger.debug('openant manager thread started.')
         self._node.start()
@@ -36,11 +139,15 @@ class OpenantManagerFeature(AntNodeManagerFeature):
     def start(self):
         self._thread = threading.Thread(target=self._threaded_method)
 
-        self._node = Node()
+        self._node = _ChannelEventNode(on_channel_event=self._on_channel_event)
         self._node.set_network_key(*self.network_and_network_key)
 
         self._thread.start()
 
+        if self.metrics_port is not None and self._metrics_server is None:
+            self._metrics_server = MetricsServer(self._metrics, port=self.metrics_port)
+            self._metrics_server.start()
+
     def shutdown(self, timeout=5) -> bool:
         if self._node is None:
             return False
@@ -50,4 +157,7 @@ class OpenantManagerFeature(AntNodeManagerFeature):
             raise RuntimeError('manager thread failed to shut down')
         self._node = None
         self._thread = None
+        if self._metrics_server is not None:
+            self._metrics_server.stop()
+            self._metrics_server = None
         return True
@@ -1,7 +1,10 @@
 import array
 import logging
+import os
+import pathlib
 import queue
 import time
+from concurrent.futures import Future
 from typing import Union, Literal
 
 from openant.base.message import Message
@@ -9,16 +12,58 @@ from openant.easy.channel import Channel
 
 from .openant_manager_feature import OpenantManagerFeature
 from ..scenario_features.antplus_controller_hrm_feature import AntplusControllerHrmFeature
-from ..utils.page_message_collection import PageMessageCollection
+from ..utils.ack_transfer import AckTransferQueue
+from ..utils.capture_file import CaptureHeader, CaptureWriter, RecordKind, WaitCall
+from ..utils.capture_recorder import CaptureRecorder
+from ..utils.channel_event_log import AntChannelEvent
+from ..utils.channel_session import AntplusChannelSession
+from ..utils.metrics import Counter, Histogram, MetricsRegistry
 from ..utils.pages import BaseAntplusPage, BaseReceivedAntplusPage
-from ..utils.extended_meta.extended_meta_flagged_channel_id import ExtendedMetaFlaggedChannelId
-from ..utils.extended_meta.extended_meta_flagged_rssi import ExtendedMetaFlaggedRssi
-from ..utils.extended_meta.extended_meta_flagged_timestamp import ExtendedMetaFlaggedTimestamp
+from ..utils.extended_data import parse_flagged_extended_data
+from ..utils.transmit_scheduler import TransmitScheduler
 from ..utils.extended_meta.extended_meta_legacy_channel_id import ExtendedMetaLegacyChannelId
 
 logger = logging.getLogger(__name__)
 
 
+class _ControllerMetricHandles:
+    """handles of all metrics that are updated by one :class:`OpenantPlusControllerHrmFeature`"""
+
+    def __init__(self, registry: MetricsRegistry, device: int, kinds: list[RecordKind]):
+        self.registry = registry
+        self.device = device
+        self.received_counters: dict[RecordKind, Counter] = {}
+        self.dwell_histograms: dict[RecordKind, Histogram] = {}
+        for kind in kinds:
+            labels = {'device': device, 'kind': kind.name.lower()}
+            self.received_counters[kind] = registry.counter(
+                'ant_received_messages_total', 'number of messages received from the ANT device', **labels)
+            self.dwell_histograms[kind] = registry.histogram(
+                'ant_message_dwell_seconds', 'time between receiving a message and consuming it', **labels)
+        self.wait_call_histograms: dict[WaitCall, Histogram] = {
+            call: registry.histogram('ant_wait_call_seconds', 'duration of the wait calls of the controller',
+                                     device=device, call=call.name.lower())
+            for call in WaitCall
+        }
+        self.transmit_queue_delay_histogram = registry.histogram(
+            'ant_transmit_queue_delay_seconds', 'time an outgoing message was queued before it was handed over to '
+            'the ANT device', device=device)
+        # created on the first decoded page of every type
+        self.decode_histograms: dict[type[BaseReceivedAntplusPage], Histogram] = {}
+
+    def get_decode_histogram(self, page_type: type[BaseReceivedAntplusPage]) -> Histogram:
+        """
+        :param page_type: the decoded page type
+        :return: the histogram of the decode durations of the given page type
+        """
+        histogram = self.decode_histograms.get(page_type)
+        if histogram is None:
+            histogram = self.decode_histograms[page_type] = self.registry.histogram(
+                'ant_page_decode_seconds', 'time for decoding a received message into its page',
+                device=self.device, page=page_type.__name__)
+        return histogram
+
+
 class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
     """
     Setup Level feature implementation for the :class:`AntplusControllerHrmFeature`, by using the
@@ -31,9 +76,16 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
         super().__init__(**kwargs)
 
         self._openant_channel: Union[Channel, None] = None
-        self._broadcast_message_queue = queue.Queue()
-        self._ack_message_queue = queue.Queue()
-        self._burst_message_queue = queue.Queue()
+        # messages (and events) that were received within the openant thread, but are not consumed yet
+        self._received_queues: dict[RecordKind, queue.Queue] = {
+            kind: queue.Queue() for kind in (RecordKind.BROADCAST, RecordKind.ACK, RecordKind.BURST, RecordKind.EVENT)
+        }
+        self._ack_transfer_queue: Union[AckTransferQueue, None] = None
+        self._transmit_scheduler: Union[TransmitScheduler, None] = None
+        self._capture_recorder: Union[CaptureRecorder, None] = None
+        self._capture_path: Union[pathlib.Path, None] = None
+        # metrics are created with the first channel session (see `_create_metrics()`)
+        self._metric_handles: Union[_ControllerMetricHandles, None] = None
 
     @property
     def extended_format(self) -> Literal['legacy', 'flagged', 'none']:
@@ -42,14 +94,113 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
         """
         return 'flagged'
 
+    @property
+    def capture_directory(self) -> Union[str, os.PathLike, None]:
+        """
+        :return: returns the directory every channel session should be recorded to (as capture file, see
+                 :class:`CaptureWriter`) or None if the sessions should not be recorded
+        """
+        return None
+
+    @property
+    def capture_recorder(self) -> Union[CaptureRecorder, None]:
+        """
+        :return: returns the recorder of the current channel session or None if the session is not recorded
+        """
+        return self._capture_recorder
+
+    @property
+    def capture_path(self) -> Union[pathlib.Path, None]:
+        """
+        :return: returns the path of the capture file of the current (or the last) channel session or None if no session
+                 was recorded yet
+        """
+        return self._capture_path
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """
+        :return: returns the registry that holds the metrics of this controller (shared with its manager, see
+                 :meth:`OpenantManagerFeature.metrics`) - use :meth:`MetricsRegistry.snapshot` to read them out
+        """
+        return self.manager.metrics
+
+    def _create_metrics(self) -> None:
+        if self._metric_handles is not None:
+            return
+        metrics = self.metrics
+        device = self.AntPlusDevice.config.device_num
+        self._metric_handles = _ControllerMetricHandles(metrics, device, kinds=list(self._received_queues.keys()))
+        for kind, msg_queue in self._received_queues.items():
+            metrics.gauge('ant_receive_queue_depth', 'number of received messages that are not consumed yet',
+                          msg_queue.qsize, device=device, kind=kind.name.lower())
+        metrics.gauge(
+            'ant_transmit_queue_depth', 'number of outgoing messages that are queued',
+            lambda: 0 if self._transmit_scheduler is None else self._transmit_scheduler.get_statistics().queued_count,
+            device=device
+        )
+
+    def _record_wait_call(self, call: WaitCall, start_timestamp: float, end_timestamp: float,
+                          timed_out: bool = False) -> None:
+        super()._record_wait_call(call, start_timestamp, end_timestamp, timed_out=timed_out)
+        if self._metric_handles is not None:
+            self._metric_handles.wait_call_histograms[call].observe(end_timestamp - start_timestamp)
+
+    def _create_capture_header(self) -> CaptureHeader:
+        return CaptureHeader(
+            clock_anchor=self._session.clock_anchor,
+            device_config={
+                'device_number': self.AntPlusDevice.config.device_num,
+                'device_type': self.device_type,
+                'transmission_type': self.transmission_type,
+                'channel_type': self.channel_type,
+                'channel_period': self.channel_period,
+                'rf_channel_frequency': self.rf_channel_frequency,
+            },
+            extended_format=self.extended_format,
+        )
+
+    def _start_capture_recorder(self) -> None:
+        if self.capture_directory is None:
+            return
+        directory = pathlib.Path(self.capture_directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._capture_path = directory / (
+            f"{self._session.clock_anchor.wall_clock_ref:%Y%m%d-%H%M%S}-dev{self.AntPlusDevice.config.device_num}-"
+            f"ch{self._openant_channel.id}.bhcap"
+        )
+        self._capture_recorder = CaptureRecorder(CaptureWriter(self._capture_path, self._create_capture_header()))
+        self._capture_recorder.start()
+        logger.info(f'record channel session to `{self._capture_path}`')
+
+    def _record(self, timestamp: float, kind: RecordKind, raw_data: bytes) -> None:
+        recorder = self._capture_recorder
+        flight_recorder = self._flight_recorder
+        if recorder is None and flight_recorder is None:
+            return
+        if kind == RecordKind.BURST:
+            # a BURST transfer consists of multiple 8 byte packets - record every packet on its own (the last one is
+            # padded with zeros)
+            padded_data = raw_data.ljust(-(-len(raw_data) // 8) * 8, b'\x00')
+            entries = [(padded_data[start:start + 8], b'') for start in range(0, len(padded_data), 8)]
+        elif kind == RecordKind.EVENT or self.extended_format in ('none', 'flagged'):
+            entries = [(raw_data[0:8], raw_data[8:])]
+        else:
+            # legacy format - the Channel ID is transmitted in front of the payload
+            entries = [(raw_data[4:12], raw_data[0:4])]
+        for payload, extended_data in entries:
+            if recorder is not None:
+                recorder.record(timestamp, kind, self._openant_channel.id, payload, extended_data)
+            if flight_recorder is not None:
+                flight_recorder.record(timestamp, kind, self._openant_channel.id, payload, extended_data)
+
     def open_channel(self):
         if self._openant_channel is not None:
             raise ValueError('can not open channel, because another one is still active')
 
-        # reset saved messages TODO
-        self._already_saved_broadcast_messages = PageMessageCollection()
-        self._already_saved_ack_messages = PageMessageCollection()
-        self._already_saved_burst_messages = PageMessageCollection()
+        self._reset_received_messages()
+        self._prepare_flight_recorder()
+        self._create_metrics()
 
         self._openant_channel = self.manager.node.new_channel(self.channel_type, 0x00, 0x01) # TODO configurable?
 
@@ -59,6 +210,17 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
         self._openant_channel.on_broadcast_data = self._on_broadcast_data
         self._openant_channel.on_burst_data = self._on_burst_data
         self._openant_channel.on_acknowledge_data = self._on_acknowledge
+        self._transmit_scheduler = TransmitScheduler(
+            channel_period_sec=self.channel_period / 32768,
+            queue_delay_histogram=self._metric_handles.transmit_queue_delay_histogram
+        )
+        self._transmit_scheduler.start()
+        self._ack_transfer_queue = AckTransferQueue(
+            send_callback=self._schedule_ack_raw_data,
+            retry_backoff_sec=self.channel_period / 32768
+        )
+        self._start_capture_recorder()
+        self.manager.register_channel_event_callback(self._openant_channel.id, self._on_channel_event)
         # only search timeout if slave as searching
         self._openant_channel.set_search_timeout(0xFF)
 
@@ -71,7 +233,7 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
 
         if self.extended_format == 'flagged':
             # we will activate everything in flagged mode
-            message = Message(Message.ID.LIB_CONFIG, [self._openant_channel.id, 0x80 | 0x20])
+            message = Message(Message.ID.LIB_CONFIG, [self._openant_channel.id, 0x80 | 0x40 | 0x20])
             self._openant_channel._ant.write_message(message) # pylint: disable=protected-access
 
         self._openant_channel.set_period(self.channel_period)
@@ -90,53 +252,46 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
         return self._openant_channel and self._openant_channel in self.manager.node.channels
 
     @property
-    def received_broadcast_messages(self) -> PageMessageCollection:
-        # read all messages from queue
-        msg = self._read_and_save_broadcast_message()
-
-        while msg is not None:
-            msg = self._read_and_save_broadcast_message()
-
-        return super().received_broadcast_messages
-
-    @property
-    def received_ack_messages(self) -> PageMessageCollection:
-        # read all messages from queue
-        msg = self._read_and_save_ack_message()
+    def session(self) -> AntplusChannelSession:
+        # read all messages and events from queue
+        while self._read_and_save_broadcast_message() is not None:
+            pass
+        while self._read_and_save_ack_message() is not None:
+            pass
+        while self._read_and_save_channel_event():
+            pass
 
-        while msg is not None:
-            msg = self._read_and_save_ack_message()
-
-        return super().received_ack_messages
-
-    def get_page_for_no(self, page_no: int) -> type[BaseReceivedAntplusPage]:
-        """
-        This method returns the page type object for the given page number. It raises a KeyError in case that
-        there is no page specified for the given page-number.
-
-        :param page_no: the page number the page type should be returned
-        :return: the page type that describes the given page number
-        """
-        all_hrm_pages = self.AntPlusDevice.profile.get_existing_pages_for_profile()
-        if page_no not in all_hrm_pages:
-            raise KeyError(f'unable to find page #{page_no}')
-        return all_hrm_pages[page_no]
+        return super().session
 
     def _on_broadcast_data(self, data: array.array):
         timestamp = time.perf_counter()
-        self._broadcast_message_queue.put((timestamp, data.tobytes()))
+        raw_data = data.tobytes()
+        self._received_queues[RecordKind.BROADCAST].put((timestamp, raw_data))
+        self._metric_handles.received_counters[RecordKind.BROADCAST].inc()
+        self._record(timestamp, RecordKind.BROADCAST, raw_data)
 
     def _on_acknowledge(self, data: array.array):
         timestamp = time.perf_counter()
-        self._ack_message_queue.put((timestamp, data.tobytes()))
+        raw_data = data.tobytes()
+        self._received_queues[RecordKind.ACK].put((timestamp, raw_data))
+        self._metric_handles.received_counters[RecordKind.ACK].inc()
+        self._record(timestamp, RecordKind.ACK, raw_data)
 
     def _on_burst_data(self, data: array.array):
         timestamp = time.perf_counter()
-        self._burst_message_queue.put((timestamp, data.tobytes()))
+        raw_data = data.tobytes()
+        self._received_queues[RecordKind.BURST].put((timestamp, raw_data))
+        self._metric_handles.received_counters[RecordKind.BURST].inc()
+        self._record(timestamp, RecordKind.BURST, raw_data)
 
-    def _get_page_from_raw_data(self, raw_data: bytes) -> type[BaseReceivedAntplusPage]:
-        page_no = raw_data[0] & ~(1 << 7)  # on HRM profile -> first bit is toggle bit
-        return self.get_page_for_no(page_no)
+    def _on_channel_event(self, event: AntChannelEvent):
+        timestamp = time.perf_counter()
+        self._received_queues[RecordKind.EVENT].put((timestamp, event))
+        self._metric_handles.received_counters[RecordKind.EVENT].inc()
+        self._record(timestamp, RecordKind.EVENT, bytes([event, 0, 0, 0, 0, 0, 0, 0]))
+        # resolve ACK transfers directly within the openant thread, so that the futures do not depend on the log
+        if self._ack_transfer_queue is not None:
+            self._ack_transfer_queue.on_channel_event(event, timestamp)
 
     @classmethod
     def _parse_legacy_extended_message(
@@ -147,80 +302,114 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
             raise ValueError(f'expected 12 bytes but for legacy message format {len(raw_data)}')
         return [ExtendedMetaLegacyChannelId(raw_data[0:4])]
 
-    @classmethod
-    def _parse_flagged_extended_message(
-            cls,
-            raw_data: bytes
-    ) -> list[Union[ExtendedMetaFlaggedChannelId, ExtendedMetaFlaggedRssi, ExtendedMetaFlaggedTimestamp]]:
-        if len(raw_data) <= 8:
-            raise ValueError(f'expected more than 8 bytes but for flagged message format {len(raw_data)}')
-        extended_data = raw_data[8:]
-        all_metas = []
-        nxt_idx = 1
-        if extended_data[0] & 0x80:
-            # next 4 bytes are for `ExtendedMetaLegacyChannelId`
-            all_metas.append(ExtendedMetaFlaggedChannelId(extended_data[nxt_idx:nxt_idx + 4]))
-            nxt_idx += 4
-        if extended_data[0] & 0x40:
-            # next 3 bytes are for `ExtendedMetaFlaggedRssi`
-            all_metas.append(ExtendedMetaFlaggedRssi(extended_data[nxt_idx:nxt_idx + 3]))
-            nxt_idx += 3
-        if extended_data[0] & 0x20:
-            # next 2 bytes are for `ExtendedMetaFlaggedTimestamp`
-            all_metas.append(ExtendedMetaFlaggedTimestamp(extended_data[nxt_idx:nxt_idx + 2]))
-            nxt_idx += 2
-        if extended_data[nxt_idx:]:
-            raise ValueError(f'more extended (flagged) data received than expected: {raw_data}')
-        return all_metas
-
-    def _read_from_queue(self, msg_queue: queue.Queue) -> Union[BaseReceivedAntplusPage, None]:
+    def _read_from_queue(self, kind: RecordKind) -> Union[BaseReceivedAntplusPage, None]:
+        msg_queue = self._received_queues[kind]
         if msg_queue.empty():
             return None
         timestamp, raw_data = msg_queue.get()
+        decode_start = time.perf_counter()
+        self._metric_handles.dwell_histograms[kind].observe(decode_start - timestamp)
 
+        meta = None
+        extended_data = None
         if self.extended_format == 'none':
             raw_data_of_page_only = raw_data
-            meta = None
         elif self.extended_format == 'legacy':
             raw_data_of_page_only = raw_data[4:12]
             meta = self._parse_legacy_extended_message(raw_data)
         elif self.extended_format == 'flagged':
             raw_data_of_page_only = raw_data[0:8]
-            meta = self._parse_flagged_extended_message(raw_data)
+            extended_data = parse_flagged_extended_data(raw_data)
         else:
             raise ValueError(f'received unexpected value for legacy format `{self.extended_format}`')
         page_type = self._get_page_from_raw_data(raw_data_of_page_only)
-        return page_type(raw_data_of_page_only, timestamp=timestamp, extended_metas=meta)
+        page = page_type(
+            raw_data_of_page_only, timestamp=timestamp, extended_metas=meta, clock_anchor=self._session.clock_anchor,
+            extended_data=extended_data
+        )
+        self._metric_handles.get_decode_histogram(page_type).observe(time.perf_counter() - decode_start)
+        return page
 
     def _read_and_save_broadcast_message(self) -> Union[BaseAntplusPage, None]:
-        msg = self._read_from_queue(self._broadcast_message_queue)
+        msg = self._read_from_queue(RecordKind.BROADCAST)
         if msg is None:
             return None
-        self._already_saved_broadcast_messages.append(msg)
+        self._save_received_broadcast_message(msg)
         return msg
 
     def _read_and_save_ack_message(self) -> Union[BaseAntplusPage, None]:
-        msg = self._read_from_queue(self._ack_message_queue)
+        msg = self._read_from_queue(RecordKind.ACK)
         if msg is None:
             return None
-        self._already_saved_ack_messages.append(msg)
+        self._save_received_ack_message(msg)
         return msg
 
+    def _read_and_save_channel_event(self) -> bool:
+        event_queue = self._received_queues[RecordKind.EVENT]
+        if event_queue.empty():
+            return False
+        timestamp, event = event_queue.get()
+        self._metric_handles.dwell_histograms[RecordKind.EVENT].observe(time.perf_counter() - timestamp)
+        self._save_channel_event(event, timestamp)
+        return True
+
     def send_broadcast_message(self, message: BaseAntplusPage) -> None:
-        self._openant_channel.send_broadcast_data(list(message.raw_data))
+        if self._transmit_scheduler is None:
+            raise ValueError('can not send BROADCAST message, because channel is not open')
+        self._record_in_flight_recorder(time.perf_counter(), RecordKind.SENT_BROADCAST, message.raw_data,
+                                        channel=self._openant_channel.id)
+        self._transmit_scheduler.submit(message.raw_data, self._send_broadcast_buffer, coalesce=True)
+
+    def _send_broadcast_buffer(self, buffer: list[int]) -> None:
+        self._openant_channel.send_broadcast_data(buffer)
+
+    def _send_ack_buffer(self, buffer: list[int]) -> None:
+        ack_transfer_queue = self._ack_transfer_queue
+        if ack_transfer_queue is not None:
+            ack_transfer_queue.notify_handed_over(time.perf_counter())
+        # use the non-blocking method of the ANT object, because the easy channel waits (and retries) till the transfer
+        # is completed - the completion is handled by the :class:`AckTransferQueue` instead
+        self._openant_channel._ant.send_acknowledged_data(  # pylint: disable=protected-access
+            self._openant_channel.id, buffer
+        )
+
+    def _schedule_ack_raw_data(self, raw_data: bytes) -> None:
+        # is also executed within the openant thread (for starting the next transfer) - never wait for a free slot there
+        self._transmit_scheduler.submit(raw_data, self._send_ack_buffer, timeout=0,
+                                        error_callback=self._ack_transfer_queue.notify_handover_failed)
 
-    def send_ack_message(self, message: BaseAntplusPage):
-        self._openant_channel.send_acknowledged_data(list(message.raw_data))
+    def send_ack_message(
+            self,
+            message: BaseAntplusPage,
+            max_retries: Union[int, None] = None,
+            retry_backoff_sec: Union[float, None] = None
+    ) -> Future:
+        if self._ack_transfer_queue is None:
+            raise ValueError('can not send ACK message, because channel is not open')
+        self._record_in_flight_recorder(time.perf_counter(), RecordKind.SENT_ACK, message.raw_data,
+                                        channel=self._openant_channel.id)
+        return self._ack_transfer_queue.submit(
+            message.raw_data, max_retries=max_retries, retry_backoff_sec=retry_backoff_sec
+        )
 
     def close_channel(self) -> bool:
         if self._openant_channel is None:
             return False
 
+        self._transmit_scheduler.stop(flush=False)
+        self._transmit_scheduler = None
         self.manager.node.remove_channel(self._openant_channel)
-
-        # load all messages that are still in queue
-        self._read_and_save_broadcast_message()
-        self._read_and_save_ack_message()
+        self.manager.unregister_channel_event_callback(self._openant_channel.id)
+        self._ack_transfer_queue.cancel_all('channel was closed')
+        self._ack_transfer_queue = None
+        if self._capture_recorder is not None:
+            self._capture_recorder.stop()
+            logger.info(f'recorded channel session to `{self._capture_path}`: '
+                        f'{self._capture_recorder.get_statistics()}')
+            self._capture_recorder = None
+
+        # load all messages and events that are still in queue
+        _ = self.session
 
         self._openant_channel = None
         return True
@@ -242,7 +431,9 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
                 continue
             if of_page_type is not None and new_msg.__class__ not in tuple(of_page_type):
                 continue
+            self._record_wait_call(WaitCall.WAIT_FOR_BROADCAST_MESSAGE, start_time, time.perf_counter())
             return new_msg
+        self._record_wait_call(WaitCall.WAIT_FOR_BROADCAST_MESSAGE, start_time, time.perf_counter(), timed_out=True)
         raise TimeoutError(f'not received any messages within {timeout} seconds')
 
     def wait_for_new_ack_message(
@@ -263,5 +454,7 @@ class OpenantPlusControllerHrmFeature(AntplusControllerHrmFeature):
                 continue
             if of_page_type is not None and new_msg.__class__ not in tuple(of_page_type):
                 continue
+            self._record_wait_call(WaitCall.WAIT_FOR_ACK_MESSAGE, start_time, time.perf_counter())
             return new_msg
+        self._record_wait_call(WaitCall.WAIT_FOR_ACK_MESSAGE, start_time, time.perf_counter(), timed_out=True)
         raise TimeoutError(f'not received any messages within {timeout} seconds')
@@ -0,0 +1,251 @@
+import logging
+import os
+import time
+from concurrent.futures import Future
+from typing import Iterator, Union
+
+from ..scenario_features.antplus_controller_hrm_feature import AntplusControllerHrmFeature
+from ..utils.ack_transfer import AckTransferFailedError
+from ..utils.capture_file import CaptureHeader, CaptureReader, CaptureRecord, RecordKind, WaitCall
+from ..utils.channel_event_log import AntChannelEvent
+from ..utils.channel_session import AntplusChannelSession
+from ..utils.clock_anchor import ClockAnchor
+from ..utils.mapped_capture import create_received_page
+from ..utils.pages import BaseAntplusPage, BaseReceivedAntplusPage
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayAntplusControllerHrmFeature(AntplusControllerHrmFeature):
+    """
+    Setup Level feature implementation for the :class:`AntplusControllerHrmFeature`, that replays a recorded channel
+    session out of a capture file (see :class:`CaptureWriter`) instead of using a real ANT device. This allows to
+    re-validate archived sessions without the hardware.
+
+    Every call of :meth:`ReplayAntplusControllerHrmFeature.open_channel` starts the replay from the beginning of the
+    capture. The records are released by a replay clock, that starts with the moment the recorded channel was opened:
+
+    * in real time (default), the replay clock follows ``time.perf_counter()`` and all timestamps are shifted to the
+      current session, so that every wait takes as long as within the recorded session
+    * as fast as possible, the replay clock only moves forward when the scenario waits (see
+      :meth:`AntplusControllerFeature.observe_channel` and the ``wait_for_new_...`` methods), so that waiting takes no
+      time - the timestamps keep their recorded values
+
+    Sent messages can not be replayed: BROADCAST messages are dropped and ACK transfers fail.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self._capture_reader: Union[CaptureReader, None] = None
+        # header of the last replayed capture (kept after closing the channel for dumping the flight recorder)
+        self._last_capture_header: Union[CaptureHeader, None] = None
+        self._capture_records: Union[Iterator[CaptureRecord], None] = None
+        self._next_capture_record: Union[CaptureRecord, None] = None
+        # shift between the recorded timestamps and the timestamps of the replayed messages
+        self._timestamp_offset = 0.
+        # current time of the replay clock (in recorded timestamps - only used if not replayed in real time)
+        self._replay_time = 0.
+
+    @property
+    def capture_file(self) -> Union[str, os.PathLike]:
+        """
+        :return: returns the path of the capture file that should be replayed
+        """
+        raise NotImplementedError
+
+    @property
+    def replay_in_real_time(self) -> bool:
+        """
+        :return: returns True if the session should be replayed in real time or False if it should be replayed as fast
+                 as possible
+        """
+        return True
+
+    @property
+    def capture_header(self) -> Union[CaptureHeader, None]:
+        """
+        :return: returns the header of the replayed capture or None if the channel is not open
+        """
+        return None if self._capture_reader is None else self._capture_reader.header
+
+    @property
+    def channel_is_active(self) -> bool:
+        return self._capture_reader is not None
+
+    @property
+    def session(self) -> AntplusChannelSession:
+        self._replay_till(self._get_replay_time())
+        return super().session
+
+    def _validate_capture_header(self, header: CaptureHeader) -> None:
+        expected_config = {
+            'device_number': self.AntPlusDevice.config.device_num,
+            'device_type': self.device_type,
+            'channel_period': self.channel_period,
+        }
+        for key, expected_value in expected_config.items():
+            if header.device_config.get(key) != expected_value:
+                logger.warning(f'replayed capture was recorded with {key}={header.device_config.get(key)} '
+                               f'(expected {expected_value})')
+
+    def open_channel(self) -> None:
+        if self._capture_reader is not None:
+            raise ValueError('can not open channel, because the replay is still active')
+
+        self._capture_reader = CaptureReader(self.capture_file)
+        header = self._capture_reader.header
+        self._last_capture_header = header
+        self._validate_capture_header(header)
+        self._capture_records = iter(self._capture_reader)
+        self._next_capture_record = next(self._capture_records, None)
+
+        # the replay starts with the moment the recorded channel was opened
+        self._replay_time = header.clock_anchor.perf_counter_ref
+        self._timestamp_offset = time.perf_counter() - self._replay_time if self.replay_in_real_time else 0.
+        # keep the recorded wall clock for all replayed messages
+        self._reset_received_messages(clock_anchor=ClockAnchor(
+            perf_counter_ref=header.clock_anchor.perf_counter_ref + self._timestamp_offset,
+            wall_clock_ref=header.clock_anchor.wall_clock_ref,
+        ))
+        self._prepare_flight_recorder()
+        logger.debug(f"replaying channel session `{self.capture_file}` (recorded at "
+                     f"{header.clock_anchor.wall_clock_ref.isoformat()})")
+
+    def _create_capture_header(self) -> CaptureHeader:
+        if self._last_capture_header is None:
+            raise ValueError('no capture was replayed yet')
+        return self._last_capture_header._replace(clock_anchor=self._session.clock_anchor)
+
+    def close_channel(self) -> bool:
+        if self._capture_reader is None:
+            return False
+
+        # load all messages and events that were received till now
+        self._replay_till(self._get_replay_time())
+
+        self._capture_reader.close()
+        self._capture_reader = None
+        self._capture_records = None
+        self._next_capture_record = None
+        return True
+
+    def _get_replay_time(self) -> float:
+        if self.replay_in_real_time:
+            return time.perf_counter() - self._timestamp_offset
+        return self._replay_time
+
+    def _wait_for_replay_time(self, replay_time: float) -> None:
+        if self.replay_in_real_time:
+            time_to_wait = replay_time - self._get_replay_time()
+            if time_to_wait > 0:
+                time.sleep(time_to_wait)
+        else:
+            self._replay_time = max(self._replay_time, replay_time)
+
+    def get_current_timestamp(self) -> float:
+        return self._get_replay_time() + self._timestamp_offset
+
+    def _sleep(self, duration_sec: float) -> None:
+        self._wait_for_replay_time(self._get_replay_time() + duration_sec)
+
+    def _create_page(self, record: CaptureRecord) -> BaseReceivedAntplusPage:
+        return create_received_page(
+            self._get_page_from_raw_data(record.payload),
+            payload=record.payload,
+            extended_data=record.extended_data,
+            extended_format=self._capture_reader.header.extended_format,
+            timestamp=record.timestamp + self._timestamp_offset,
+            clock_anchor=self._session.clock_anchor,
+        )
+
+    def _replay_next_record(self) -> Union[BaseReceivedAntplusPage, None]:
+        """
+        Saves the next record of the capture.
+
+        :return: the new message or None if the record was no BROADCAST or ACK message
+        """
+        record = self._next_capture_record
+        self._next_capture_record = next(self._capture_records, None)
+        self._record_in_flight_recorder(record.timestamp + self._timestamp_offset, record.kind, record.payload,
+                                        record.extended_data, channel=record.channel)
+        if record.kind == RecordKind.BROADCAST:
+            message = self._create_page(record)
+            self._save_received_broadcast_message(message)
+            return message
+        if record.kind == RecordKind.ACK:
+            message = self._create_page(record)
+            self._save_received_ack_message(message)
+            return message
+        if record.kind == RecordKind.EVENT:
+            self._save_channel_event(AntChannelEvent(record.payload[0]), record.timestamp + self._timestamp_offset)
+        # BURST messages are not supported yet
+        return None
+
+    def _replay_till(self, replay_time: float) -> None:
+        while self._next_capture_record is not None and self._next_capture_record.timestamp <= replay_time:
+            self._replay_next_record()
+
+    def _wait_for_new_replayed_message(
+            self,
+            kind: RecordKind,
+            of_page_type: Union[list[type[BaseAntplusPage]], type[BaseAntplusPage], None],
+            timeout: float
+    ) -> BaseAntplusPage:
+        self._replay_till(self._get_replay_time())
+
+        of_page_type = [of_page_type] if isinstance(of_page_type, type) else of_page_type
+        wait_call = WaitCall.WAIT_FOR_BROADCAST_MESSAGE if kind == RecordKind.BROADCAST \
+            else WaitCall.WAIT_FOR_ACK_MESSAGE
+        start_time = self._get_replay_time()
+        deadline = start_time + timeout
+        while self._next_capture_record is not None and self._next_capture_record.timestamp <= deadline:
+            record_kind = self._next_capture_record.kind
+            self._wait_for_replay_time(self._next_capture_record.timestamp)
+            new_msg = self._replay_next_record()
+            if record_kind != kind:
+                continue
+            if of_page_type is not None and new_msg.__class__ not in tuple(of_page_type):
+                continue
+            self._record_wait_call(wait_call, start_time + self._timestamp_offset,
+                                   self._get_replay_time() + self._timestamp_offset)
+            return new_msg
+        self._wait_for_replay_time(deadline)
+        self._record_wait_call(wait_call, start_time + self._timestamp_offset,
+                               self._get_replay_time() + self._timestamp_offset, timed_out=True)
+        raise TimeoutError(f'not received any messages within {timeout} seconds')
+
+    def wait_for_new_broadcast_message(
+            self,
+            of_page_type: Union[list[type[BaseAntplusPage]], type[BaseAntplusPage], None] = None,
+            timeout: float = 10
+    ) -> BaseAntplusPage:
+        return self._wait_for_new_replayed_message(RecordKind.BROADCAST, of_page_type, timeout)
+
+    def wait_for_new_ack_message(
+            self,
+            of_page_type: Union[list[type[BaseAntplusPage]], type[BaseAntplusPage], None] = None,
+            timeout: float = 10
+    ) -> BaseAntplusPage:
+        return self._wait_for_new_replayed_message(RecordKind.ACK, of_page_type, timeout)
+
+    def send_broadcast_message(self, message: BaseAntplusPage) -> None:
+        if self._capture_reader is None:
+            raise ValueError('can not send BROADCAST message, because channel is not open')
+        self._record_in_flight_recorder(self._get_replay_time() + self._timestamp_offset, RecordKind.SENT_BROADCAST,
+                                        message.raw_data)
+        logger.warning(f'drop BROADCAST message {message}, because messages can not be sent within a replayed session')
+
+    def send_ack_message(
+            self,
+            message: BaseAntplusPage,
+            max_retries: Union[int, None] = None,
+            retry_backoff_sec: Union[float, None] = None
+    ) -> Future:
+        if self._capture_reader is None:
+            raise ValueError('can not send ACK message, because channel is not open')
+        self._record_in_flight_recorder(self._get_replay_time() + self._timestamp_offset, RecordKind.SENT_ACK,
+                                        message.raw_data)
+        future = Future()
+        future.set_exception(AckTransferFailedError('messages can not be sent within a replayed session'))
+        return future
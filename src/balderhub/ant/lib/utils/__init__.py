@@ -1,8 +1,105 @@
-from .page_message_collection import PageMessageCollection
+from .ack_transfer import AckTransferFailedError, AckTransferQueue, AckTransferResult
+from .capture_file import RecordKind, WaitCall, CaptureRecord, CaptureHeader, CaptureWriter, CaptureReader, \
+    pack_record, unpack_record_from, unpack_capture_header, pack_wait_payload, unpack_wait_payload
+from .capture_recorder import CaptureRecorder, CaptureRecorderStatistics
+from .channel_event_log import AntChannelEvent, ChannelEvent, ChannelEventLog
+from .channel_session import AntplusChannelSession
+from .clock_anchor import ClockAnchor
+from .counter import unwrap_counter, CounterUnwrapper
+from .extended_data import ChannelId, FlaggedExtendedData, get_flagged_extended_data_field, parse_flagged_extended_data
+from .flight_recorder import FlightRecorder, FlightRecorderConfig
+from .gap_index import Gap, GapIndex, find_gaps
+from .hardware_timeline import unwrap_hw_timestamp_ticks, estimate_hw_clock_drift, reconstruct_hw_timeline
+from .heart_beat_index import HeartBeatEvent, HeartBeatIndex
+from .hrv import RRIntervalSeries
+from .link_quality import LinkQualityMonitor
+from .mapped_capture import CaptureIndex, MappedCaptureReader, MappedPageMessageCollection, create_received_page
+from .metrics import Counter, Gauge, Histogram, HistogramSnapshot, MetricsRegistry, MetricsServer, MetricsSnapshot
+from .page_message_collection import PageMessageCollection, PageMessageCollectionView, RetentionPolicy, \
+    RingPageMessageCollection
+from .page_request_sweep import PageRequest, PageRequestResult
+from .request_latency import LatencyPercentiles, RequestLatencyTracker
+from .streaming_validation import StreamingViolation, BaseStreamingValidator, BeatCountContinuityValidator, \
+    HeartBeatEventTimeValidator, PacketLossValidator, RssiValidator, BackgroundPageCadenceValidator, \
+    StreamingValidationRunner
 from .support import filter_hrm_messages_by_toggle_bit_change
+from .transmit_scheduler import TransmitScheduler, TransmitSchedulerStatistics
+from .transmission_pattern import HrmTransmissionPattern, HrmTransmissionPatternAlignment, \
+    HrmTransmissionPhaseEstimator, TransmissionPatternDeviation
 
 
 __all__ = [
+    'AckTransferFailedError',
+    'AckTransferQueue',
+    'AckTransferResult',
+    'RecordKind',
+    'WaitCall',
+    'CaptureRecord',
+    'CaptureHeader',
+    'CaptureWriter',
+    'CaptureReader',
+    'pack_record',
+    'unpack_record_from',
+    'unpack_capture_header',
+    'pack_wait_payload',
+    'unpack_wait_payload',
+    'CaptureRecorder',
+    'CaptureRecorderStatistics',
+    'AntChannelEvent',
+    'ChannelEvent',
+    'ChannelEventLog',
+    'AntplusChannelSession',
+    'ClockAnchor',
+    'unwrap_counter',
+    'CounterUnwrapper',
+    'ChannelId',
+    'FlaggedExtendedData',
+    'get_flagged_extended_data_field',
+    'parse_flagged_extended_data',
+    'FlightRecorder',
+    'FlightRecorderConfig',
+    'Gap',
+    'GapIndex',
+    'find_gaps',
+    'unwrap_hw_timestamp_ticks',
+    'estimate_hw_clock_drift',
+    'reconstruct_hw_timeline',
+    'HeartBeatEvent',
+    'HeartBeatIndex',
+    'RRIntervalSeries',
+    'LinkQualityMonitor',
+    'CaptureIndex',
+    'MappedCaptureReader',
+    'MappedPageMessageCollection',
+    'create_received_page',
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'HistogramSnapshot',
+    'MetricsRegistry',
+    'MetricsServer',
+    'MetricsSnapshot',
     'PageMessageCollection',
-    'filter_hrm_messages_by_toggle_bit_change'
+    'PageMessageCollectionView',
+    'RetentionPolicy',
+    'RingPageMessageCollection',
+    'PageRequest',
+    'PageRequestResult',
+    'LatencyPercentiles',
+    'RequestLatencyTracker',
+    'StreamingViolation',
+    'BaseStreamingValidator',
+    'BeatCountContinuityValidator',
+    'HeartBeatEventTimeValidator',
+    'PacketLossValidator',
+    'RssiValidator',
+    'BackgroundPageCadenceValidator',
+    'StreamingValidationRunner',
+    'filter_hrm_messages_by_toggle_bit_change',
+    'TransmitScheduler',
+    'TransmitSchedulerStatistics',
+    'HrmTransmissionPattern',
+    'HrmTransmissionPatternAlignment',
+    'HrmTransmissionPhaseEstimator',
+    'TransmissionPatternDeviation',
 ]
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import collections
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, NamedTuple, Union
+
+from .channel_event_log import AntChannelEvent
+
+logger = logging.getLogger(__name__)
+
+
+class AckTransferFailedError(Exception):
+    """error that is set on the future of an ACK transfer that could not be completed"""
+
+
+class AckTransferResult(NamedTuple):
+    """
+    Result of a successfully completed ACK transfer
+    """
+    #: the monotonic ``time.perf_counter()`` timestamp the first attempt was handed over to the ANT device
+    sent_timestamp: float
+    #: the monotonic ``time.perf_counter()`` timestamp the TRANSFER_TX_COMPLETED event was received at
+    completed_timestamp: float
+    #: the number of attempts that were needed
+    attempts: int
+
+    @property
+    def transfer_time_sec(self) -> float:
+        """
+        :return: the time between handing over the first attempt and the completion of the transfer in seconds
+        """
+        return self.completed_timestamp - self.sent_timestamp
+
+
+class _PendingAckTransfer:
+
+    def __init__(self, raw_data: bytes, max_retries: int, retry_backoff_sec: float):
+        self.raw_data = raw_data
+        self.max_retries = max_retries
+        self.retry_backoff_sec = retry_backoff_sec
+        self.future = Future()
+        self.attempts = 0
+        self.sent_timestamp = None
+
+
+class AckTransferQueue:
+    """
+    Manages the ACK transfers of one channel. The ANT device can only handle one ACK transfer per channel at the same
+    time, so all transfers are queued and handed over one after another. Every transfer is represented by a
+    ``concurrent.futures.Future``, that is resolved as soon as the ANT device reports the TRANSFER_TX_COMPLETED or the
+    TRANSFER_TX_FAILED event (see :meth:`AckTransferQueue.on_channel_event`).
+
+    Failed transfers are retried with an exponential backoff. The future fails with :class:`AckTransferFailedError`
+    as soon as all retries are exhausted.
+
+    The send callback can queue the raw data before it is handed over to the ANT device (f.e. within a
+    :class:`TransmitScheduler`). Its owner reports the moment the data is really handed over with
+    :meth:`AckTransferQueue.notify_handed_over` (or a failed handover with
+    :meth:`AckTransferQueue.notify_handover_failed`) - channel events are only assigned to a transfer after that. The
+    send callback is also executed within the thread that reports the channel events, so it must not block.
+    """
+
+    def __init__(
+            self,
+            send_callback: Callable[[bytes], None],
+            max_retries: int = 3,
+            retry_backoff_sec: float = 0.25,
+            backoff_factor: float = 2.
+    ):
+        """
+        :param send_callback: the callback that hands over the raw data of one transfer to the ANT device (it must not
+                              block and needs to make sure that :meth:`AckTransferQueue.notify_handed_over` is called
+                              at the moment of the handover)
+        :param max_retries: the default number of retries for a failed transfer
+        :param retry_backoff_sec: the default time to wait before the first retry
+        :param backoff_factor: the factor the waiting time is multiplied with for every further retry
+        """
+        self._send_callback = send_callback
+        self._max_retries = max_retries
+        self._retry_backoff_sec = retry_backoff_sec
+        self._backoff_factor = backoff_factor
+        self._lock = threading.Lock()
+        self._pending: collections.deque[_PendingAckTransfer] = collections.deque()
+        self._retry_timer: Union[threading.Timer, None] = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<pending={len(self._pending)}>"
+
+    @property
+    def pending_count(self) -> int:
+        """
+        :return: the number of transfers that are not resolved yet (including the active one)
+        """
+        return len(self._pending)
+
+    def submit(
+            self,
+            raw_data: bytes,
+            max_retries: Union[int, None] = None,
+            retry_backoff_sec: Union[float, None] = None
+    ) -> Future:
+        """
+        Queues a new ACK transfer.
+
+        :param raw_data: the raw data that should be sent
+        :param max_retries: the number of retries for this transfer (uses the default of the queue if None)
+        :param retry_backoff_sec: the time to wait before the first retry (uses the default of the queue if None)
+        :return: the future that resolves with an :class:`AckTransferResult` as soon as the transfer is completed
+        """
+        transfer = _PendingAckTransfer(
+            bytes(raw_data),
+            max_retries=self._max_retries if max_retries is None else max_retries,
+            retry_backoff_sec=self._retry_backoff_sec if retry_backoff_sec is None else retry_backoff_sec,
+        )
+        with self._lock:
+            self._pending.append(transfer)
+            start = len(self._pending) == 1
+        if start:
+            self._send(transfer)
+        return transfer.future
+
+    def _send(self, transfer: _PendingAckTransfer) -> None:
+        transfer.attempts += 1
+        try:
+            self._send_callback(transfer.raw_data)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self._finish(transfer, exc=self._create_handover_error(exc))
+
+    @staticmethod
+    def _create_handover_error(exc: Exception) -> AckTransferFailedError:
+        error = AckTransferFailedError(f'ACK transfer could not be handed over to the ANT device: {exc}')
+        error.__cause__ = exc
+        return error
+
+    def _finish(
+            self,
+            transfer: _PendingAckTransfer,
+            result: Union[AckTransferResult, None] = None,
+            exc: Union[BaseException, None] = None
+    ) -> None:
+        with self._lock:
+            if not self._pending or self._pending[0] is not transfer:
+                return
+            self._pending.popleft()
+            next_transfer = self._pending[0] if self._pending else None
+        if exc is None:
+            transfer.future.set_result(result)
+        else:
+            transfer.future.set_exception(exc)
+        if next_transfer is not None:
+            self._send(next_transfer)
+
+    def _retry(self, transfer: _PendingAckTransfer) -> None:
+        with self._lock:
+            self._retry_timer = None
+            if not self._pending or self._pending[0] is not transfer:
+                return
+        self._send(transfer)
+
+    def notify_handed_over(self, timestamp: float) -> None:
+        """
+        Needs to be called as soon as the raw data of the active transfer is handed over to the ANT device. Only the
+        first attempt of a transfer defines its :meth:`AckTransferResult.sent_timestamp`.
+
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp the data was handed over at
+        """
+        with self._lock:
+            transfer = self._pending[0] if self._pending else None
+            if transfer is not None and transfer.sent_timestamp is None:
+                transfer.sent_timestamp = timestamp
+
+    def notify_handover_failed(self, exc: Exception) -> None:
+        """
+        Needs to be called if the raw data of the active transfer could not be handed over to the ANT device. The
+        transfer fails with an :class:`AckTransferFailedError` and the next transfer is started.
+
+        :param exc: the error that occurred while handing over the data
+        """
+        with self._lock:
+            transfer = self._pending[0] if self._pending else None
+        if transfer is not None:
+            self._finish(transfer, exc=self._create_handover_error(exc))
+
+    def on_channel_event(self, event: AntChannelEvent, timestamp: float) -> None:
+        """
+        Needs to be called for every channel event of the channel the transfers are sent in.
+
+        :param event: the channel event
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp the event was received at
+        """
+        with self._lock:
+            transfer = self._pending[0] if self._pending else None
+        if transfer is None or transfer.sent_timestamp is None:
+            return
+
+        if event == AntChannelEvent.TRANSFER_TX_COMPLETED:
+            self._finish(transfer, result=AckTransferResult(transfer.sent_timestamp, timestamp, transfer.attempts))
+        elif event == AntChannelEvent.TRANSFER_TX_FAILED:
+            if transfer.attempts > transfer.max_retries:
+                self._finish(transfer, exc=AckTransferFailedError(
+                    f'ACK transfer failed after {transfer.attempts} attempts'))
+                return
+            backoff = transfer.retry_backoff_sec * self._backoff_factor ** (transfer.attempts - 1)
+            logger.debug(f'ACK transfer failed (attempt {transfer.attempts}) - retry in {backoff:.3f} seconds')
+            with self._lock:
+                self._retry_timer = threading.Timer(backoff, self._retry, args=(transfer,))
+                self._retry_timer.daemon = True
+                self._retry_timer.start()
+        elif event == AntChannelEvent.CHANNEL_CLOSED:
+            self.cancel_all('channel was closed')
+
+    def cancel_all(self, reason: str) -> None:
+        """
+        Fails all pending transfers with an :class:`AckTransferFailedError`.
+
+        :param reason: the reason that is added to the error message
+        """
+        with self._lock:
+            if self._retry_timer is not None:
+                self._retry_timer.cancel()
+                self._retry_timer = None
+            pending = list(self._pending)
+            self._pending.clear()
+        for transfer in pending:
+            transfer.future.set_exception(AckTransferFailedError(f'ACK transfer was cancelled: {reason}'))
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import enum
+import json
+import os
+import struct
+from datetime import datetime
+from typing import BinaryIO, Iterator, NamedTuple, Union
+
+from .clock_anchor import ClockAnchor
+from .extended_data import FlaggedExtendedData, parse_flagged_extended_data
+
+#: magic bytes every capture file starts with
+CAPTURE_MAGIC = b'BHANTCAP'
+#: version of the capture format that is written by :class:`CaptureWriter`
+CAPTURE_VERSION = 1
+#: size of the payload of every record in bytes
+CAPTURE_PAYLOAD_SIZE = 8
+#: maximum size of the extended data of one record in bytes (the length is stored in one byte)
+CAPTURE_MAX_EXTENDED_DATA_SIZE = 255
+
+# magic, version, length of the JSON header
+_FILE_HEADER_STRUCT = struct.Struct('<8sHI')
+# monotonic timestamp, record kind, channel number, length of the extended data
+_RECORD_HEADER_STRUCT = struct.Struct('<dBBB')
+# wait call, timed out, waited seconds
+_WAIT_PAYLOAD_STRUCT = struct.Struct('<B?2xf')
+
+
+class RecordKind(enum.IntEnum):
+    """
+    Kind of a record within a capture file
+    """
+    BROADCAST = 0
+    ACK = 1
+    BURST = 2
+    #: channel event - the first payload byte holds the event code
+    EVENT = 3
+    #: BROADCAST message that was sent by the controller
+    SENT_BROADCAST = 4
+    #: ACK message that was sent by the controller
+    SENT_ACK = 5
+    #: wait call of the controller - the payload is packed with :func:`pack_wait_payload`
+    WAIT = 6
+
+
+class WaitCall(enum.IntEnum):
+    """
+    Wait method of the controller, that is described by a :attr:`RecordKind.WAIT` record
+    """
+    OBSERVE_CHANNEL = 0
+    WAIT_FOR_BROADCAST_MESSAGE = 1
+    WAIT_FOR_ACK_MESSAGE = 2
+
+
+class CaptureRecord(NamedTuple):
+    """
+    One record of a capture file
+    """
+    #: the monotonic ``time.perf_counter()`` timestamp the message was received at
+    timestamp: float
+    #: the kind of the record
+    kind: RecordKind
+    #: the number of the channel the message was received in
+    channel: int
+    #: the 8 payload bytes of the message
+    payload: bytes
+    #: the raw extended data of the message (empty if the message was received without extended data)
+    extended_data: bytes = b''
+
+    @property
+    def size(self) -> int:
+        """
+        :return: the number of bytes this record needs within the capture file
+        """
+        return _RECORD_HEADER_STRUCT.size + CAPTURE_PAYLOAD_SIZE + len(self.extended_data)
+
+    def parse_flagged_extended_data(self) -> Union[FlaggedExtendedData, None]:
+        """
+        :return: the parsed extended data (if it was recorded in the flagged format) or None if the record has no
+                 extended data
+        """
+        if not self.extended_data:
+            return None
+        return parse_flagged_extended_data(self.extended_data, offset=0)
+
+
+class CaptureHeader(NamedTuple):
+    """
+    Header of a capture file, that describes the recorded channel session
+    """
+    #: the clock anchor of the recorded session (maps the record timestamps to the wall clock)
+    clock_anchor: ClockAnchor
+    #: the configuration of the channel and the recorded device (f.e. device number, device type, channel period)
+    device_config: dict
+    #: the format the extended data was requested in (``flagged``, ``legacy`` or ``none``)
+    extended_format: str = 'flagged'
+
+    def to_json_bytes(self) -> bytes:
+        """
+        :return: the JSON representation of the header (as it is stored within the capture file)
+        """
+        return json.dumps({
+            'clock_anchor': {
+                'perf_counter_ref': self.clock_anchor.perf_counter_ref,
+                'wall_clock_ref': self.clock_anchor.wall_clock_ref.isoformat(),
+            },
+            'device_config': self.device_config,
+            'extended_format': self.extended_format,
+        }).encode('utf-8')
+
+    @classmethod
+    def from_json_bytes(cls, data: bytes) -> CaptureHeader:
+        """
+        Creates the header out of its JSON representation.
+
+        :param data: the JSON representation
+        :return: the header
+        """
+        values = json.loads(data.decode('utf-8'))
+        return cls(
+            clock_anchor=ClockAnchor(
+                perf_counter_ref=values['clock_anchor']['perf_counter_ref'],
+                wall_clock_ref=datetime.fromisoformat(values['clock_anchor']['wall_clock_ref']),
+            ),
+            device_config=values['device_config'],
+            extended_format=values['extended_format'],
+        )
+
+
+def pack_wait_payload(call: WaitCall, waited_sec: float, timed_out: bool = False) -> bytes:
+    """
+    :param call: the wait method that was called
+    :param waited_sec: the time in seconds the call has waited
+    :param timed_out: True if the call ended with a timeout
+    :return: the payload of a :attr:`RecordKind.WAIT` record (the timestamp of the record is the start of the call)
+    """
+    return _WAIT_PAYLOAD_STRUCT.pack(call, timed_out, waited_sec)
+
+
+def unpack_wait_payload(payload: bytes) -> tuple[WaitCall, float, bool]:
+    """
+    :param payload: the payload of a :attr:`RecordKind.WAIT` record
+    :return: a tuple with the wait method that was called, the time in seconds it has waited and True if it ended with
+             a timeout
+    """
+    call, timed_out, waited_sec = _WAIT_PAYLOAD_STRUCT.unpack(payload)
+    return WaitCall(call), waited_sec, timed_out
+
+
+def pack_record(record: CaptureRecord) -> bytes:
+    """
+    :param record: the record that should be packed
+    :return: the binary representation of the record, as it is stored within a capture file
+    """
+    if len(record.payload) != CAPTURE_PAYLOAD_SIZE:
+        raise ValueError(f'expected a payload of {CAPTURE_PAYLOAD_SIZE} bytes, but got {len(record.payload)} bytes')
+    if len(record.extended_data) > CAPTURE_MAX_EXTENDED_DATA_SIZE:
+        raise ValueError(f'expected at most {CAPTURE_MAX_EXTENDED_DATA_SIZE} bytes of extended data, but got '
+                         f'{len(record.extended_data)} bytes')
+    return (_RECORD_HEADER_STRUCT.pack(record.timestamp, record.kind, record.channel, len(record.extended_data))
+            + bytes(record.payload) + bytes(record.extended_data))
+
+
+def unpack_record_from(buffer: Union[bytes, memoryview], offset: int) -> Union[tuple[CaptureRecord, int], None]:
+    """
+    Unpacks one record out of a buffer.
+
+    :param buffer: the buffer that holds the record
+    :param offset: the offset of the record within the buffer
+    :return: a tuple with the record and the offset of the next record or None if the buffer does not hold the complete
+             record (f.e. the last record of a capture that was not closed properly)
+    """
+    payload_start = offset + _RECORD_HEADER_STRUCT.size
+    if payload_start > len(buffer):
+        return None
+    timestamp, kind, channel, ext_len = _RECORD_HEADER_STRUCT.unpack_from(buffer, offset)
+    ext_start = payload_start + CAPTURE_PAYLOAD_SIZE
+    end = ext_start + ext_len
+    if end > len(buffer):
+        return None
+    record = CaptureRecord(
+        timestamp, RecordKind(kind), channel, bytes(buffer[payload_start:ext_start]), bytes(buffer[ext_start:end])
+    )
+    return record, end
+
+
+class CaptureWriter:
+    """
+    Streaming writer for capture files. A capture file starts with a file header (magic bytes, format version and the
+    JSON encoded :class:`CaptureHeader`) followed by the records. Every record consists of a fixed 11 byte record header
+    (monotonic timestamp, kind, channel and length of the extended data), the 8 payload bytes and the raw extended
+    data. The file is append-only, so a capture that was not closed properly can still be read up to the last complete
+    record.
+    """
+
+    def __init__(self, file: Union[str, os.PathLike, BinaryIO], header: CaptureHeader, buffer_size: int = 64 * 1024):
+        """
+        :param file: the path of the new capture file or an already opened binary file object
+        :param header: the header that describes the recorded session
+        :param buffer_size: the size of the write buffer in bytes (only used if a path is given)
+        """
+        self._owns_file = not hasattr(file, 'write')
+        # pylint: disable-next=consider-using-with
+        self._file: BinaryIO = open(file, 'wb', buffering=buffer_size) if self._owns_file else file
+        self._header = header
+        self._record_count = 0
+        header_bytes = header.to_json_bytes()
+        self._file.write(_FILE_HEADER_STRUCT.pack(CAPTURE_MAGIC, CAPTURE_VERSION, len(header_bytes)))
+        self._file.write(header_bytes)
+        self._bytes_written = _FILE_HEADER_STRUCT.size + len(header_bytes)
+
+    def __enter__(self) -> CaptureWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def header(self) -> CaptureHeader:
+        """
+        :return: the header of the capture
+        """
+        return self._header
+
+    @property
+    def record_count(self) -> int:
+        """
+        :return: the number of records written so far
+        """
+        return self._record_count
+
+    @property
+    def bytes_written(self) -> int:
+        """
+        :return: the number of bytes written so far (including the file header)
+        """
+        return self._bytes_written
+
+    @property
+    def closed(self) -> bool:
+        """
+        :return: True if the writer was closed
+        """
+        return self._file.closed
+
+    def write(self, record: CaptureRecord) -> None:
+        """
+        Appends one record.
+
+        :param record: the record that should be written
+        """
+        self.write_packed(pack_record(record), record_count=1)
+
+    def write_packed(self, data: Union[bytes, bytearray, memoryview], record_count: int) -> None:
+        """
+        Appends already packed records (see :func:`pack_record`) with one single write call.
+
+        :param data: the packed records
+        :param record_count: the number of records within ``data``
+        """
+        self._file.write(data)
+        self._record_count += record_count
+        self._bytes_written += len(data)
+
+    def flush(self, fsync: bool = False) -> None:
+        """
+        Flushes the written records to the operating system.
+
+        :param fsync: True if the data should also be written to the disk
+        """
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """
+        Flushes all records and closes the file (only if the file was opened by this writer).
+        """
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
+
+
+class CaptureReader:
+    """
+    Streaming reader for capture files (see :class:`CaptureWriter` for the format). The records are read in chunks, so
+    the memory usage does not depend on the size of the capture.
+    """
+
+    def __init__(self, file: Union[str, os.PathLike, BinaryIO], chunk_size: int = 64 * 1024):
+        """
+        :param file: the path of the capture file or an already opened binary file object
+        :param chunk_size: the number of bytes that are read at once
+        """
+        self._owns_file = not hasattr(file, 'read')
+        # pylint: disable-next=consider-using-with
+        self._file: BinaryIO = open(file, 'rb') if self._owns_file else file
+        self._chunk_size = chunk_size
+        file_header = self._file.read(_FILE_HEADER_STRUCT.size)
+        file_header += self._file.read(_unpack_file_header(file_header))
+        self._header, self._records_offset = unpack_capture_header(file_header)
+
+    def __enter__(self) -> CaptureReader:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def header(self) -> CaptureHeader:
+        """
+        :return: the header of the capture
+        """
+        return self._header
+
+    @property
+    def records_offset(self) -> int:
+        """
+        :return: the offset of the first record within the file
+        """
+        return self._records_offset
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        self._file.seek(self._records_offset)
+        buffer = b''
+        offset = 0
+        while True:
+            chunk = self._file.read(self._chunk_size)
+            if not chunk:
+                # an incomplete record at the end of the file is ignored
+                return
+            buffer = buffer[offset:] + chunk
+            offset = 0
+            while True:
+                unpacked = unpack_record_from(buffer, offset)
+                if unpacked is None:
+                    break
+                record, offset = unpacked
+                yield record
+
+    def close(self) -> None:
+        """
+        Closes the file (only if the file was opened by this reader).
+        """
+        if self._owns_file and not self._file.closed:
+            self._file.close()
+
+
+def _unpack_file_header(buffer: Union[bytes, memoryview]) -> int:
+    if len(buffer) < _FILE_HEADER_STRUCT.size:
+        raise ValueError('file is too short to be a capture file')
+    magic, version, header_len = _FILE_HEADER_STRUCT.unpack_from(buffer, 0)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError(f'file is no capture file (unexpected magic bytes {bytes(magic)!r})')
+    if version != CAPTURE_VERSION:
+        raise ValueError(f'unsupported capture version {version} (supported version is {CAPTURE_VERSION})')
+    return header_len
+
+
+def unpack_capture_header(buffer: Union[bytes, memoryview]) -> tuple[CaptureHeader, int]:
+    """
+    Validates the file header of a capture and unpacks the :class:`CaptureHeader`.
+
+    :param buffer: a buffer that starts with the beginning of the capture file
+    :return: a tuple with the header and the offset of the first record
+    """
+    header_len = _unpack_file_header(buffer)
+    records_offset = _FILE_HEADER_STRUCT.size + header_len
+    if len(buffer) < records_offset:
+        raise ValueError('capture header is incomplete')
+    return CaptureHeader.from_json_bytes(bytes(buffer[_FILE_HEADER_STRUCT.size:records_offset])), records_offset
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import collections
+import logging
+import threading
+import time
+from typing import NamedTuple, Union
+
+from .capture_file import CAPTURE_MAX_EXTENDED_DATA_SIZE, CAPTURE_PAYLOAD_SIZE, CaptureRecord, CaptureWriter, \
+    RecordKind, pack_record
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureRecorderStatistics(NamedTuple):
+    """
+    Snapshot of the statistics of a :class:`CaptureRecorder`
+    """
+    #: the number of records that were handed over to the recorder
+    recorded_count: int
+    #: the number of records that were dropped because the buffer was full
+    dropped_count: int
+    #: the number of records that were written to the capture
+    written_count: int
+    #: the number of batched write calls
+    batch_count: int
+    #: the mean duration of one batched write call in seconds
+    mean_write_latency_sec: float
+    #: the maximum duration of one batched write call in seconds
+    max_write_latency_sec: float
+
+
+class _CaptureRecordBuffer:
+    """bounded buffer between the receive path and the background thread of a :class:`CaptureRecorder`"""
+
+    def __init__(self, max_size: int, batch_size: int):
+        self.records: collections.deque[CaptureRecord] = collections.deque()
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.wakeup = threading.Event()
+        self.recorded_count = 0
+        self.dropped_count = 0
+
+    def append(self, record: CaptureRecord) -> bool:
+        """
+        Appends a new record (or drops it if the buffer is full).
+
+        :param record: the new record
+        :return: True if the record was buffered or False if it was dropped
+        """
+        self.recorded_count += 1
+        if len(self.records) >= self.max_size:
+            self.dropped_count += 1
+            return False
+        self.records.append(record)
+        if len(self.records) >= self.batch_size:
+            self.wakeup.set()
+        return True
+
+    def pop_available(self) -> list[CaptureRecord]:
+        """
+        :return: all records that are available now (the receive path continues to append new records)
+        """
+        return [self.records.popleft() for _ in range(len(self.records))]
+
+    def restore(self, records: list[CaptureRecord]) -> None:
+        """
+        Puts records, that were popped with :meth:`_CaptureRecordBuffer.pop_available`, back in front of the buffer.
+
+        :param records: the popped records
+        """
+        self.records.extendleft(reversed(records))
+
+
+class _CaptureWriteStatistics:
+    """statistics of the batched write calls"""
+
+    def __init__(self):
+        self.written_count = 0
+        self.batch_count = 0
+        self.latency_sum = 0.
+        self.latency_max = 0.
+
+    def add_batch(self, record_count: int, latency: float) -> None:
+        """
+        Adds a written batch.
+
+        :param record_count: the number of records within the batch
+        :param latency: the duration of the write call in seconds
+        """
+        self.written_count += record_count
+        self.batch_count += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+
+
+class CaptureRecorder:
+    """
+    Records messages into a capture without slowing down the receive path. The receive callbacks only append the raw
+    message to a bounded buffer (:meth:`CaptureRecorder.record`), that is flushed by a background thread in large
+    batched writes. The written data is synced to the disk periodically, so that the raw evidence of a session is
+    already persisted when a long-running scenario fails.
+
+    If the buffer is full, new records are dropped (and counted) instead of blocking the receive path. Records that can
+    not be stored within a capture are rejected directly by :meth:`CaptureRecorder.record`, so that a batch never fails
+    after it was taken out of the buffer.
+    """
+
+    def __init__(
+            self,
+            writer: CaptureWriter,
+            max_buffered_records: int = 65536,
+            batch_size: int = 1024,
+            flush_interval_sec: float = 0.5,
+            fsync_interval_sec: float = 5.
+    ):
+        """
+        :param writer: the writer of the capture (is closed when the recorder stops)
+        :param max_buffered_records: the maximum number of records that are buffered before new records are dropped
+        :param batch_size: the number of buffered records that triggers a write before the flush interval is over
+        :param flush_interval_sec: the maximum time in seconds a record stays within the buffer
+        :param fsync_interval_sec: the interval in seconds the written data is synced to the disk
+        """
+        self._writer = writer
+        self._flush_interval_sec = flush_interval_sec
+        self._fsync_interval_sec = fsync_interval_sec
+
+        self._buffer = _CaptureRecordBuffer(max_size=max_buffered_records, batch_size=batch_size)
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+        self._statistics = _CaptureWriteStatistics()
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<recorded={self._buffer.recorded_count} "
+                f"| dropped={self._buffer.dropped_count} | written={self._statistics.written_count}>")
+
+    @property
+    def writer(self) -> CaptureWriter:
+        """
+        :return: the writer of the capture
+        """
+        return self._writer
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if the background thread is running
+        """
+        return self._running
+
+    def get_statistics(self) -> CaptureRecorderStatistics:
+        """
+        :return: a snapshot of the current statistics
+        """
+        statistics = self._statistics
+        return CaptureRecorderStatistics(
+            recorded_count=self._buffer.recorded_count,
+            dropped_count=self._buffer.dropped_count,
+            written_count=statistics.written_count,
+            batch_count=statistics.batch_count,
+            mean_write_latency_sec=statistics.latency_sum / statistics.batch_count if statistics.batch_count else 0.,
+            max_write_latency_sec=statistics.latency_max,
+        )
+
+    def start(self) -> None:
+        """
+        Starts the background thread
+        """
+        if self._running:
+            raise ValueError('recorder is already running')
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='ant-capture-recorder', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Writes all buffered records, stops the background thread and closes the writer.
+
+        :param timeout: the maximum time in seconds to wait for the background thread
+        """
+        if not self._running:
+            return
+        self._running = False
+        self._buffer.wakeup.set()
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            raise RuntimeError('capture recorder thread failed to shut down')
+        self._thread = None
+        self._writer.close()
+
+    def record(
+            self,
+            timestamp: float,
+            kind: RecordKind,
+            channel: int,
+            payload: bytes,
+            extended_data: bytes = b''
+    ) -> bool:
+        """
+        Hands over a new message to the recorder. This method never blocks. Messages with more than 8 payload bytes
+        (f.e. BURST transfers) need to be split into multiple records by the caller.
+
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp the message was received at
+        :param kind: the kind of the message
+        :param channel: the number of the channel the message was received in
+        :param payload: the 8 payload bytes of the message
+        :param extended_data: the raw extended data of the message
+        :return: True if the record was buffered or False if it was dropped
+        :raises ValueError: if the record can not be stored within a capture
+        """
+        if len(payload) != CAPTURE_PAYLOAD_SIZE:
+            raise ValueError(f'expected a payload of {CAPTURE_PAYLOAD_SIZE} bytes, but got {len(payload)} bytes')
+        if len(extended_data) > CAPTURE_MAX_EXTENDED_DATA_SIZE:
+            raise ValueError(f'expected at most {CAPTURE_MAX_EXTENDED_DATA_SIZE} bytes of extended data, but got '
+                             f'{len(extended_data)} bytes')
+        return self._buffer.append(CaptureRecord(timestamp, kind, channel, payload, extended_data))
+
+    def _write_batch(self) -> None:
+        records = self._buffer.pop_available()
+        if not records:
+            return
+        start = time.perf_counter()
+        try:
+            batch = b''.join(pack_record(record) for record in records)
+            self._writer.write_packed(batch, record_count=len(records))
+        except Exception:
+            # keep the batch, so that the records are written with the next batch (or dropped visibly if the buffer
+            # runs full)
+            self._buffer.restore(records)
+            raise
+        self._writer.flush()
+        self._statistics.add_batch(len(records), time.perf_counter() - start)
+
+    def _run(self) -> None:
+        last_fsync = time.perf_counter()
+        while self._running:
+            self._buffer.wakeup.wait(self._flush_interval_sec)
+            self._buffer.wakeup.clear()
+            try:
+                self._write_batch()
+                if time.perf_counter() - last_fsync >= self._fsync_interval_sec:
+                    self._writer.flush(fsync=True)
+                    last_fsync = time.perf_counter()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('failed to write captured records')
+        # write all remaining records
+        self._write_batch()
+        self._writer.flush(fsync=True)
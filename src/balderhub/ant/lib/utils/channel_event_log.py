@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import array
+import bisect
+import enum
+from typing import Iterator, NamedTuple, Union
+
+import numpy as np
+
+
+class AntChannelEvent(enum.IntEnum):
+    """
+    Channel event codes the ANT device reports within a channel RESPONSE/EVENT message
+    """
+    RX_SEARCH_TIMEOUT = 0x01
+    RX_FAIL = 0x02
+    TX = 0x03
+    TRANSFER_RX_FAILED = 0x04
+    TRANSFER_TX_COMPLETED = 0x05
+    TRANSFER_TX_FAILED = 0x06
+    CHANNEL_CLOSED = 0x07
+    RX_FAIL_GO_TO_SEARCH = 0x08
+    CHANNEL_COLLISION = 0x09
+    TRANSFER_TX_START = 0x0A
+
+
+class ChannelEvent(NamedTuple):
+    """
+    One recorded channel event
+    """
+    #: the monotonic ``time.perf_counter()`` timestamp the event was received at
+    timestamp: float
+    #: the event code
+    event: AntChannelEvent
+
+
+class ChannelEventLog:
+    """
+    Compact log of all channel events of one channel session. The events are stored in two flat arrays (one for the
+    timestamps and one for the event codes) and a counter is maintained for every event code, so that the counts are
+    available without iterating over the log.
+    """
+
+    def __init__(self):
+        self._timestamps = array.array('d')
+        self._codes = array.array('B')
+        self._counters = [0] * 256
+        self._discarded_count = 0
+
+    def __repr__(self):
+        counters = ', '.join(f'{event.name}={count}' for event, count in self.counters.items() if count)
+        return f"{self.__class__.__name__}<{counters}>"
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, item: int) -> ChannelEvent:
+        return ChannelEvent(self._timestamps[item], AntChannelEvent(self._codes[item]))
+
+    def __iter__(self) -> Iterator[ChannelEvent]:
+        for timestamp, code in zip(self._timestamps, self._codes):
+            yield ChannelEvent(timestamp, AntChannelEvent(code))
+
+    @property
+    def counters(self) -> dict[AntChannelEvent, int]:
+        """
+        :return: the number of recorded events for every known event code (including the discarded events)
+        """
+        return {event: self._counters[event] for event in AntChannelEvent}
+
+    @property
+    def discarded_count(self) -> int:
+        """
+        :return: the number of events that were discarded so far
+        """
+        return self._discarded_count
+
+    @property
+    def last_event(self) -> Union[ChannelEvent, None]:
+        """
+        :return: the last recorded event or None if no event was recorded yet
+        """
+        if not self._codes:
+            return None
+        return self[-1]
+
+    def append(self, event: Union[AntChannelEvent, int], timestamp: float) -> None:
+        """
+        Records a new event. Events need to be provided in the order they were received.
+
+        :param event: the event code
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp the event was received at
+        """
+        if self._timestamps and timestamp < self._timestamps[-1]:
+            raise ValueError('events need to be provided in the order they were received')
+        self._timestamps.append(timestamp)
+        self._codes.append(event)
+        self._counters[event] += 1
+
+    def discard_before(self, timestamp: float) -> int:
+        """
+        Discards all events that were received before the given timestamp. The counters keep considering them.
+
+        :param timestamp: the monotonic timestamp of the first event that should be kept
+        :return: the number of discarded events
+        """
+        count = bisect.bisect_left(self._timestamps, timestamp)
+        if count:
+            del self._timestamps[:count]
+            del self._codes[:count]
+            self._discarded_count += count
+        return count
+
+    def get_count(
+            self,
+            event: AntChannelEvent,
+            start_timestamp: Union[float, None] = None,
+            end_timestamp: Union[float, None] = None
+    ) -> int:
+        """
+        :param event: the event code that should be counted
+        :param start_timestamp: if given, only events received at or after this monotonic timestamp are counted
+        :param end_timestamp: if given, only events received before this monotonic timestamp are counted
+        :return: the number of recorded events of the given code (discarded events are only considered if no time range
+                 is given)
+        """
+        if start_timestamp is None and end_timestamp is None:
+            return self._counters[event]
+        start_idx = 0 if start_timestamp is None else bisect.bisect_left(self._timestamps, start_timestamp)
+        end_idx = len(self._timestamps) if end_timestamp is None else bisect.bisect_left(self._timestamps,
+                                                                                           end_timestamp)
+        return int(np.count_nonzero(self.get_code_column()[start_idx:end_idx] == event))
+
+    def get_timestamp_column(self, event: Union[AntChannelEvent, None] = None) -> np.ndarray:
+        """
+        :param event: if given, only the timestamps of this event code are returned
+        :return: a float64 array with the monotonic timestamps of the recorded events
+        """
+        timestamps = np.array(self._timestamps, dtype=np.float64)
+        if event is None:
+            return timestamps
+        return timestamps[self.get_code_column() == event]
+
+    def get_code_column(self) -> np.ndarray:
+        """
+        :return: an uint8 array with the codes of all recorded events
+        """
+        return np.array(self._codes, dtype=np.uint8)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import logging
+from typing import Callable, Union, TYPE_CHECKING
+
+from .channel_event_log import AntChannelEvent, ChannelEventLog
+from .clock_anchor import ClockAnchor
+from .gap_index import GapIndex
+from .link_quality import LinkQualityMonitor
+from .page_message_collection import PageMessageCollection, RetentionPolicy, RingPageMessageCollection
+
+if TYPE_CHECKING:
+    from .pages.base_received_antplus_page import BaseReceivedAntplusPage
+
+logger = logging.getLogger(__name__)
+
+
+class AntplusChannelSession:
+    """
+    Holds everything a controller receives within one channel session (from opening the channel till it is closed):
+    the received messages, the channel events and all statistics that are derived from them incrementally.
+
+    The session only collects the data - the controller that owns it decides when messages are added (see
+    :meth:`AntplusControllerFeature.session`).
+    """
+
+    def __init__(
+            self,
+            channel_period_sec: float,
+            retention_policy: Union[RetentionPolicy, None] = None,
+            clock_anchor: Union[ClockAnchor, None] = None,
+            broadcast_message_callbacks: Union[list[Callable[[BaseReceivedAntplusPage], None]], None] = None
+    ):
+        """
+        :param channel_period_sec: the channel period in seconds (used to detect missing messages)
+        :param retention_policy: the policy that defines which of the received messages are retained or None if all
+                                 messages of the session should be retained
+        :param clock_anchor: the clock anchor that maps the monotonic timestamps of the session to the wall clock
+                             (anchored now if None)
+        :param broadcast_message_callbacks: the callbacks that should be registered initially (f.e. the callbacks of
+                                            the previous session of the controller)
+        """
+        if retention_policy is None:
+            self._broadcast_messages = PageMessageCollection()
+            self._ack_messages = PageMessageCollection()
+        else:
+            self._broadcast_messages = RingPageMessageCollection(retention_policy)
+            self._ack_messages = RingPageMessageCollection(retention_policy)
+        self._broadcast_page_counts: dict[type[BaseReceivedAntplusPage], int] = {}
+        self._channel_event_log = ChannelEventLog()
+        self._clock_anchor = ClockAnchor.create_now() if clock_anchor is None else clock_anchor
+        # the monitor detects the missing messages of the session with the gap index of the session
+        self._link_quality_monitor = LinkQualityMonitor(
+            channel_period_sec=channel_period_sec, gap_index=GapIndex(channel_period_sec=channel_period_sec))
+        self._broadcast_message_callbacks: list[Callable[[BaseReceivedAntplusPage], None]] = \
+            [] if broadcast_message_callbacks is None else list(broadcast_message_callbacks)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<broadcast={self.broadcast_count} | ack={len(self._ack_messages)} "
+                f"| events={len(self._channel_event_log)}>")
+
+    @property
+    def channel_period_sec(self) -> float:
+        """
+        :return: the channel period in seconds
+        """
+        return self.gap_index.channel_period_sec
+
+    @property
+    def broadcast_messages(self) -> PageMessageCollection:
+        """
+        :return: the BROADCAST messages of the session (only the retained ones, if a retention policy is defined)
+        """
+        return self._broadcast_messages
+
+    @property
+    def ack_messages(self) -> PageMessageCollection:
+        """
+        :return: the ACK messages of the session (only the retained ones, if a retention policy is defined)
+        """
+        return self._ack_messages
+
+    @property
+    def broadcast_count(self) -> int:
+        """
+        :return: the number of BROADCAST messages of the session (including the messages that are not retained anymore)
+        """
+        return self.gap_index.received_count
+
+    @property
+    def broadcast_page_counts(self) -> dict[type[BaseReceivedAntplusPage], int]:
+        """
+        :return: a copy of the number of BROADCAST messages per page type (including the messages that are not retained
+                 anymore)
+        """
+        return self._broadcast_page_counts.copy()
+
+    @property
+    def channel_event_log(self) -> ChannelEventLog:
+        """
+        :return: the log of all channel events (f.e. RX_FAIL or TRANSFER_TX_COMPLETED) of the session
+        """
+        return self._channel_event_log
+
+    @property
+    def clock_anchor(self) -> ClockAnchor:
+        """
+        :return: the clock anchor that maps the monotonic timestamps of all messages of the session to the wall clock
+        """
+        return self._clock_anchor
+
+    @property
+    def link_quality_monitor(self) -> LinkQualityMonitor:
+        """
+        :return: the monitor that holds the RSSI link-quality statistics of all BROADCAST messages of the session
+        """
+        return self._link_quality_monitor
+
+    @property
+    def gap_index(self) -> GapIndex:
+        """
+        :return: the index of all missing BROADCAST messages of the session (maintained incrementally with the monotonic
+                 host timestamps - the details of the gaps before the retained messages are discarded)
+        """
+        return self._link_quality_monitor.gap_index
+
+    def create_gap_index_for(
+            self,
+            messages: Union[PageMessageCollection, None] = None,
+            prefer_hw_timestamps: bool = True
+    ) -> GapIndex:
+        """
+        This method creates a gap index for the given messages in one vectorized pass.
+
+        :param messages: the messages the index should be created for (defaults to all retained BROADCAST messages)
+        :param prefer_hw_timestamps: True if the hardware timeline should be used, if all messages were received with
+                                     the hardware timestamp (the monotonic host timestamps are used otherwise)
+        :return: the new gap index
+        """
+        if messages is None:
+            messages = self._broadcast_messages
+        timestamps = None
+        if prefer_hw_timestamps:
+            try:
+                timestamps = messages.get_hw_timeline_column()
+            except ValueError:
+                logger.debug('not all messages provide a hardware timestamp - use host timestamps for gap detection')
+        if timestamps is None:
+            timestamps = messages.get_timestamp_column()
+        return GapIndex.from_timestamps(timestamps, channel_period_sec=self.channel_period_sec)
+
+    @property
+    def broadcast_message_callbacks(self) -> list[Callable[[BaseReceivedAntplusPage], None]]:
+        """
+        :return: a copy of all registered BROADCAST message callbacks
+        """
+        return self._broadcast_message_callbacks.copy()
+
+    def register_broadcast_message_callback(self, callback: Callable[[BaseReceivedAntplusPage], None]) -> None:
+        """
+        Registers a callback that is executed for every new BROADCAST message of the session after it was saved. The
+        callbacks are executed in the order the messages were received (also if they are not retained anymore).
+
+        :param callback: the callback that gets the new message
+        """
+        if callback in self._broadcast_message_callbacks:
+            raise ValueError(f'callback {callback} is already registered')
+        self._broadcast_message_callbacks.append(callback)
+
+    def unregister_broadcast_message_callback(self, callback: Callable[[BaseReceivedAntplusPage], None]) -> None:
+        """
+        Removes a callback that was registered with :meth:`AntplusChannelSession.register_broadcast_message_callback`.
+
+        :param callback: the registered callback
+        """
+        if callback in self._broadcast_message_callbacks:
+            self._broadcast_message_callbacks.remove(callback)
+
+    def add_broadcast_message(self, message: BaseReceivedAntplusPage) -> int:
+        """
+        Adds a new BROADCAST message and updates all statistics with it (messages need to be added in receive order).
+        The registered callbacks are not executed (see :meth:`AntplusChannelSession.dispatch_broadcast_message`).
+
+        :param message: the received message
+        :return: the index of the message within all BROADCAST messages of the session
+        """
+        page_idx = self._broadcast_messages.append(message)
+        self._broadcast_page_counts[message.__class__] = self._broadcast_page_counts.get(message.__class__, 0) + 1
+        # also updates the gap index
+        self._link_quality_monitor.update(message)
+        return page_idx
+
+    def dispatch_broadcast_message(self, message: BaseReceivedAntplusPage) -> None:
+        """
+        Executes all registered callbacks for a BROADCAST message, that was added before.
+
+        :param message: the added message
+        """
+        for callback in self._broadcast_message_callbacks:
+            callback(message)
+
+    def add_ack_message(self, message: BaseReceivedAntplusPage) -> int:
+        """
+        Adds a new ACK message (messages need to be added in receive order).
+
+        :param message: the received message
+        :return: the index of the message within all ACK messages of the session
+        """
+        return self._ack_messages.append(message)
+
+    def add_channel_event(self, event: AntChannelEvent, timestamp: float) -> None:
+        """
+        Adds a new channel event (events need to be added in receive order).
+
+        :param event: the received event code
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp the event was received at
+        """
+        self._channel_event_log.append(event, timestamp)
+
+    def discard_before(self, idx: int) -> None:
+        """
+        Discards the details of all data, that is derived from the BROADCAST messages before the given one. The
+        aggregated values (f.e. counters) keep considering them.
+
+        :param idx: the session index of the first retained BROADCAST message
+        """
+        if idx == 0:
+            return
+        self.gap_index.discard_before(idx)
+        self._channel_event_log.discard_before(self._broadcast_messages[0].monotonic_timestamp)
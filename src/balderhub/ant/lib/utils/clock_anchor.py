@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+from typing import Union
+
+
+class ClockAnchor:
+    """
+    Maps the monotonic ``time.perf_counter()`` clock, that is used for all internal timestamps, to the wall clock. The
+    mapping is determined once (when creating the anchor), so that every conversion of the same monotonic timestamp
+    results in the same datetime.
+    """
+    _default: Union[ClockAnchor, None] = None
+
+    def __init__(self, perf_counter_ref: float, wall_clock_ref: datetime):
+        """
+        :param perf_counter_ref: the ``time.perf_counter()`` value at the moment of ``wall_clock_ref``
+        :param wall_clock_ref: the wall clock time at the moment of ``perf_counter_ref``
+        """
+        self._perf_counter_ref = perf_counter_ref
+        self._wall_clock_ref = wall_clock_ref
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self._perf_counter_ref:.6f} <-> {self._wall_clock_ref.isoformat()}>"
+
+    @classmethod
+    def create_now(cls) -> ClockAnchor:
+        """
+        :return: a new clock anchor that is created for the current moment
+        """
+        return cls(perf_counter_ref=time.perf_counter(), wall_clock_ref=datetime.now())
+
+    @classmethod
+    def get_default(cls) -> ClockAnchor:
+        """
+        :return: the process wide clock anchor that is used for all objects that were not created with an own anchor
+        """
+        if ClockAnchor._default is None:
+            ClockAnchor._default = cls.create_now()
+        return ClockAnchor._default
+
+    @property
+    def perf_counter_ref(self) -> float:
+        """
+        :return: the ``time.perf_counter()`` reference value of this anchor
+        """
+        return self._perf_counter_ref
+
+    @property
+    def wall_clock_ref(self) -> datetime:
+        """
+        :return: the wall clock reference value of this anchor
+        """
+        return self._wall_clock_ref
+
+    def to_datetime(self, monotonic_timestamp: float) -> datetime:
+        """
+        Converts a monotonic timestamp into the wall clock time.
+
+        :param monotonic_timestamp: the ``time.perf_counter()`` based timestamp
+        :return: the according wall clock time
+        """
+        return self._wall_clock_ref + timedelta(seconds=monotonic_timestamp - self._perf_counter_ref)
+
+    def to_monotonic(self, wall_clock_time: datetime) -> float:
+        """
+        Converts a wall clock time into a monotonic timestamp.
+
+        :param wall_clock_time: the wall clock time
+        :return: the according ``time.perf_counter()`` based timestamp
+        """
+        return self._perf_counter_ref + (wall_clock_time - self._wall_clock_ref).total_seconds()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import Iterable, Union
+
+import numpy as np
+
+
+def unwrap_counter(values: Union[Iterable[int], np.ndarray], bit_width: int) -> np.ndarray:
+    """
+    Unwraps a column of N-bit rollover counters (like the 8 bit heart beat count, the 16 bit heart beat event time or
+    the 24 bit cumulative operating time) into a monotonic increasing counter.
+
+    .. note::
+        Every difference between two consecutive values is interpreted as the smallest forward step modulo
+        ``2**bit_width``. This is only correct as long as the counter does not roll over more than once between two
+        consecutive values.
+
+    :param values: the raw counter values in receive order
+    :param bit_width: the bit width of the counter
+    :return: a new int64 array with the unwrapped values (the first value is kept as it is)
+    """
+    raw = np.asarray(values, dtype=np.int64)
+    if raw.ndim != 1:
+        raise ValueError(f'can only unwrap one dimensional columns (got shape {raw.shape})')
+    if raw.size == 0:
+        return raw.copy()
+    steps = np.diff(raw) & ((1 << bit_width) - 1)
+    result = np.empty_like(raw)
+    result[0] = raw[0]
+    np.cumsum(steps, out=result[1:])
+    result[1:] += raw[0]
+    return result
+
+
+class CounterUnwrapper:
+    """
+    Streaming counterpart of :func:`unwrap_counter`, that unwraps one raw N-bit counter value after another.
+    """
+
+    def __init__(self, bit_width: int):
+        self._bit_width = bit_width
+        self._mask = (1 << bit_width) - 1
+        self._last_value = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self._bit_width} bit | last-value={self._last_value}>"
+
+    @property
+    def bit_width(self) -> int:
+        """
+        :return: the bit width of the counter
+        """
+        return self._bit_width
+
+    @property
+    def last_value(self) -> Union[int, None]:
+        """
+        :return: the last unwrapped value or None if no value was provided till now
+        """
+        return self._last_value
+
+    def reset(self) -> None:
+        """
+        Resets the unwrapper - the next provided value is used as it is.
+        """
+        self._last_value = None
+
+    def update(self, raw_value: int) -> int:
+        """
+        Provides the next raw counter value.
+
+        :param raw_value: the raw N-bit counter value
+        :return: the unwrapped value
+        """
+        if self._last_value is None:
+            self._last_value = raw_value
+        else:
+            self._last_value += (raw_value - self._last_value) & self._mask
+        return self._last_value
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import struct
+from typing import Any, NamedTuple, Union
+
+import numpy as np
+
+from .extended_meta.base_extended_meta_flagged import BaseExtendedMetaFlagged
+from .extended_meta.extended_meta_flagged_channel_id import ExtendedMetaFlaggedChannelId
+from .extended_meta.extended_meta_flagged_rssi import ExtendedMetaFlaggedRssi
+from .extended_meta.extended_meta_flagged_timestamp import ExtendedMetaFlaggedTimestamp
+
+#: flag bit for the Channel ID information within the flagged extended data
+FLAG_CHANNEL_ID = 0x80
+#: flag bit for the RSSI information within the flagged extended data
+FLAG_RSSI = 0x40
+#: flag bit for the TIMESTAMP information within the flagged extended data
+FLAG_TIMESTAMP = 0x20
+
+# all supported flags with their struct format, the fields they provide and their meta class (in transmission order)
+_FLAG_DEFINITIONS = (
+    (FLAG_CHANNEL_ID, 'HBB', ('device_number', 'device_type', 'trans_type'), ExtendedMetaFlaggedChannelId),
+    (FLAG_RSSI, 'Bbb', ('rssi_measurement_type', 'rssi', 'rssi_threshold'), ExtendedMetaFlaggedRssi),
+    (FLAG_TIMESTAMP, 'H', ('hw_timestamp',), ExtendedMetaFlaggedTimestamp),
+)
+
+
+class ChannelId(NamedTuple):
+    """
+    Channel ID of the remote device a message was received from
+    """
+    #: the device number
+    device_number: int
+    #: the device type
+    device_type: int
+    #: the transmission type
+    trans_type: int
+
+
+class FlaggedExtendedData(NamedTuple):
+    """
+    Holds all information of the FLAGGED-EXTENDED-DATA a message was received with as plain fields. Every field is
+    None if the according flag was not set.
+    """
+    #: the flag byte
+    flags: int
+    #: the device number (Channel ID)
+    device_number: Union[int, None]
+    #: the device type (Channel ID)
+    device_type: Union[int, None]
+    #: the transmission type (Channel ID)
+    trans_type: Union[int, None]
+    #: the measurement type of the RSSI value
+    rssi_measurement_type: Union[int, None]
+    #: the RSSI value in dBm
+    rssi: Union[int, None]
+    #: the threshold configuration value in dBm
+    rssi_threshold: Union[int, None]
+    #: the raw hardware timestamp (32768 Hz, rolls over every two seconds)
+    hw_timestamp: Union[int, None]
+    #: the raw extended data (including the flag byte)
+    raw_data: bytes
+
+    @property
+    def channel_id(self) -> Union[ChannelId, None]:
+        """
+        :return: the Channel ID or None if the Channel ID flag was not set
+        """
+        if self.device_number is None:
+            return None
+        return ChannelId(self.device_number, self.device_type, self.trans_type)
+
+    @classmethod
+    def from_metas(cls, metas: list[BaseExtendedMetaFlagged]) -> FlaggedExtendedData:
+        """
+        Creates the extended data out of a list of meta objects.
+
+        :param metas: the meta objects
+        :return: the extended data that holds the same information
+        """
+        meta_by_type = {meta.__class__: meta for meta in metas}
+        flags = 0
+        raw_data = b''
+        for flag, _, _, meta_type in _FLAG_DEFINITIONS:
+            if meta_type in meta_by_type:
+                flags |= flag
+                raw_data += meta_by_type[meta_type].raw_data
+        return parse_flagged_extended_data(bytes([flags]) + raw_data, offset=0)
+
+    def create_metas(self) -> list[BaseExtendedMetaFlagged]:
+        """
+        :return: a new list with one meta object for every flag that is set
+        """
+        layout = FLAGGED_EXTENDED_DATA_LAYOUTS[self.flags]
+        return [meta_type(self.raw_data[start:end]) for meta_type, start, end in layout.meta_slices]
+
+
+class FlaggedExtendedDataLayout(NamedTuple):
+    """
+    Describes the byte layout of the FLAGGED-EXTENDED-DATA for one specific flag byte.
+    """
+    #: the struct that unpacks all values behind the flag byte
+    struct: struct.Struct
+    #: for every field of :class:`FlaggedExtendedData` (without ``flags`` and ``raw_data``) the index within the
+    #: unpacked values or None if the field is not available
+    value_idxs: tuple[Union[int, None], ...]
+    #: the meta type with its start and end index within the raw extended data (including the flag byte)
+    meta_slices: tuple[tuple[type[BaseExtendedMetaFlagged], int, int], ...]
+
+
+def _create_layout(flags: int) -> FlaggedExtendedDataLayout:
+    struct_format = '<'
+    field_names = []
+    meta_slices = []
+    next_idx = 1
+    for flag, flag_format, flag_fields, meta_type in _FLAG_DEFINITIONS:
+        if flags & flag:
+            struct_format += flag_format
+            field_names.extend(flag_fields)
+            meta_slices.append((meta_type, next_idx, next_idx + meta_type.EXPECTED_BYTE_LENGTH))
+            next_idx += meta_type.EXPECTED_BYTE_LENGTH
+    all_field_names = [name for _, _, names, _ in _FLAG_DEFINITIONS for name in names]
+    return FlaggedExtendedDataLayout(
+        struct=struct.Struct(struct_format),
+        value_idxs=tuple(field_names.index(name) if name in field_names else None for name in all_field_names),
+        meta_slices=tuple(meta_slices),
+    )
+
+
+#: precomputed layouts for every possible flag byte
+FLAGGED_EXTENDED_DATA_LAYOUTS: tuple[FlaggedExtendedDataLayout, ...] = tuple(
+    _create_layout(flags) for flags in range(256)
+)
+
+
+#: the maximum size of the FLAGGED-EXTENDED-DATA (including the flag byte)
+FLAGGED_EXTENDED_DATA_MAX_SIZE = 1 + sum(meta_type.EXPECTED_BYTE_LENGTH for _, _, _, meta_type in _FLAG_DEFINITIONS)
+
+
+# numpy data types of the struct formats that are used within the flagged extended data
+_NUMPY_DTYPE_BY_FORMAT = {'H': np.dtype('<u2'), 'B': np.dtype('u1'), 'b': np.dtype('i1')}
+
+
+def _create_field_offset_tables() -> dict[str, tuple[np.ndarray, np.dtype]]:
+    tables = {
+        field_name: (np.full(256, -1, dtype=np.int64), _NUMPY_DTYPE_BY_FORMAT[field_format])
+        for _, flag_format, flag_fields, _ in _FLAG_DEFINITIONS
+        for field_name, field_format in zip(flag_fields, flag_format)
+    }
+    for flags in range(256):
+        next_offset = 1
+        for flag, flag_format, flag_fields, _ in _FLAG_DEFINITIONS:
+            if not flags & flag:
+                continue
+            for field_name, field_format in zip(flag_fields, flag_format):
+                tables[field_name][0][flags] = next_offset
+                next_offset += struct.calcsize(field_format)
+    return tables
+
+
+# for every field of the flagged extended data, the byte offset of the field (-1 if the field is not available) for
+# every possible flag byte together with the data type of the field
+_FIELD_OFFSET_TABLES = _create_field_offset_tables()
+
+
+def get_flagged_extended_data_field(
+        matrix: np.ndarray,
+        field_name: str,
+        fill_value: Any = None,
+        dtype: Union[np.dtype, type, None] = None,
+) -> np.ndarray:
+    """
+    Extracts one field out of the FLAGGED-EXTENDED-DATA of many messages at once. The field offsets are looked up for
+    all flag bytes at once, so that no message needs to be parsed separately.
+
+    :param matrix: an uint8 array with shape ``(n, FLAGGED_EXTENDED_DATA_MAX_SIZE)`` that holds the raw flagged extended
+                   data (starting with the flag byte, padded with zeros) of one message per row - a row that only holds
+                   zeros describes a message without extended data
+    :param field_name: the field name of :class:`FlaggedExtendedData`
+    :param fill_value: the value for messages that were received without this information (if None, a ValueError is
+                       raised for such messages)
+    :param dtype: the optional data type of the returned array (defaults to int64)
+    :return: the array with one value per row
+    """
+    if field_name not in _FIELD_OFFSET_TABLES:
+        raise KeyError(f'unknown field `{field_name}` of the flagged extended data')
+    offset_table, field_dtype = _FIELD_OFFSET_TABLES[field_name]
+    matrix = np.asarray(matrix, dtype=np.uint8).reshape(-1, FLAGGED_EXTENDED_DATA_MAX_SIZE)
+    offsets = offset_table[matrix[:, 0]]
+    available = offsets >= 0
+    if fill_value is None and not np.all(available):
+        raise ValueError(f'message at index {int(np.argmin(available))} has no extended `{field_name}` information')
+    rows = np.flatnonzero(available)
+    field_bytes = matrix[rows[:, np.newaxis], offsets[rows, np.newaxis] + np.arange(field_dtype.itemsize)]
+    result = np.full(len(matrix), 0 if fill_value is None else fill_value, dtype=dtype or np.int64)
+    result[rows] = np.ascontiguousarray(field_bytes).view(field_dtype).reshape(-1)
+    return result
+
+
+def parse_flagged_extended_data(raw_data: bytes, offset: int = 8) -> FlaggedExtendedData:
+    """
+    Parses the FLAGGED-EXTENDED-DATA of a received message with one single unpack call.
+
+    :param raw_data: the complete raw data of the message
+    :param offset: the index of the flag byte within the raw data (the extended data follows the 8 data bytes)
+    :return: the parsed extended data
+    """
+    view = memoryview(raw_data)
+    if len(view) <= offset:
+        raise ValueError(f'expected more than {offset} bytes for flagged message format, but got {len(view)}')
+    flags = view[offset]
+    layout = FLAGGED_EXTENDED_DATA_LAYOUTS[flags]
+    if len(view) - offset - 1 != layout.struct.size:
+        raise ValueError(f'received {len(view) - offset - 1} bytes of extended (flagged) data but expected '
+                         f'{layout.struct.size} bytes for flags {hex(flags)}: {bytes(raw_data)}')
+    values = layout.struct.unpack_from(view, offset + 1)
+    return FlaggedExtendedData(
+        flags,
+        *(None if idx is None else values[idx] for idx in layout.value_idxs),
+        bytes(view[offset:])
+    )
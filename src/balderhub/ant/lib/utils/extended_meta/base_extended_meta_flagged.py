@@ -1,5 +1,3 @@
-import copy
-
 from typing import Literal
 
 
@@ -22,6 +20,7 @@ class BaseExtendedMetaFlagged:
     @property
     def raw_data(self) -> bytes:
         """
-        :return: returns the raw bytes that describing the information within this metadata object
+        :return: returns the raw bytes that describing the information within this metadata object (bytes are
+                 immutable, so no copy is required)
         """
-        return copy.copy(self._raw_data)
+        return self._raw_data
@@ -1,5 +1,3 @@
-import copy
-
 
 class BaseExtendedMetaLegacy:
     """
@@ -20,6 +18,7 @@ class BaseExtendedMetaLegacy:
     @property
     def raw_data(self) -> bytes:
         """
-        :return: returns the raw bytes that describing the information within this metadata object
+        :return: returns the raw bytes that describing the information within this metadata object (bytes are
+                 immutable, so no copy is required)
         """
-        return copy.copy(self._raw_data)
+        return self._raw_data
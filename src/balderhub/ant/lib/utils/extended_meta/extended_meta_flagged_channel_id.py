@@ -13,7 +13,7 @@ class ExtendedMetaFlaggedChannelId(BaseExtendedMetaFlagged):
         """
         :return: returns the device number
         """
-        return int.from_bytes(self.raw_data[0:1], byteorder=self.BYTE_ORDER, signed=False)
+        return int.from_bytes(self._raw_data[0:2], byteorder=self.BYTE_ORDER, signed=False)
 
     @property
     def device_type(self) -> int:
@@ -20,11 +20,11 @@ class ExtendedMetaFlaggedRssi(BaseExtendedMetaFlagged):
         """
         :return: returns the current RSSI value
         """
-        return int.from_bytes(self._raw_data[1:1], byteorder=self.BYTE_ORDER, signed=True)
+        return int.from_bytes(self._raw_data[1:2], byteorder=self.BYTE_ORDER, signed=True)
 
     @property
     def threshold_config_value(self) -> int:
         """
         :return: returns the threshold config value
         """
-        return int.from_bytes(self._raw_data[2:2], byteorder=self.BYTE_ORDER, signed=True)
+        return int.from_bytes(self._raw_data[2:3], byteorder=self.BYTE_ORDER, signed=True)
@@ -1,7 +1,7 @@
-from .base_extended_meta_flagged import BaseExtendedMetaFlagged
+from .base_extended_meta_legacy import BaseExtendedMetaLegacy
 
 
-class ExtendedMetaLegacyChannelId(BaseExtendedMetaFlagged):
+class ExtendedMetaLegacyChannelId(BaseExtendedMetaLegacy):
     """
     Metadata describing data given by the ANT interface in LEGACY-EXTENDED-DATA message format that describes
     additional Channel ID information
@@ -13,7 +13,7 @@ class ExtendedMetaLegacyChannelId(BaseExtendedMetaFlagged):
         """
         :return: returns the device number
         """
-        return int.from_bytes(self._raw_data[0:1], byteorder=self.BYTE_ORDER, signed=False)
+        return int.from_bytes(self._raw_data[0:2], byteorder=self.BYTE_ORDER, signed=False)
 
     @property
     def device_type(self) -> int:
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import itertools
+import os
+import pathlib
+import struct
+import tempfile
+from typing import BinaryIO, NamedTuple, Union
+
+from .capture_file import CAPTURE_PAYLOAD_SIZE, CaptureHeader, CaptureRecord, CaptureWriter, RecordKind
+
+# sequence number, monotonic timestamp, record kind, channel number, length of the extended data, payload, extended data
+_SLOT_STRUCT_FORMAT = '<QdBBB{payload_size}s{ext_size}s'
+
+
+class FlightRecorderConfig(NamedTuple):
+    """
+    Configuration of the :class:`FlightRecorder` of a controller
+    """
+    #: the time in seconds the flight recorder keeps the raw traffic for
+    window_sec: float = 60.
+    #: the maximum number of records the flight recorder keeps (needs to be large enough for all records within the
+    #: window)
+    capacity: int = 8192
+    #: the directory the flight recorder is dumped into
+    directory: Union[str, os.PathLike] = pathlib.Path(tempfile.gettempdir()) / 'balderhub-ant-flight-recorder'
+
+
+class FlightRecorder:
+    """
+    Keeps the last records of a channel session (received messages, channel events, sent messages and wait calls)
+    within a preallocated ring buffer, so that they can be dumped into a capture file (see :class:`CaptureWriter`) when
+    a scenario fails.
+
+    Recording a new record (:meth:`FlightRecorder.record`) only packs it into the next slot of the buffer. It does not
+    allocate memory, does not lock and does not log, so that it can stay active within the receive path all the time.
+    The records are sorted and filtered by their age only when the buffer is read out.
+    """
+
+    def __init__(self, window_sec: float = 60., capacity: int = 8192, max_extended_data_size: int = 16):
+        """
+        :param window_sec: the time in seconds (before the last record) that is considered when reading out the buffer
+        :param capacity: the maximum number of records within the buffer (the oldest records are overwritten)
+        :param max_extended_data_size: the maximum number of extended data bytes that are kept per record (longer
+                                       extended data is truncated)
+        """
+        if capacity <= 0:
+            raise ValueError(f'capacity needs to be positive (is {capacity})')
+        self._window_sec = window_sec
+        self._capacity = capacity
+        self._max_extended_data_size = max_extended_data_size
+        self._slot_struct = struct.Struct(
+            _SLOT_STRUCT_FORMAT.format(payload_size=CAPTURE_PAYLOAD_SIZE, ext_size=max_extended_data_size))
+        self._buffer = bytearray(self._slot_struct.size * capacity)
+        # the sequence numbers start with 1, so that empty slots can be detected - `next()` of a counter is atomic
+        self._sequence = itertools.count(1)
+        self._last_sequence_no = 0
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<window={self._window_sec}s | capacity={self._capacity} "
+                f"| recorded={self._last_sequence_no}>")
+
+    @property
+    def window_sec(self) -> float:
+        """
+        :return: the time in seconds (before the last record) that is considered when reading out the buffer
+        """
+        return self._window_sec
+
+    @property
+    def capacity(self) -> int:
+        """
+        :return: the maximum number of records within the buffer
+        """
+        return self._capacity
+
+    @property
+    def recorded_count(self) -> int:
+        """
+        :return: the number of records that were recorded so far (including the overwritten ones)
+        """
+        return self._last_sequence_no
+
+    def record(
+            self,
+            timestamp: float,
+            kind: RecordKind,
+            channel: int,
+            payload: bytes,
+            extended_data: bytes = b''
+    ) -> None:
+        """
+        Writes a new record into the next slot of the ring buffer. This method can be called from different threads.
+
+        :param timestamp: the monotonic ``time.perf_counter()`` timestamp of the record
+        :param kind: the kind of the record
+        :param channel: the number of the channel
+        :param payload: the 8 payload bytes
+        :param extended_data: the raw extended data
+        """
+        sequence_no = next(self._sequence)
+        self._slot_struct.pack_into(
+            self._buffer, (sequence_no % self._capacity) * self._slot_struct.size,
+            sequence_no, timestamp, kind, channel, min(len(extended_data), self._max_extended_data_size),
+            payload, extended_data
+        )
+        self._last_sequence_no = sequence_no
+
+    def clear(self) -> None:
+        """
+        Removes all records from the buffer
+        """
+        self._buffer[:] = bytes(len(self._buffer))
+
+    def get_records(self) -> list[CaptureRecord]:
+        """
+        :return: all records of the last :meth:`FlightRecorder.window_sec` seconds (before the last record) in the
+                 order they were recorded
+        """
+        # work on a copy, because other threads keep recording
+        slots = [slot for slot in self._slot_struct.iter_unpack(bytes(self._buffer)) if slot[0] != 0]
+        if not slots:
+            return []
+        slots.sort(key=lambda slot: slot[0])
+        min_timestamp = max(slot[1] for slot in slots) - self._window_sec
+        return [
+            CaptureRecord(timestamp, RecordKind(kind), channel, payload, extended_data[:ext_len])
+            for _, timestamp, kind, channel, ext_len, payload, extended_data in slots
+            if timestamp >= min_timestamp
+        ]
+
+    def dump(self, file: Union[str, os.PathLike, BinaryIO], header: CaptureHeader) -> int:
+        """
+        Writes all records of the last :meth:`FlightRecorder.window_sec` seconds into a new capture.
+
+        :param file: the path of the new capture file or an already opened binary file object
+        :param header: the header that describes the recorded session
+        :return: the number of written records
+        """
+        records = self.get_records()
+        with CaptureWriter(file, header) as writer:
+            for cur_record in records:
+                writer.write(cur_record)
+        return len(records)
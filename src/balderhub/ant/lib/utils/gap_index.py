@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from typing import Iterable, NamedTuple, Union
+
+import numpy as np
+
+
+class Gap(NamedTuple):
+    """
+    Describes missing messages between two received messages
+    """
+    #: the index of the last received message before the gap
+    after_idx: int
+    #: the number of messages that are missing
+    missing_count: int
+    #: the timestamp of the last received message before the gap
+    start_timestamp: float
+    #: the timestamp of the first received message after the gap
+    end_timestamp: float
+
+
+class _DiscardedGaps(NamedTuple):
+    """summary of the gaps that were discarded from a :class:`GapIndex`"""
+    #: the number of discarded gaps
+    gap_count: int = 0
+    #: the number of messages that are missing within the discarded gaps
+    missing_count: int = 0
+    #: the index of the first received message whose gaps are kept
+    before_idx: int = 0
+
+
+def find_gaps(
+        timestamps: Union[Iterable[float], np.ndarray],
+        channel_period_sec: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Detects all missing message slots in one vectorized pass. Every channel period without a received message counts
+    as one missing message.
+
+    :param timestamps: the timestamps (in seconds) of all received messages in receive order (either the monotonic host
+                       timestamps or the reconstructed hardware timeline)
+    :param channel_period_sec: the channel period in seconds
+    :return: a tuple with an array of the indices of the last received message before each gap and an array with the
+             number of missing messages of each gap
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if timestamps.size < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    missing = np.maximum(np.rint(np.diff(timestamps) / channel_period_sec).astype(np.int64) - 1, 0)
+    gap_idxs = np.flatnonzero(missing)
+    return gap_idxs, missing[gap_idxs]
+
+
+class GapIndex:
+    """
+    Index of all missing messages of a periodic channel. It can be maintained incrementally (by providing every
+    received timestamp with :meth:`GapIndex.update`) or created in one vectorized pass with
+    :meth:`GapIndex.from_timestamps`. Only the gaps are stored, so the memory does not grow with the number of
+    received messages.
+    """
+
+    def __init__(self, channel_period_sec: float):
+        """
+        :param channel_period_sec: the channel period in seconds
+        """
+        self._channel_period_sec = channel_period_sec
+        self._received_count = 0
+        self._missing_count = 0
+        self._last_timestamp = None
+        self._gaps: list[Gap] = []
+        self._discarded = _DiscardedGaps()
+        self._longest_gap: Union[Gap, None] = None
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<received={self._received_count} | missing={self._missing_count} "
+                f"| gaps={len(self._gaps)}>")
+
+    @classmethod
+    def from_timestamps(
+            cls,
+            timestamps: Union[Iterable[float], np.ndarray],
+            channel_period_sec: float
+    ) -> GapIndex:
+        """
+        Creates the index for all given timestamps in one vectorized pass (see :func:`find_gaps`).
+
+        :param timestamps: the timestamps (in seconds) of all received messages in receive order
+        :param channel_period_sec: the channel period in seconds
+        :return: the new gap index
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        result = cls(channel_period_sec)
+        gap_idxs, missing_counts = find_gaps(timestamps, channel_period_sec)
+        result._received_count = int(timestamps.size)
+        result._missing_count = int(missing_counts.sum())
+        result._last_timestamp = float(timestamps[-1]) if timestamps.size else None
+        result._gaps = [
+            Gap(int(idx), int(cnt), float(timestamps[idx]), float(timestamps[idx + 1]))
+            for idx, cnt in zip(gap_idxs, missing_counts)
+        ]
+        result._longest_gap = max(result._gaps, key=lambda gap: gap.missing_count, default=None)
+        return result
+
+    @property
+    def channel_period_sec(self) -> float:
+        """
+        :return: the channel period in seconds
+        """
+        return self._channel_period_sec
+
+    @property
+    def received_count(self) -> int:
+        """
+        :return: the number of received messages
+        """
+        return self._received_count
+
+    @property
+    def missing_count(self) -> int:
+        """
+        :return: the number of missing messages
+        """
+        return self._missing_count
+
+    @property
+    def expected_count(self) -> int:
+        """
+        :return: the number of messages that were expected between the first and the last received message
+        """
+        return self._received_count + self._missing_count
+
+    @property
+    def loss_ratio(self) -> float:
+        """
+        :return: the ratio (0..1) of missing messages to all expected messages
+        """
+        if self.expected_count == 0:
+            return 0.
+        return self._missing_count / self.expected_count
+
+    @property
+    def loss_percent(self) -> float:
+        """
+        :return: the percentage (0..100) of missing messages to all expected messages
+        """
+        return self.loss_ratio * 100
+
+    @property
+    def gaps(self) -> list[Gap]:
+        """
+        :return: returns a copy of all detected gaps (except the discarded ones)
+        """
+        return self._gaps.copy()
+
+    @property
+    def discarded_gap_count(self) -> int:
+        """
+        :return: the number of gaps that were discarded so far (see :meth:`GapIndex.discard_before`)
+        """
+        return self._discarded.gap_count
+
+    @property
+    def longest_gap(self) -> Union[Gap, None]:
+        """
+        :return: the gap with the most missing messages or None if there was no gap (also considers discarded gaps)
+        """
+        return self._longest_gap
+
+    def update(self, timestamp: float) -> int:
+        """
+        Updates the index with the timestamp of a new received message.
+
+        :param timestamp: the timestamp of the received message in seconds
+        :return: the number of messages that are missing directly before this message
+        """
+        missing = 0
+        if self._last_timestamp is not None:
+            missing = max(round((timestamp - self._last_timestamp) / self._channel_period_sec) - 1, 0)
+        if missing > 0:
+            gap = Gap(self._received_count - 1, missing, self._last_timestamp, timestamp)
+            self._gaps.append(gap)
+            self._missing_count += missing
+            if self._longest_gap is None or missing > self._longest_gap.missing_count:
+                self._longest_gap = gap
+        self._received_count += 1
+        self._last_timestamp = timestamp
+        return missing
+
+    def discard_before(self, idx: int) -> int:
+        """
+        Discards the details of all gaps before the given message. The counters keep considering them.
+
+        :param idx: the index of the first received message whose gaps should be kept
+        :return: the number of discarded gaps
+        """
+        count = 0
+        while count < len(self._gaps) and self._gaps[count].after_idx < idx:
+            count += 1
+        if idx > self._discarded.before_idx:
+            self._discarded = _DiscardedGaps(
+                gap_count=self._discarded.gap_count + count,
+                missing_count=self._discarded.missing_count + sum(gap.missing_count for gap in self._gaps[:count]),
+                before_idx=idx,
+            )
+            del self._gaps[:count]
+        return count
+
+    def get_missing_count_between(self, start_idx: int, end_idx: int) -> int:
+        """
+        :param start_idx: the index of the first received message
+        :param end_idx: the index of the second received message
+        :return: the number of messages that are missing between both received messages
+        """
+        return sum(gap.missing_count for gap in self._gaps if start_idx <= gap.after_idx < end_idx)
+
+    def get_slot_offsets(self) -> np.ndarray:
+        """
+        :return: an array with the slot (number of channel periods since the first received message) for every
+                 received message, whose gaps were not discarded (see :meth:`GapIndex.discard_before`) - the discarded
+                 gaps are still considered for the slots
+        """
+        first_idx = min(self._discarded.before_idx, self._received_count)
+        missing_before = np.zeros(self._received_count - first_idx, dtype=np.int64)
+        if len(missing_before) > 0:
+            missing_before[0] = self._discarded.missing_count
+        for gap in self._gaps:
+            missing_before[gap.after_idx + 1 - first_idx] += gap.missing_count
+        return np.arange(first_idx, self._received_count, dtype=np.int64) + np.cumsum(missing_before)
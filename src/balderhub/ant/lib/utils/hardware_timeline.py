@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Iterable, Union
+
+import numpy as np
+
+#: frequency of the hardware timestamp provided within the flagged extended data
+HW_TIMESTAMP_FREQUENCY_HZ = 32768
+#: number of ticks till the 16 bit hardware timestamp rolls over
+HW_TIMESTAMP_ROLLOVER_TICKS = 0x10000
+
+
+def unwrap_hw_timestamp_ticks(
+        ticks_raw: Union[Iterable[int], np.ndarray],
+        host_timestamps: Union[Iterable[float], np.ndarray],
+) -> np.ndarray:
+    """
+    Unwraps the 16 bit hardware timestamp ticks (32768 Hz, rolls over every two seconds) into a continuous tick
+    counter. The host timestamps are used to determine how many complete rollovers happened between two messages, so
+    that also gaps of two seconds and more (f.e. caused by packet loss) are resolved correctly.
+
+    :param ticks_raw: the raw 16 bit hardware timestamp ticks in receive order
+    :param host_timestamps: the monotonic host timestamps (in seconds) of the same messages
+    :return: an int64 array with the unwrapped ticks (the first value is kept as it is)
+    """
+    ticks = np.asarray(ticks_raw, dtype=np.int64)
+    host = np.asarray(host_timestamps, dtype=np.float64)
+    if ticks.shape != host.shape or ticks.ndim != 1:
+        raise ValueError(f'both columns need to be one dimensional with the same length (got {ticks.shape} and '
+                         f'{host.shape})')
+    if ticks.size == 0:
+        return ticks.copy()
+    ticks_mod = np.diff(ticks) & (HW_TIMESTAMP_ROLLOVER_TICKS - 1)
+    host_ticks = np.diff(host) * HW_TIMESTAMP_FREQUENCY_HZ
+    # the host timestamps are accurate enough to determine the number of complete rollovers
+    rollovers = np.maximum(np.rint((host_ticks - ticks_mod) / HW_TIMESTAMP_ROLLOVER_TICKS), 0).astype(np.int64)
+    result = np.empty_like(ticks)
+    result[0] = ticks[0]
+    np.cumsum(ticks_mod + rollovers * HW_TIMESTAMP_ROLLOVER_TICKS, out=result[1:])
+    result[1:] += ticks[0]
+    return result
+
+
+def estimate_hw_clock_drift(
+        hw_sec: Union[Iterable[float], np.ndarray],
+        host_timestamps: Union[Iterable[float], np.ndarray],
+        window_sec: float = 10.,
+) -> tuple[float, float]:
+    """
+    Estimates the linear relation between the (unwrapped) hardware time and the host time. Every message arrives at the
+    host with a delay that is never negative, so the offset ``host - hw`` of the message with the shortest delay within
+    every window of ``window_sec`` seconds is used as sample. A line is fitted through these samples and moved below
+    all offsets, so that it describes the lower envelope of the offsets.
+
+    :param hw_sec: the unwrapped hardware time (in seconds) of all messages in receive order
+    :param host_timestamps: the monotonic host timestamps (in seconds) of the same messages
+    :param window_sec: the length of the windows the minimal offsets are determined for
+    :return: a tuple ``(drift, offset)`` so that ``host = hw * (1 + drift) + offset`` (the drift is 0 if the messages
+             do not span at least two windows)
+    """
+    hw_sec = np.asarray(hw_sec, dtype=np.float64)
+    offsets = np.asarray(host_timestamps, dtype=np.float64) - hw_sec
+    if hw_sec.size == 0:
+        raise ValueError('can not estimate the drift without any messages')
+    windows = ((hw_sec - hw_sec[0]) // window_sec).astype(np.int64)
+    # sort by window and offset - the first entry of every window is the one with the shortest delay
+    order = np.lexsort((offsets, windows))
+    firsts = order[np.flatnonzero(np.diff(windows[order], prepend=-1))]
+    if len(firsts) < 2:
+        return 0., float(np.min(offsets))
+    drift, offset = np.polyfit(hw_sec[firsts], offsets[firsts], 1)
+    offset += np.min(offsets - (drift * hw_sec + offset))
+    return float(drift), float(offset)
+
+
+def reconstruct_hw_timeline(
+        ticks_raw: Union[Iterable[int], np.ndarray],
+        host_timestamps: Union[Iterable[float], np.ndarray],
+        drift_window_sec: Union[float, None] = 10.,
+) -> np.ndarray:
+    """
+    Reconstructs a continuous receive timeline out of the hardware timestamps, that is free of the host scheduling
+    jitter. The timeline is returned in the time base of the host timestamps: The hardware time is mapped by the lower
+    envelope of the offsets between host and hardware time (see :func:`estimate_hw_clock_drift`), because the messages
+    with the shortest delay between the ANT device and the host are the best estimation for the relation of both
+    clocks. This compensates a constant frequency difference (drift) of both clocks. The accuracy is still limited by
+    the shortest delays that were observed and by drift changes within the capture (f.e. caused by temperature).
+
+    :param ticks_raw: the raw 16 bit hardware timestamp ticks in receive order
+    :param host_timestamps: the monotonic host timestamps (in seconds) of the same messages
+    :param drift_window_sec: the window length that is used for estimating the drift (None only compensates the
+                             offset of both clocks)
+    :return: a float64 array with the reconstructed receive time for every message in seconds
+    """
+    host = np.asarray(host_timestamps, dtype=np.float64)
+    hw_sec = unwrap_hw_timestamp_ticks(ticks_raw, host) / HW_TIMESTAMP_FREQUENCY_HZ
+    if hw_sec.size == 0:
+        return hw_sec
+    if drift_window_sec is None:
+        return hw_sec + np.min(host - hw_sec)
+    # relative to the first message, so that the fit is not affected by the absolute values
+    hw_rel_sec = hw_sec - hw_sec[0]
+    drift, offset = estimate_hw_clock_drift(hw_rel_sec, host, window_sec=drift_window_sec)
+    return hw_rel_sec * (1 + drift) + offset
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import collections
+from typing import Iterator, Union, TYPE_CHECKING
+
+from .counter import CounterUnwrapper
+
+if TYPE_CHECKING:
+    from .pages.hrm.base_hrm_page import BaseHrmPage
+
+
+class HeartBeatEvent:
+    """
+    Describes one unique heart beat, that was transmitted within one or more consecutive HRM pages
+    """
+
+    def __init__(
+            self,
+            beat_count: int,
+            event_time: int,
+            computed_heart_rate: int,
+            page_idx: int,
+            timestamp: float,
+    ):
+        self._beat_count = beat_count
+        self._event_time = event_time
+        self._computed_heart_rate = computed_heart_rate
+        self._first_page_idx = page_idx
+        self._last_page_idx = page_idx
+        self._first_timestamp = timestamp
+        self._last_timestamp = timestamp
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<beat-count={self._beat_count} | event-time={self._event_time} "
+                f"| pages={self._first_page_idx}-{self._last_page_idx}>")
+
+    def add_page(self, computed_heart_rate: int, page_idx: int, timestamp: float) -> None:
+        """
+        Adds another page that transmits this beat.
+
+        :param computed_heart_rate: the computed heart rate of the page
+        :param page_idx: the index of the page within all pages of the session
+        :param timestamp: the receive timestamp of the page
+        """
+        self._computed_heart_rate = computed_heart_rate
+        self._last_page_idx = page_idx
+        self._last_timestamp = timestamp
+
+    @property
+    def beat_count(self) -> int:
+        """
+        :return: the heart beat count of this beat (unwrapped beyond its 8 bit range)
+        """
+        return self._beat_count
+
+    @property
+    def beat_count_raw(self) -> int:
+        """
+        :return: the raw 8 bit heart beat count as transmitted within the pages
+        """
+        return self._beat_count & 0xFF
+
+    @property
+    def event_time(self) -> int:
+        """
+        :return: the heart beat event time of this beat in 1/1024 seconds (unwrapped beyond its 16 bit range)
+        """
+        return self._event_time
+
+    @property
+    def event_time_raw(self) -> int:
+        """
+        :return: the raw 16 bit heart beat event time as transmitted within the pages
+        """
+        return self._event_time & 0xFFFF
+
+    @property
+    def computed_heart_rate(self) -> int:
+        """
+        :return: the computed heart rate of the last page that transmitted this beat
+        """
+        return self._computed_heart_rate
+
+    @property
+    def first_page_idx(self) -> int:
+        """
+        :return: the index of the first page within the message collection that transmitted this beat
+        """
+        return self._first_page_idx
+
+    @property
+    def last_page_idx(self) -> int:
+        """
+        :return: the index of the last page within the message collection that transmitted this beat
+        """
+        return self._last_page_idx
+
+    @property
+    def first_timestamp(self) -> float:
+        """
+        :return: the receive timestamp of the first page that transmitted this beat
+        """
+        return self._first_timestamp
+
+    @property
+    def last_timestamp(self) -> float:
+        """
+        :return: the receive timestamp of the last page that transmitted this beat
+        """
+        return self._last_timestamp
+
+
+class HeartBeatIndex:
+    """
+    Index that collapses the HRM pages (that repeat the same beat until the next one occurs) into one
+    :class:`HeartBeatEvent` per beat. The index is maintained incrementally by providing every received page in order.
+
+    Old beats can be discarded with :meth:`HeartBeatIndex.discard_before` (f.e. if the pages they were received in are
+    not retained anymore). The unwrapping of the counters is not affected by that.
+    """
+
+    def __init__(self):
+        self._beats: collections.deque[HeartBeatEvent] = collections.deque()
+        self._discarded_count = 0
+        self._beat_count_unwrapper = CounterUnwrapper(bit_width=8)
+        self._event_time_unwrapper = CounterUnwrapper(bit_width=16)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{len(self._beats)} beats | discarded={self._discarded_count}>"
+
+    def __iter__(self) -> Iterator[HeartBeatEvent]:
+        return iter(self._beats)
+
+    def __len__(self):
+        return len(self._beats)
+
+    def __getitem__(self, item: int) -> HeartBeatEvent:
+        return self._beats[item]
+
+    @property
+    def beats(self) -> list[HeartBeatEvent]:
+        """
+        :return: returns a copy of all beats within this index
+        """
+        return list(self._beats)
+
+    @property
+    def discarded_count(self) -> int:
+        """
+        :return: the number of beats that were discarded so far
+        """
+        return self._discarded_count
+
+    @property
+    def total_count(self) -> int:
+        """
+        :return: the number of beats that were detected so far (including the discarded ones)
+        """
+        return self._discarded_count + len(self._beats)
+
+    @property
+    def last_beat(self) -> Union[HeartBeatEvent, None]:
+        """
+        :return: the last beat within this index or None if there is no beat yet
+        """
+        return self._beats[-1] if self._beats else None
+
+    def update(self, page: BaseHrmPage, page_idx: int, timestamp: float) -> Union[HeartBeatEvent, None]:
+        """
+        Updates the index with a new received page.
+
+        :param page: the received page
+        :param page_idx: the index of the page within all pages of the session (see
+                         :meth:`RingPageMessageCollection.get_session_index`)
+        :param timestamp: the receive timestamp of the page
+        :return: the new beat if the page started one, otherwise None
+        """
+        beat_count_raw = page.heart_beat_count
+        event_time_raw = page.heart_beat_event_time
+        last_beat = self.last_beat
+        if last_beat is not None \
+                and last_beat.beat_count_raw == beat_count_raw and last_beat.event_time_raw == event_time_raw:
+            last_beat.add_page(page.computed_heart_rate, page_idx, timestamp)
+            return None
+        new_beat = HeartBeatEvent(
+            self._beat_count_unwrapper.update(beat_count_raw),
+            self._event_time_unwrapper.update(event_time_raw),
+            page.computed_heart_rate,
+            page_idx,
+            timestamp
+        )
+        self._beats.append(new_beat)
+        return new_beat
+
+    def discard_before(self, page_idx: int) -> int:
+        """
+        Discards all beats, that were only transmitted within pages before the given page index.
+
+        :param page_idx: the index of the first page whose beats should be kept
+        :return: the number of discarded beats
+        """
+        count = 0
+        while self._beats and self._beats[0].last_page_idx < page_idx:
+            self._beats.popleft()
+            count += 1
+        self._discarded_count += count
+        return count
+
+    def get_rr_value_sec(self, beat_idx: int = -1) -> Union[float, None]:
+        """
+        Returns the RR value between the given beat and its previous one.
+
+        :param beat_idx: the index of the beat within this index
+        :return: the RR value in seconds or None if the previous beat is not within this index or if at least one beat
+                 was missed between both
+        """
+        if beat_idx < 0:
+            beat_idx += len(self._beats)
+        if not 0 < beat_idx < len(self._beats):
+            return None
+        beat_before, beat = self._beats[beat_idx - 1], self._beats[beat_idx]
+        if beat.beat_count != beat_before.beat_count + 1:
+            return None
+        return (beat.event_time - beat_before.event_time) / 1024
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .counter import unwrap_counter
+
+if TYPE_CHECKING:
+    from .page_message_collection import PageMessageCollection
+
+
+class RRIntervalSeries:
+    """
+    Holds all heart beats of a captured HRM session together with the RR intervals between them and provides the
+    common heart rate variability (HRV) metrics.
+
+    .. note::
+        Beats that were not received because of packet loss are recovered with the previous heart beat event time of
+        the :class:`Hrm4PreviousHeartBeatEventTimePage` (possible if exactly one beat was missed). RR intervals are only
+        provided for directly consecutive beats.
+    """
+
+    #: page number of the page that holds the previous heart beat event time
+    PREVIOUS_EVENT_TIME_PAGE_ID = 4
+
+    def __init__(self, beat_counts: np.ndarray, event_times: np.ndarray, recovered: np.ndarray):
+        """
+        :param beat_counts: the unwrapped beat counts of all beats (strictly increasing)
+        :param event_times: the unwrapped heart beat event times (in 1/1024 seconds) of all beats
+        :param recovered: a bool array that is True for every beat that was recovered and not received directly
+        """
+        if not len(beat_counts) == len(event_times) == len(recovered):
+            raise ValueError('all arrays need to have the same length')
+        self._beat_counts = np.asarray(beat_counts, dtype=np.int64)
+        self._event_times = np.asarray(event_times, dtype=np.int64)
+        self._recovered = np.asarray(recovered, dtype=bool)
+
+        consecutive = np.diff(self._beat_counts) == 1
+        self._rr_intervals_sec = (np.diff(self._event_times)[consecutive] / 1024).astype(np.float64)
+        self._rr_beat_counts = self._beat_counts[1:][consecutive]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{len(self._beat_counts)} beats | {len(self._rr_intervals_sec)} rr-values>"
+
+    @staticmethod
+    def _detect_beats(raw: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param raw: the raw data matrix of the received pages
+        :return: a tuple with the beat index of every page, the unwrapped beat counts, the unwrapped event times and
+                 the raw event times of all beats
+        """
+        event_times_raw = raw[:, 4] | (raw[:, 5] << 8)
+        beat_counts_raw = raw[:, 6]
+
+        # every change of beat count or event time starts a new beat
+        beat_keys = (beat_counts_raw << 16) | event_times_raw
+        is_new_beat = np.empty(len(raw), dtype=bool)
+        is_new_beat[0] = True
+        is_new_beat[1:] = beat_keys[1:] != beat_keys[:-1]
+        first_page_idxs = np.flatnonzero(is_new_beat)
+        beat_idx_of_page = np.cumsum(is_new_beat) - 1
+
+        beat_counts = unwrap_counter(beat_counts_raw[first_page_idxs], bit_width=8)
+        event_times = unwrap_counter(event_times_raw[first_page_idxs], bit_width=16)
+        return beat_idx_of_page, beat_counts, event_times, event_times_raw[first_page_idxs]
+
+    @classmethod
+    def _recover_lost_beats(
+            cls,
+            raw: np.ndarray,
+            beat_idx_of_page: np.ndarray,
+            beat_counts: np.ndarray,
+            event_times: np.ndarray,
+            beat_event_times_raw: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Recovers the beats that were lost between two received beats (only possible for exactly one lost beat) by using
+        the previous heart beat event time.
+
+        :return: a tuple with the unwrapped beat counts and the unwrapped event times of the recovered beats
+        """
+        prev_time_page_idxs = np.flatnonzero((raw[:, 0] & 0x7F) == cls.PREVIOUS_EVENT_TIME_PAGE_ID)
+        beats_with_prev_time, first_occurrence = np.unique(
+            beat_idx_of_page[prev_time_page_idxs], return_index=True
+        )
+        prev_event_times_raw = raw[prev_time_page_idxs[first_occurrence], 2] \
+            | (raw[prev_time_page_idxs[first_occurrence], 3] << 8)
+        # the first beat has no received beat before
+        relevant = beats_with_prev_time > 0
+        beats_with_prev_time = beats_with_prev_time[relevant]
+        prev_event_times_raw = prev_event_times_raw[relevant]
+
+        one_beat_lost = beat_counts[beats_with_prev_time] - beat_counts[beats_with_prev_time - 1] == 2
+        recover_beats = beats_with_prev_time[one_beat_lost]
+        recovered_event_times = event_times[recover_beats] \
+            - ((beat_event_times_raw[recover_beats] - prev_event_times_raw[one_beat_lost]) & 0xFFFF)
+        return beat_counts[recover_beats] - 1, recovered_event_times
+
+    @classmethod
+    def from_messages(cls, messages: PageMessageCollection) -> RRIntervalSeries:
+        """
+        Creates the series out of all received HRM pages. The calculation is done completely vectorized on the raw data
+        matrix of the collection.
+
+        :param messages: the received HRM pages (in receive order)
+        :return: the series
+        """
+        raw = messages.get_raw_data_matrix().astype(np.int64)
+        if len(raw) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(empty, empty, np.empty(0, dtype=bool))
+
+        beat_idx_of_page, beat_counts, event_times, beat_event_times_raw = cls._detect_beats(raw)
+        recovered_beat_counts, recovered_event_times = cls._recover_lost_beats(
+            raw, beat_idx_of_page, beat_counts, event_times, beat_event_times_raw
+        )
+
+        all_beat_counts = np.concatenate([beat_counts, recovered_beat_counts])
+        all_event_times = np.concatenate([event_times, recovered_event_times])
+        all_recovered = np.concatenate([
+            np.zeros(len(beat_counts), dtype=bool), np.ones(len(recovered_beat_counts), dtype=bool)
+        ])
+        order = np.argsort(all_beat_counts, kind='stable')
+        return cls(all_beat_counts[order], all_event_times[order], all_recovered[order])
+
+    @property
+    def beat_counts(self) -> np.ndarray:
+        """
+        :return: the unwrapped beat counts of all beats
+        """
+        return self._beat_counts
+
+    @property
+    def beat_event_times_sec(self) -> np.ndarray:
+        """
+        :return: the unwrapped heart beat event times of all beats in seconds
+        """
+        return self._event_times / 1024
+
+    @property
+    def recovered_beats(self) -> np.ndarray:
+        """
+        :return: a bool array that is True for every beat that was recovered by the previous heart beat event time
+        """
+        return self._recovered
+
+    @property
+    def rr_intervals_sec(self) -> np.ndarray:
+        """
+        :return: all RR intervals in seconds between directly consecutive beats
+        """
+        return self._rr_intervals_sec
+
+    @property
+    def rr_beat_counts(self) -> np.ndarray:
+        """
+        :return: the beat count of the later beat for every RR interval in :meth:`RRIntervalSeries.rr_intervals_sec`
+        """
+        return self._rr_beat_counts
+
+    def _get_successive_differences_sec(self) -> np.ndarray:
+        # only differences between two RR intervals of directly consecutive beats are valid
+        valid = np.diff(self._rr_beat_counts) == 1
+        return np.diff(self._rr_intervals_sec)[valid]
+
+    @property
+    def rmssd_ms(self) -> float:
+        """
+        :return: the root mean square of successive RR interval differences in milliseconds (NaN if there are not
+                 enough RR intervals)
+        """
+        successive_diffs = self._get_successive_differences_sec()
+        if len(successive_diffs) == 0:
+            return float('nan')
+        return float(np.sqrt(np.mean(np.square(successive_diffs))) * 1000)
+
+    @property
+    def sdnn_ms(self) -> float:
+        """
+        :return: the standard deviation of all RR intervals in milliseconds (NaN if there are not enough RR intervals)
+        """
+        if len(self._rr_intervals_sec) < 2:
+            return float('nan')
+        return float(np.std(self._rr_intervals_sec, ddof=1) * 1000)
+
+    @property
+    def pnn50(self) -> float:
+        """
+        :return: the ratio (0..1) of successive RR interval differences that are larger than 50 milliseconds (NaN if
+                 there are not enough RR intervals)
+        """
+        successive_diffs = self._get_successive_differences_sec()
+        if len(successive_diffs) == 0:
+            return float('nan')
+        return float(np.count_nonzero(np.abs(successive_diffs) > 0.05) / len(successive_diffs))
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import collections
+import math
+from typing import Union, TYPE_CHECKING
+
+import numpy as np
+
+from .extended_data import ChannelId
+from .gap_index import GapIndex
+
+if TYPE_CHECKING:
+    from .pages.base_received_antplus_page import BaseReceivedAntplusPage
+
+
+class _RollingWindow:
+    """
+    Rolling window over the last values with a running sum (the total number of added values is counted too).
+    """
+
+    def __init__(self, size: int):
+        self._values = collections.deque(maxlen=size)
+        self._sum = 0
+        self._total_count = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def size(self) -> int:
+        """
+        :return: the maximum number of values within the window
+        """
+        return self._values.maxlen
+
+    @property
+    def total_count(self) -> int:
+        """
+        :return: the number of all values that were added so far
+        """
+        return self._total_count
+
+    @property
+    def mean(self) -> Union[float, None]:
+        """
+        :return: the mean of all values within the window or None if the window is empty
+        """
+        if not self._values:
+            return None
+        return self._sum / len(self._values)
+
+    def append(self, value: int) -> None:
+        """
+        Adds a new value to the window (the oldest value is removed if the window is full).
+
+        :param value: the new value
+        """
+        if len(self._values) == self._values.maxlen:
+            self._sum -= self._values[0]
+        self._values.append(value)
+        self._sum += value
+        self._total_count += 1
+
+    def get_percentile(self, percentile: float) -> Union[float, None]:
+        """
+        :param percentile: the percentile (0-100) that should be calculated
+        :return: the percentile of the values within the window or None if the window is empty
+        """
+        if not self._values:
+            return None
+        return float(np.percentile(np.fromiter(self._values, dtype=np.float64, count=len(self._values)), percentile))
+
+
+class _RunningCorrelation:
+    """
+    Running mean and co-moments (Welford) of two variables to calculate their Pearson correlation coefficient.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._mean_x = 0.
+        self._mean_y = 0.
+        self._m2_x = 0.
+        self._m2_y = 0.
+        self._co_moment = 0.
+
+    @property
+    def coefficient(self) -> float:
+        """
+        :return: the Pearson correlation coefficient or NaN if it can not be determined yet
+        """
+        if self._count < 2 or self._m2_x == 0 or self._m2_y == 0:
+            return math.nan
+        return self._co_moment / math.sqrt(self._m2_x * self._m2_y)
+
+    def update(self, value_x: float, value_y: float) -> None:
+        """
+        Adds a new pair of values.
+
+        :param value_x: the value of the first variable
+        :param value_y: the value of the second variable
+        """
+        self._count += 1
+        delta_x = value_x - self._mean_x
+        delta_y = value_y - self._mean_y
+        self._mean_x += delta_x / self._count
+        self._mean_y += delta_y / self._count
+        self._m2_x += delta_x * (value_x - self._mean_x)
+        self._m2_y += delta_y * (value_y - self._mean_y)
+        self._co_moment += delta_x * (value_y - self._mean_y)
+
+
+class LinkQualityMonitor:
+    """
+    Incremental link-quality statistics over the RSSI values of received pages. The RSSI statistics only need bounded
+    memory: the monitor holds a rolling window of the last RSSI values, one fixed-size histogram per channel and some
+    running sums to correlate the RSSI with missing messages.
+
+    Missing messages are detected by a :class:`GapIndex` over the timestamps of the received pages: every channel
+    period without a received page counts as one missing message. The index keeps the details of every gap, till its
+    owner discards them (see :meth:`LinkQualityMonitor.gap_index`).
+    """
+    #: lowest RSSI value that can be provided by the ANT device (signed byte)
+    RSSI_MIN_DBM = -128
+    #: highest RSSI value that can be provided by the ANT device (signed byte)
+    RSSI_MAX_DBM = 127
+
+    def __init__(self, channel_period_sec: float, window_size: int = 240, gap_index: Union[GapIndex, None] = None):
+        """
+        :param channel_period_sec: the channel period in seconds (used to detect missing messages)
+        :param window_size: the number of the last RSSI values that are considered for the rolling statistics
+        :param gap_index: an empty gap index that should be updated by the monitor (f.e. to share it with the owner of
+                          the monitor) or None to create a new one
+        """
+        if window_size < 1:
+            raise ValueError('window size needs to be at least 1')
+        if gap_index is not None and gap_index.received_count:
+            raise ValueError('the given gap index needs to be empty')
+        self._gap_index = GapIndex(channel_period_sec) if gap_index is None else gap_index
+        self._window = _RollingWindow(window_size)
+        self._histograms: dict[ChannelId, np.ndarray] = {}
+        self._last_rssi = None
+        # correlation between the RSSI and the number of missing messages before each page
+        self._correlation = _RunningCorrelation()
+        # RSSI values of the pages directly around a gap
+        self._gap_rssi_sum = 0
+        self._gap_rssi_count = 0
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<received={self.received_count} | missing={self.missing_count} "
+                f"| rolling-mean={self.rolling_mean_dbm}>")
+
+    @property
+    def window_size(self) -> int:
+        """
+        :return: the number of the last RSSI values that are considered for the rolling statistics
+        """
+        return self._window.size
+
+    @property
+    def gap_index(self) -> GapIndex:
+        """
+        :return: the gap index that detects the missing messages between the received pages (the monitor does not
+                 discard the details of old gaps, see :meth:`GapIndex.discard_before`)
+        """
+        return self._gap_index
+
+    @property
+    def received_count(self) -> int:
+        """
+        :return: the number of all received pages
+        """
+        return self._gap_index.received_count
+
+    @property
+    def rssi_count(self) -> int:
+        """
+        :return: the number of all received pages that provided a RSSI value
+        """
+        return self._window.total_count
+
+    @property
+    def missing_count(self) -> int:
+        """
+        :return: the number of all detected missing messages
+        """
+        return self._gap_index.missing_count
+
+    @property
+    def rolling_mean_dbm(self) -> Union[float, None]:
+        """
+        :return: the mean RSSI value over the rolling window or None if no RSSI value was received yet
+        """
+        return self._window.mean
+
+    @property
+    def mean_rssi_around_gaps_dbm(self) -> Union[float, None]:
+        """
+        :return: the mean RSSI value of the pages that were received directly before and after missing messages or None
+                 if there was no gap yet
+        """
+        if self._gap_rssi_count == 0:
+            return None
+        return self._gap_rssi_sum / self._gap_rssi_count
+
+    @property
+    def rssi_missing_correlation(self) -> float:
+        """
+        :return: the Pearson correlation coefficient between the RSSI of a page and the number of messages that were
+                 missing directly before it (a negative value means, that RSSI dips come along with missing messages
+                 - NaN if it can not be determined yet)
+        """
+        return self._correlation.coefficient
+
+    @property
+    def histogram_bin_edges(self) -> np.ndarray:
+        """
+        :return: the bin edges of all histograms (one bin per dBm)
+        """
+        return np.arange(self.RSSI_MIN_DBM, self.RSSI_MAX_DBM + 2)
+
+    def get_rolling_percentile(self, percentile: float) -> Union[float, None]:
+        """
+        :param percentile: the percentile (0-100) that should be calculated
+        :return: the percentile of the RSSI values within the rolling window or None if no RSSI value was received yet
+        """
+        return self._window.get_percentile(percentile)
+
+    def get_histograms(self) -> dict[ChannelId, np.ndarray]:
+        """
+        :return: a copy of the RSSI histogram for every channel (the bins are described by
+                 :meth:`LinkQualityMonitor.histogram_bin_edges`)
+        """
+        return {channel_id: histogram.copy() for channel_id, histogram in self._histograms.items()}
+
+    def is_marginal(self, min_rssi_dbm: float, percentile: float = 10) -> bool:
+        """
+        :param min_rssi_dbm: the minimal RSSI value that is expected
+        :param percentile: the percentile of the rolling window that needs to be above ``min_rssi_dbm``
+        :return: True if the given percentile of the rolling window is below the expected minimal RSSI value
+        """
+        value = self.get_rolling_percentile(percentile)
+        return value is not None and value < min_rssi_dbm
+
+    def update(self, page: BaseReceivedAntplusPage) -> None:
+        """
+        Updates the statistics with a new received page (pages need to be provided in receive order).
+
+        :param page: the received page
+        """
+        rssi = page.rssi
+        missing = self._gap_index.update(page.monotonic_timestamp)
+
+        if rssi is None:
+            self._last_rssi = None
+            return
+
+        self._window.append(rssi)
+
+        channel_id = page.channel_id
+        if channel_id not in self._histograms:
+            self._histograms[channel_id] = np.zeros(self.RSSI_MAX_DBM - self.RSSI_MIN_DBM + 1, dtype=np.int64)
+        self._histograms[channel_id][rssi - self.RSSI_MIN_DBM] += 1
+
+        if missing > 0:
+            self._gap_rssi_sum += rssi
+            self._gap_rssi_count += 1
+            if self._last_rssi is not None:
+                self._gap_rssi_sum += self._last_rssi
+                self._gap_rssi_count += 1
+        if self._gap_index.received_count > 1:
+            self._correlation.update(rssi, missing)
+        self._last_rssi = rssi
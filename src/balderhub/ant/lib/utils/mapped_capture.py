@@ -0,0 +1,647 @@
+from __future__ import annotations
+
+import collections.abc
+import logging
+import mmap
+import os
+import pathlib
+import struct
+from typing import Callable, Iterator, NamedTuple, Union
+
+import numpy as np
+
+from .capture_file import CAPTURE_PAYLOAD_SIZE, CaptureHeader, CaptureRecord, RecordKind, unpack_capture_header, \
+    unpack_record_from, _RECORD_HEADER_STRUCT
+from .clock_anchor import ClockAnchor
+from .extended_data import parse_flagged_extended_data
+from .extended_meta.extended_meta_legacy_channel_id import ExtendedMetaLegacyChannelId
+from .page_message_collection import PageMessageCollection
+from .pages import BaseReceivedAntplusPage
+
+logger = logging.getLogger(__name__)
+
+#: magic bytes every capture index file starts with
+CAPTURE_INDEX_MAGIC = b'BHANTIDX'
+#: version of the capture index format
+CAPTURE_INDEX_VERSION = 1
+#: suffix that is appended to the path of a capture to get the path of its index file
+CAPTURE_INDEX_SUFFIX = '.bhidx'
+
+# magic, version, sorted flag, record count, offset of the first byte that is not indexed
+_INDEX_HEADER_STRUCT = struct.Struct('<8sHB5xQQ')
+# name and data type of every column of the index (in the order they are stored within an index file)
+_INDEX_COLUMN_TYPES = (
+    ('offsets', np.int64), ('timestamps', np.float64), ('kinds', np.uint8), ('first_bytes', np.uint8)
+)
+
+
+def create_received_page(
+        page_type: type[BaseReceivedAntplusPage],
+        payload: Union[bytes, memoryview],
+        extended_data: Union[bytes, memoryview],
+        extended_format: str,
+        timestamp: float,
+        clock_anchor: ClockAnchor
+) -> BaseReceivedAntplusPage:
+    """
+    Creates a received page out of the data of a capture record.
+
+    :param page_type: the page type the record holds
+    :param payload: the 8 payload bytes of the record
+    :param extended_data: the raw extended data of the record
+    :param extended_format: the format the extended data was recorded in (see :class:`CaptureHeader`)
+    :param timestamp: the monotonic timestamp of the new page
+    :param clock_anchor: the clock anchor of the new page
+    :return: the new page
+    """
+    meta = None
+    parsed_extended_data = None
+    if extended_format == 'legacy':
+        meta = [ExtendedMetaLegacyChannelId(bytes(extended_data))]
+    elif extended_format == 'flagged':
+        parsed_extended_data = parse_flagged_extended_data(bytes(extended_data), offset=0) if extended_data else None
+    elif extended_format != 'none':
+        raise ValueError(f'capture holds unexpected extended format `{extended_format}`')
+    return page_type(
+        bytes(payload), timestamp=timestamp, extended_metas=meta, clock_anchor=clock_anchor,
+        extended_data=parsed_extended_data
+    )
+
+
+class _CaptureIndexColumns(NamedTuple):
+    """the columns of a :class:`CaptureIndex`"""
+    offsets: np.ndarray
+    timestamps: np.ndarray
+    kinds: np.ndarray
+    first_bytes: np.ndarray
+
+
+class CaptureIndex:
+    """
+    Sidecar index of a capture file, that holds one entry per record (offset within the capture, timestamp, kind and
+    the first payload byte). It allows to look up records by time and by page number without reading the capture
+    itself. The index is stored next to the capture (see :data:`CAPTURE_INDEX_SUFFIX`) as plain arrays, so that loading
+    it only maps the file into memory.
+    """
+
+    def __init__(
+            self,
+            offsets: np.ndarray,
+            timestamps: np.ndarray,
+            kinds: np.ndarray,
+            first_bytes: np.ndarray,
+            indexed_end: int,
+            is_sorted: bool
+    ):
+        """
+        :param offsets: int64 array with the offset of every record within the capture file
+        :param timestamps: float64 array with the timestamp of every record
+        :param kinds: uint8 array with the kind of every record
+        :param first_bytes: uint8 array with the first payload byte of every record (the page number for BROADCAST and
+                            ACK records or the event code for EVENT records)
+        :param indexed_end: the offset of the first byte of the capture that is not indexed
+        :param is_sorted: True if the timestamps are in ascending order
+        """
+        self._columns = _CaptureIndexColumns(
+            offsets=offsets, timestamps=timestamps, kinds=kinds, first_bytes=first_bytes)
+        self._indexed_end = indexed_end
+        self._is_sorted = is_sorted
+        # the mapped index file the columns are stored in (only if the index was loaded)
+        self._source: Union[mmap.mmap, None] = None
+        self._indices_by_key: dict[tuple[int, int, int], np.ndarray] = {}
+
+    def __enter__(self) -> CaptureIndex:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{len(self)} records>"
+
+    def __len__(self):
+        return len(self._columns.offsets)
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """
+        :return: the offset of every record within the capture file
+        """
+        return self._columns.offsets
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """
+        :return: the timestamp of every record
+        """
+        return self._columns.timestamps
+
+    @property
+    def kinds(self) -> np.ndarray:
+        """
+        :return: the kind (see :class:`RecordKind`) of every record
+        """
+        return self._columns.kinds
+
+    @property
+    def first_bytes(self) -> np.ndarray:
+        """
+        :return: the first payload byte of every record
+        """
+        return self._columns.first_bytes
+
+    @property
+    def indexed_end(self) -> int:
+        """
+        :return: the offset of the first byte of the capture that is not covered by this index
+        """
+        return self._indexed_end
+
+    @property
+    def is_sorted(self) -> bool:
+        """
+        :return: True if the timestamps of the records are in ascending order
+        """
+        return self._is_sorted
+
+    @staticmethod
+    def _scan_record_offsets(raw: np.ndarray, start_offset: int) -> tuple[np.ndarray, int]:
+        """
+        Determines the offsets of all complete records of a capture. Consecutive records usually have the same size, so
+        as soon as the size is stable, the offsets of the following records are predicted with it and verified with one
+        vectorized access of their headers - the scan only continues record by record where the size changes.
+
+        :param raw: uint8 array of the complete capture
+        :param start_offset: the offset of the first record
+        :return: a tuple with the offsets of the records and the offset of the first byte after the last complete record
+        """
+        header_size = _RECORD_HEADER_STRUCT.size
+        # the last byte of every record header holds the length of the extended data
+        ext_lengths = raw.data
+        offset_chunks = []
+        scanned_offsets = []
+        offset = start_offset
+        window = 64
+        last_record_size = stable_count = 0
+        while offset + header_size + CAPTURE_PAYLOAD_SIZE <= len(raw):
+            record_size = header_size + CAPTURE_PAYLOAD_SIZE + ext_lengths[offset + header_size - 1]
+            if offset + record_size > len(raw):
+                break
+            stable_count = stable_count + 1 if record_size == last_record_size else 1
+            last_record_size = record_size
+            if stable_count < 8:
+                scanned_offsets.append(offset)
+                offset += record_size
+                continue
+            candidates = offset + record_size * np.arange(min(window, (len(raw) - offset) // record_size))
+            matches = raw[candidates + header_size - 1] == ext_lengths[offset + header_size - 1]
+            run = len(candidates) if matches.all() else int(np.argmin(matches))
+            offset_chunks.extend([np.array(scanned_offsets, dtype=np.int64), candidates[:run]])
+            scanned_offsets = []
+            offset += run * record_size
+            # predict more records at once while the record size is stable
+            window = min(65536, 2 * window) if run == len(candidates) else 64
+        offset_chunks.append(np.array(scanned_offsets, dtype=np.int64))
+        return np.concatenate(offset_chunks), offset
+
+    @classmethod
+    def build(
+            cls,
+            buffer: Union[bytes, memoryview, mmap.mmap],
+            start_offset: int,
+            previous: Union[CaptureIndex, None] = None
+    ) -> CaptureIndex:
+        """
+        Creates the index by scanning the record headers of a capture (the payloads are not read). An incomplete record
+        at the end of the capture is not indexed.
+
+        :param buffer: the buffer that holds the complete capture
+        :param start_offset: the offset of the first record that should be indexed
+        :param previous: if given, the new index extends this index (``start_offset`` needs to be its ``indexed_end``)
+        :return: the new index
+        """
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+        offsets, indexed_end = cls._scan_record_offsets(raw, start_offset)
+        columns = {
+            'offsets': offsets,
+            'timestamps': raw[offsets[:, np.newaxis] + np.arange(8)].view('<f8').ravel(),
+            'kinds': raw[offsets + 8],
+            'first_bytes': raw[offsets + _RECORD_HEADER_STRUCT.size],
+        }
+        is_sorted = bool(np.all(np.diff(columns['timestamps']) >= 0))
+        if previous is not None and len(previous) > 0:
+            if len(offsets) > 0:
+                is_sorted = is_sorted and previous.is_sorted and \
+                    bool(previous.timestamps[-1] <= columns['timestamps'][0])
+            else:
+                is_sorted = previous.is_sorted
+            columns = {name: np.concatenate([getattr(previous, name), column]) for name, column in columns.items()}
+        return cls(**columns, indexed_end=indexed_end, is_sorted=is_sorted)
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        """
+        Writes the index file (the file is replaced atomically).
+
+        :param path: the path of the index file
+        """
+        path = pathlib.Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as file:
+            file.write(_INDEX_HEADER_STRUCT.pack(
+                CAPTURE_INDEX_MAGIC, CAPTURE_INDEX_VERSION, self._is_sorted, len(self), self._indexed_end
+            ))
+            for column in self._columns:
+                file.write(np.ascontiguousarray(column).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike]) -> CaptureIndex:
+        """
+        Maps an index file into memory. The columns are read lazily by the operating system.
+
+        :param path: the path of the index file
+        :return: the index
+        """
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(buffer) < _INDEX_HEADER_STRUCT.size:
+                raise ValueError('file is too short to be a capture index')
+            magic, version, is_sorted, count, indexed_end = _INDEX_HEADER_STRUCT.unpack_from(buffer, 0)
+            if magic != CAPTURE_INDEX_MAGIC:
+                raise ValueError(f'file is no capture index (unexpected magic bytes {bytes(magic)!r})')
+            if version != CAPTURE_INDEX_VERSION:
+                raise ValueError(f'unsupported capture index version {version}')
+            if len(buffer) != _INDEX_HEADER_STRUCT.size + count * sum(
+                    np.dtype(dtype).itemsize for _, dtype in _INDEX_COLUMN_TYPES):
+                raise ValueError('capture index is incomplete')
+        except ValueError:
+            buffer.close()
+            raise
+        offset = _INDEX_HEADER_STRUCT.size
+        columns = {}
+        for name, dtype in _INDEX_COLUMN_TYPES:
+            columns[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += count * np.dtype(dtype).itemsize
+        index = cls(**columns, indexed_end=indexed_end, is_sorted=bool(is_sorted))
+        index._source = buffer
+        return index
+
+    def close(self) -> None:
+        """
+        Releases the mapped index file (if the index was loaded with :meth:`CaptureIndex.load`). The index is empty
+        afterwards. Columns that are still referenced keep the mapping alive till they are released.
+        """
+        if self._source is None:
+            return
+        self._columns = _CaptureIndexColumns(*(np.empty(0, dtype=dtype) for _, dtype in _INDEX_COLUMN_TYPES))
+        self._indices_by_key.clear()
+        try:
+            self._source.close()
+        except BufferError:
+            # columns are still exported - the mapping is released with the last column
+            pass
+        self._source = None
+
+    def find_time_range(self, start: Union[float, None] = None, end: Union[float, None] = None) -> np.ndarray:
+        """
+        :param start: start (inclusive) timestamp
+        :param end: end (inclusive) timestamp
+        :return: the indices of all records within the given time range (in ascending order of the record indices)
+        """
+        timestamps = self._columns.timestamps
+        if self._is_sorted:
+            start_idx = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+            end_idx = len(self) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+            return np.arange(start_idx, max(start_idx, end_idx), dtype=np.int64)
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= timestamps >= start
+        if end is not None:
+            mask &= timestamps <= end
+        return np.flatnonzero(mask)
+
+    def find_page(self, page_number: int, kind: RecordKind = RecordKind.BROADCAST, page_number_mask: int = 0xFF) \
+            -> np.ndarray:
+        """
+        :param page_number: the page number to look for
+        :param kind: the kind of the records to look for
+        :param page_number_mask: the bit mask that is applied to the first payload byte before it is compared with the
+                                 page number (f.e. ``0x7F`` for profiles that use the upper bit as toggle bit)
+        :return: the indices of all records of the given kind with the given page number (the result is cached)
+        """
+        key = (page_number, int(kind), page_number_mask)
+        if key not in self._indices_by_key:
+            self._indices_by_key[key] = np.flatnonzero(
+                (self._columns.kinds == kind) & ((self._columns.first_bytes & page_number_mask) == page_number)
+            )
+        return self._indices_by_key[key]
+
+
+class MappedCaptureReader:
+    """
+    Random-access reader for capture files (see :class:`CaptureWriter`), that maps the capture into memory instead of
+    reading it. Records are looked up with a :class:`CaptureIndex`, that is loaded from its sidecar file (or created
+    once and stored next to the capture), so that opening a capture does not depend on its size and every query only
+    touches the parts of the capture it needs.
+
+    Payloads and extended data are returned as zero-copy ``memoryview`` objects of the mapped file. They stay valid as
+    long as they are referenced, even if the reader was closed.
+    """
+
+    def __init__(
+            self,
+            path: Union[str, os.PathLike],
+            index_path: Union[str, os.PathLike, None] = None,
+            write_index: bool = True
+    ):
+        """
+        :param path: the path of the capture file
+        :param index_path: the path of the index file (defaults to the capture path with :data:`CAPTURE_INDEX_SUFFIX`)
+        :param write_index: True if a new or extended index should be written to the index file
+        """
+        self._path = pathlib.Path(path)
+        self._index_path = pathlib.Path(index_path) if index_path is not None else \
+            self._path.with_name(self._path.name + CAPTURE_INDEX_SUFFIX)
+        with open(self._path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        self._header, self._records_offset = unpack_capture_header(self._buffer)
+        self._index = self._load_index(write_index)
+
+    def __enter__(self) -> MappedCaptureReader:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self._path} | {len(self)} records>"
+
+    def _load_index(self, write_index: bool) -> CaptureIndex:
+        index = None
+        if self._index_path.exists():
+            try:
+                index = CaptureIndex.load(self._index_path)
+            except ValueError as exc:
+                logger.warning(f'ignore invalid capture index `{self._index_path}`: {exc}')
+            if index is not None and index.indexed_end > len(self._buffer):
+                logger.warning(f'ignore capture index `{self._index_path}`, because it does not match the capture')
+                index.close()
+                index = None
+        if index is not None and index.indexed_end == len(self._buffer):
+            return index
+
+        if index is None:
+            index = CaptureIndex.build(self._buffer, self._records_offset)
+        else:
+            # the capture was extended since the index was written - only index the new records
+            previous = index
+            index = CaptureIndex.build(self._buffer, previous.indexed_end, previous=previous)
+            if len(index) == len(previous):
+                # only an incomplete record was appended
+                return previous
+            # the new index holds copies of all columns
+            previous.close()
+        if write_index:
+            try:
+                index.save(self._index_path)
+            except OSError as exc:
+                logger.warning(f'unable to write capture index `{self._index_path}`: {exc}')
+        return index
+
+    @property
+    def path(self) -> pathlib.Path:
+        """
+        :return: the path of the capture file
+        """
+        return self._path
+
+    @property
+    def header(self) -> CaptureHeader:
+        """
+        :return: the header of the capture
+        """
+        return self._header
+
+    @property
+    def records_offset(self) -> int:
+        """
+        :return: the offset of the first record within the file
+        """
+        return self._records_offset
+
+    @property
+    def index(self) -> CaptureIndex:
+        """
+        :return: the index of the capture
+        """
+        return self._index
+
+    def _get_record_layout(self, idx: int) -> tuple[int, int, int]:
+        offset = int(self._index.offsets[idx])
+        payload_start = offset + _RECORD_HEADER_STRUCT.size
+        ext_start = payload_start + CAPTURE_PAYLOAD_SIZE
+        ext_len = self._buffer[offset + _RECORD_HEADER_STRUCT.size - 1]
+        return payload_start, ext_start, ext_start + ext_len
+
+    def get_payload(self, idx: int) -> memoryview:
+        """
+        :param idx: the index of the record
+        :return: a zero-copy view of the 8 payload bytes of the record
+        """
+        payload_start, ext_start, _ = self._get_record_layout(idx)
+        return self._buffer[payload_start:ext_start]
+
+    def get_extended_data(self, idx: int) -> memoryview:
+        """
+        :param idx: the index of the record
+        :return: a zero-copy view of the raw extended data of the record
+        """
+        _, ext_start, end = self._get_record_layout(idx)
+        return self._buffer[ext_start:end]
+
+    def get_record(self, idx: int) -> CaptureRecord:
+        """
+        :param idx: the index of the record
+        :return: a copy of the record
+        """
+        record, _ = unpack_record_from(self._buffer, int(self._index.offsets[idx]))
+        return record
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        for idx in range(len(self)):
+            yield self.get_record(idx)
+
+    def get_payload_matrix(self, indices: Union[np.ndarray, list[int], None] = None) -> np.ndarray:
+        """
+        This method gathers the payloads of the given records with one vectorized access of the mapped capture.
+
+        :param indices: the indices of the records (defaults to all records)
+        :return: an uint8 array with shape ``(len(indices), 8)`` that holds the payload of one record per row
+        """
+        offsets = self._index.offsets if indices is None else self._index.offsets[np.asarray(indices, dtype=np.int64)]
+        raw = np.frombuffer(self._mmap, dtype=np.uint8)
+        positions = offsets[:, np.newaxis] + _RECORD_HEADER_STRUCT.size + np.arange(CAPTURE_PAYLOAD_SIZE)
+        return raw[positions]
+
+    def get_record_indices(
+            self,
+            kind: Union[RecordKind, None] = None,
+            start: Union[float, None] = None,
+            end: Union[float, None] = None
+    ) -> np.ndarray:
+        """
+        :param kind: if given, only records of this kind are returned
+        :param start: start (inclusive) timestamp
+        :param end: end (inclusive) timestamp
+        :return: the indices of all matching records (in the order of their timestamps)
+        """
+        indices = self._index.find_time_range(start=start, end=end)
+        if kind is not None:
+            indices = indices[self._index.kinds[indices] == kind]
+        if not self._index.is_sorted:
+            indices = indices[np.argsort(self._index.timestamps[indices], kind='stable')]
+        return indices
+
+    def create_page_collection(
+            self,
+            pages_by_number: dict[int, type[BaseReceivedAntplusPage]],
+            kind: RecordKind = RecordKind.BROADCAST,
+            start: Union[float, None] = None,
+            end: Union[float, None] = None,
+            page_number_mask: int = 0xFF
+    ) -> MappedPageMessageCollection:
+        """
+        This method creates a collection of all matching records, that creates the page objects lazily on access.
+        Records with a page number that is not given within ``pages_by_number`` are skipped.
+
+        :param pages_by_number: the page types by their page number (f.e.
+                                :meth:`BaseAntplusDeviceProfile.get_existing_pages_for_profile`)
+        :param kind: the kind of the records (BROADCAST or ACK)
+        :param start: start (inclusive) timestamp
+        :param end: end (inclusive) timestamp
+        :param page_number_mask: the bit mask that is applied to the first payload byte to get the page number (f.e.
+                                 ``0x7F`` for profiles that use the upper bit as toggle bit)
+        :return: the lazy collection
+        """
+        if kind not in (RecordKind.BROADCAST, RecordKind.ACK):
+            raise ValueError(f'can not create pages for records of kind {kind.name}')
+        indices = self.get_record_indices(kind=kind, start=start, end=end)
+        page_numbers = self._index.first_bytes[indices] & page_number_mask
+        indices = indices[np.isin(page_numbers, list(pages_by_number.keys()))]
+        return MappedPageMessageCollection(
+            reader=self, record_indices=indices, pages_by_number=pages_by_number, page_number_mask=page_number_mask
+        )
+
+    def close(self) -> None:
+        """
+        Releases the mapping of the capture and of its index. Views that are still referenced keep the mapping alive
+        till they are released.
+        """
+        self._index.close()
+        self._buffer.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # views are still exported - the mapping is released with the last view
+            pass
+
+
+class _LazyPageSequence(collections.abc.Sequence):
+    """
+    Sequence of pages, that creates every page on its first access.
+    """
+
+    def __init__(self, create_page: Callable[[int], BaseReceivedAntplusPage], length: int):
+        self._create_page = create_page
+        self._pages: list[Union[BaseReceivedAntplusPage, None]] = [None] * length
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[idx] for idx in range(len(self))[item]]
+        page = self._pages[item]
+        if page is None:
+            idx = range(len(self))[item]
+            page = self._pages[idx] = self._create_page(idx)
+        return page
+
+    def copy(self) -> list[BaseReceivedAntplusPage]:
+        """
+        :return: a list with all pages
+        """
+        return list(self)
+
+
+class MappedPageMessageCollection(PageMessageCollection):
+    """
+    Read-only collection of the pages of a memory-mapped capture (see
+    :meth:`MappedCaptureReader.create_page_collection`). The page objects are only created when they are accessed,
+    filtering by type or time and the raw data matrix are answered by the index and the mapped capture directly.
+    """
+
+    def __init__(
+            self,
+            reader: MappedCaptureReader,
+            record_indices: np.ndarray,
+            pages_by_number: dict[int, type[BaseReceivedAntplusPage]],
+            page_number_mask: int = 0xFF
+    ):
+        super().__init__()
+        self._reader = reader
+        self._record_indices = record_indices
+        self._pages_by_number = pages_by_number
+        self._page_number_mask = page_number_mask
+        self._messages = _LazyPageSequence(self._create_page, len(record_indices))
+        self._timestamps = reader.index.timestamps[record_indices]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{len(self)} pages of {self._reader.path}>"
+
+    def _create_page(self, idx: int) -> BaseReceivedAntplusPage:
+        record_idx = int(self._record_indices[idx])
+        payload = self._reader.get_payload(record_idx)
+        return create_received_page(
+            self._pages_by_number[payload[0] & self._page_number_mask],
+            payload=payload,
+            extended_data=self._reader.get_extended_data(record_idx),
+            extended_format=self._reader.header.extended_format,
+            timestamp=float(self._timestamps[idx]),
+            clock_anchor=self._reader.header.clock_anchor,
+        )
+
+    @property
+    def record_indices(self) -> np.ndarray:
+        """
+        :return: the indices of the records of all pages within the capture
+        """
+        return self._record_indices
+
+    def append(self, message: BaseReceivedAntplusPage) -> None:
+        raise TypeError(f'can not append messages to a {self.__class__.__name__}')
+
+    def _create_copy(self, indices: list[int]) -> MappedPageMessageCollection:
+        return MappedPageMessageCollection(
+            self._reader, self._record_indices[indices], self._pages_by_number, self._page_number_mask
+        )
+
+    def filter_by_type(self, page_type: type[BaseReceivedAntplusPage], as_view: bool = False) -> PageMessageCollection:
+        page_numbers = [number for number, cur_type in self._pages_by_number.items() if cur_type == page_type]
+        first_bytes = self._reader.index.first_bytes[self._record_indices] & self._page_number_mask
+        return self._create_filtered(np.flatnonzero(np.isin(first_bytes, page_numbers)).tolist(), as_view=as_view)
+
+    def get_message_types(self) -> set[type[BaseReceivedAntplusPage]]:
+        first_bytes = self._reader.index.first_bytes[self._record_indices] & self._page_number_mask
+        return {self._pages_by_number[number] for number in np.unique(first_bytes).tolist()}
+
+    def get_timestamp_column(self) -> np.ndarray:
+        return np.array(self._timestamps, dtype=np.float64)
+
+    def get_raw_data_matrix(self) -> np.ndarray:
+        return self._reader.get_payload_matrix(self._record_indices)
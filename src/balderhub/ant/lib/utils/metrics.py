@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import bisect
+import http.server
+import logging
+import math
+import threading
+import time
+from typing import Callable, NamedTuple, Union
+
+logger = logging.getLogger(__name__)
+
+#: default bucket upper bounds in seconds for histograms that measure durations
+DEFAULT_DURATION_BUCKETS_SEC = (
+    1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1., 5., 10., 60.
+)
+
+LabelsT = tuple[tuple[str, str], ...]
+
+
+def _to_labels(labels: dict[str, object]) -> LabelsT:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Counter:
+    """
+    Monotonically increasing value. Updating a counter is not locked, so every counter should only be updated from
+    one thread.
+    """
+
+    __slots__ = ('_value',)
+
+    def __init__(self):
+        self._value = 0
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self._value}>"
+
+    @property
+    def value(self) -> float:
+        """
+        :return: the current value of the counter
+        """
+        return self._value
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Increases the counter.
+
+        :param amount: the amount the counter should be increased with
+        """
+        self._value += amount
+
+
+class Gauge:
+    """
+    Value that is determined by a callback only when it is read (f.e. the current depth of a queue), so that it does
+    not cost anything while it is not read.
+    """
+
+    __slots__ = ('_callback',)
+
+    def __init__(self, callback: Callable[[], float]):
+        """
+        :param callback: the callback that returns the current value
+        """
+        self._callback = callback
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self.value}>"
+
+    @property
+    def value(self) -> float:
+        """
+        :return: the current value of the gauge (NaN if the callback fails)
+        """
+        try:
+            return self._callback()
+        except Exception:  # pylint: disable=broad-exception-caught
+            return math.nan
+
+
+class HistogramSnapshot(NamedTuple):
+    """
+    Snapshot of a :class:`Histogram`
+    """
+    #: the upper bounds of the buckets (the last bucket, that has no upper bound, is not part of it)
+    bucket_bounds: tuple[float, ...]
+    #: the number of observations per bucket (one more than the bounds - the last one counts the values above all
+    #: bounds)
+    bucket_counts: tuple[int, ...]
+    #: the number of all observations
+    count: int
+    #: the sum of all observed values
+    sum: float
+
+    @property
+    def mean(self) -> float:
+        """
+        :return: the mean of all observed values (NaN if there is no observation)
+        """
+        return self.sum / self.count if self.count else math.nan
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        :param quantile: the quantile (between 0 and 1)
+        :return: the upper bound of the bucket the given quantile is in (infinity if it is above all bounds, NaN if
+                 there is no observation)
+        """
+        if self.count == 0:
+            return math.nan
+        rank = quantile * self.count
+        cumulative_count = 0
+        for bound, bucket_count in zip(self.bucket_bounds, self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return bound
+        return math.inf
+
+
+class Histogram:
+    """
+    Counts observed values within fixed buckets. The buckets are preallocated, so observing a value only needs a binary
+    search. Updating a histogram is not locked, so every histogram should only be updated from one thread.
+    """
+
+    __slots__ = ('_bounds', '_counts', '_count', '_sum')
+
+    def __init__(self, bucket_bounds: tuple[float, ...] = DEFAULT_DURATION_BUCKETS_SEC):
+        """
+        :param bucket_bounds: the sorted upper bounds of the buckets
+        """
+        if list(bucket_bounds) != sorted(bucket_bounds):
+            raise ValueError('bucket bounds need to be sorted')
+        self._bounds = tuple(bucket_bounds)
+        self._counts = [0] * (len(bucket_bounds) + 1)
+        self._count = 0
+        self._sum = 0.
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<count={self._count} | sum={self._sum}>"
+
+    def observe(self, value: float) -> None:
+        """
+        Adds a new observation.
+
+        :param value: the observed value
+        """
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self._count += 1
+        self._sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        """
+        :return: a snapshot of the current state
+        """
+        return HistogramSnapshot(self._bounds, tuple(self._counts), self._count, self._sum)
+
+
+class MetricsSnapshot(NamedTuple):
+    """
+    Snapshot of all metrics of a :class:`MetricsRegistry`. The values are mapped by a tuple of the metric name and its
+    labels (a sorted tuple of key-value pairs).
+    """
+    #: the monotonic ``time.perf_counter()`` timestamp the snapshot was taken at
+    timestamp: float
+    #: the values of all counters
+    counters: dict[tuple[str, LabelsT], float]
+    #: the values of all gauges
+    gauges: dict[tuple[str, LabelsT], float]
+    #: the snapshots of all histograms
+    histograms: dict[tuple[str, LabelsT], HistogramSnapshot]
+
+    def get_counter(self, name: str, **labels) -> float:
+        """
+        :param name: the name of the counter
+        :param labels: the labels of the counter
+        :return: the value of the counter (0 if it does not exist)
+        """
+        return self.counters.get((name, _to_labels(labels)), 0)
+
+    def get_gauge(self, name: str, **labels) -> Union[float, None]:
+        """
+        :param name: the name of the gauge
+        :param labels: the labels of the gauge
+        :return: the value of the gauge or None if it does not exist
+        """
+        return self.gauges.get((name, _to_labels(labels)))
+
+    def get_histogram(self, name: str, **labels) -> Union[HistogramSnapshot, None]:
+        """
+        :param name: the name of the histogram
+        :param labels: the labels of the histogram
+        :return: the snapshot of the histogram or None if it does not exist
+        """
+        return self.histograms.get((name, _to_labels(labels)))
+
+    def get_rate(self, previous: MetricsSnapshot, name: str, **labels) -> float:
+        """
+        :param previous: an older snapshot of the same registry
+        :param name: the name of the counter
+        :param labels: the labels of the counter
+        :return: the increase of the counter per second between both snapshots
+        """
+        duration = self.timestamp - previous.timestamp
+        if duration <= 0:
+            raise ValueError('the previous snapshot needs to be older than this one')
+        return (self.get_counter(name, **labels) - previous.get_counter(name, **labels)) / duration
+
+
+class _MetricFamily:
+
+    def __init__(self, name: str, documentation: str, metric_type: str):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.children: dict[LabelsT, Union[Counter, Gauge, Histogram]] = {}
+
+
+class MetricsRegistry:
+    """
+    Holds all metrics (counters, gauges and histograms) of a component. The metrics are identified by their name and
+    their labels. They are created once (f.e. when a channel is opened) and then updated directly within the hot path,
+    so that the registry itself is only involved when metrics are created or read out.
+    """
+
+    def __init__(self):
+        self._families: dict[str, _MetricFamily] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{len(self._families)} metrics>"
+
+    def _get_or_create(self, name: str, documentation: str, metric_type: str, labels: dict[str, object],
+                       factory: Callable[[], Union[Counter, Gauge, Histogram]]) -> Union[Counter, Gauge, Histogram]:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = _MetricFamily(name, documentation, metric_type)
+            elif family.metric_type != metric_type:
+                raise ValueError(f'metric `{name}` is already registered as {family.metric_type}')
+            key = _to_labels(labels)
+            metric = family.children.get(key)
+            if metric is None:
+                metric = family.children[key] = factory()
+            return metric
+
+    def counter(self, name: str, documentation: str, **labels) -> Counter:
+        """
+        Returns the counter with the given name and labels (it is created if it does not exist yet).
+
+        :param name: the name of the counter (should end with ``_total``)
+        :param documentation: the description of the counter
+        :param labels: the labels of the counter
+        :return: the counter
+        """
+        return self._get_or_create(name, documentation, 'counter', labels, Counter)
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float], **labels) -> Gauge:
+        """
+        Registers a gauge with the given name and labels (an existing gauge is replaced).
+
+        :param name: the name of the gauge
+        :param documentation: the description of the gauge
+        :param callback: the callback that returns the current value
+        :param labels: the labels of the gauge
+        :return: the gauge
+        """
+        gauge = Gauge(callback)
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = _MetricFamily(name, documentation, 'gauge')
+            elif family.metric_type != 'gauge':
+                raise ValueError(f'metric `{name}` is already registered as {family.metric_type}')
+            family.children[_to_labels(labels)] = gauge
+        return gauge
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            bucket_bounds: tuple[float, ...] = DEFAULT_DURATION_BUCKETS_SEC,
+            **labels
+    ) -> Histogram:
+        """
+        Returns the histogram with the given name and labels (it is created if it does not exist yet).
+
+        :param name: the name of the histogram
+        :param documentation: the description of the histogram
+        :param bucket_bounds: the sorted upper bounds of the buckets (only used if the histogram is created)
+        :param labels: the labels of the histogram
+        :return: the histogram
+        """
+        return self._get_or_create(name, documentation, 'histogram', labels, lambda: Histogram(bucket_bounds))
+
+    def snapshot(self) -> MetricsSnapshot:
+        """
+        :return: a snapshot of all metrics
+        """
+        with self._lock:
+            families = [(family, list(family.children.items())) for family in self._families.values()]
+        result = MetricsSnapshot(time.perf_counter(), {}, {}, {})
+        for family, children in families:
+            for labels, metric in children:
+                if family.metric_type == 'counter':
+                    result.counters[(family.name, labels)] = metric.value
+                elif family.metric_type == 'gauge':
+                    result.gauges[(family.name, labels)] = metric.value
+                else:
+                    result.histograms[(family.name, labels)] = metric.snapshot()
+        return result
+
+    @staticmethod
+    def _format_labels(labels: LabelsT, extra: Union[tuple[str, str], None] = None) -> str:
+        if extra is not None:
+            labels = labels + (extra, )
+        if not labels:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in labels)
+        return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if math.isnan(value):
+            return 'NaN'
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    def to_prometheus_text(self) -> str:
+        """
+        :return: all metrics in the Prometheus text exposition format (version 0.0.4)
+        """
+        with self._lock:
+            families = [(family, list(family.children.items())) for family in self._families.values()]
+        lines = []
+        for family, children in families:
+            lines.append(f'# HELP {family.name} {family.documentation}')
+            lines.append(f'# TYPE {family.name} {family.metric_type}')
+            for labels, metric in children:
+                if family.metric_type != 'histogram':
+                    lines.append(f'{family.name}{self._format_labels(labels)} {self._format_value(metric.value)}')
+                    continue
+                snapshot = metric.snapshot()
+                cumulative_count = 0
+                for bound, bucket_count in zip(snapshot.bucket_bounds + (math.inf, ), snapshot.bucket_counts):
+                    cumulative_count += bucket_count
+                    le_label = ('le', self._format_value(bound))
+                    lines.append(f'{family.name}_bucket{self._format_labels(labels, le_label)} {cumulative_count}')
+                lines.append(f'{family.name}_sum{self._format_labels(labels)} {self._format_value(snapshot.sum)}')
+                lines.append(f'{family.name}_count{self._format_labels(labels)} {snapshot.count}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    Small HTTP server, that provides the metrics of a :class:`MetricsRegistry` in the Prometheus text exposition format
+    under ``/metrics``. The server is only bound to the loopback interface, so the metrics are not reachable from other
+    hosts.
+    """
+
+    #: the interface the server is bound to
+    HOST = '127.0.0.1'
+
+    def __init__(self, registry: MetricsRegistry, port: int = 0):
+        """
+        :param registry: the registry whose metrics should be provided
+        :param port: the port the server should listen on (0 selects a free port)
+        """
+        self._registry = registry
+        self._port = port
+        self._server: Union[http.server.ThreadingHTTPServer, None] = None
+        self._thread: Union[threading.Thread, None] = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self.url if self.is_running else 'stopped'}>"
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if the server is running
+        """
+        return self._server is not None
+
+    @property
+    def port(self) -> int:
+        """
+        :return: the port the server listens on (the configured one if the server is not running)
+        """
+        return self._port if self._server is None else self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        """
+        :return: the URL the metrics are provided under
+        """
+        return f'http://{self.HOST}:{self.port}/metrics'
+
+    def _create_handler(self) -> type[http.server.BaseHTTPRequestHandler]:
+        registry = self._registry
+
+        class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """returns the metrics for ``/metrics``"""
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                logger.debug(f'metrics request from {self.address_string()}: {format % args}')
+
+        return _MetricsRequestHandler
+
+    def start(self) -> None:
+        """
+        Starts the server within a background thread
+        """
+        if self._server is not None:
+            raise ValueError('metrics server is already running')
+        self._server = http.server.ThreadingHTTPServer((self.HOST, self._port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='ant-metrics-server', daemon=True)
+        self._thread.start()
+        logger.info(f'provide metrics under {self.url}')
+
+    def stop(self, timeout: float = 5) -> None:
+        """
+        Stops the server.
+
+        :param timeout: the maximum time in seconds to wait for the server thread
+        """
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=timeout)
+        self._server = None
+        self._thread = None
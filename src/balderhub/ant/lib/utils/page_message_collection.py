@@ -1,9 +1,17 @@
 from __future__ import annotations
 
+import bisect
+import collections
 import sys
-from typing import Iterator, SupportsIndex, Union, Any, TYPE_CHECKING
+from typing import Iterator, NamedTuple, SupportsIndex, Union, Any, TYPE_CHECKING
 
 from datetime import datetime
+
+import numpy as np
+
+from .counter import unwrap_counter
+from .extended_data import FLAGGED_EXTENDED_DATA_MAX_SIZE, get_flagged_extended_data_field
+from .hardware_timeline import HW_TIMESTAMP_FREQUENCY_HZ, unwrap_hw_timestamp_ticks, reconstruct_hw_timeline
 if TYPE_CHECKING:
     from .pages.base_received_antplus_page import BaseReceivedAntplusPage, BaseReceivedAntplusPageTypeT
 
@@ -15,6 +23,10 @@ class PageMessageCollection:
 
     def __init__(self, initial_messages: list[BaseReceivedAntplusPageTypeT] = None):
         self._messages = []
+        # the monotonic timestamps of all messages (same order as the messages) - used for all sorting and filtering
+        self._timestamps: list[float] = []
+        # maps every message to its position (created lazily on first lookup)
+        self._position_by_message: Union[dict[BaseReceivedAntplusPageTypeT, int], None] = None
 
         if initial_messages:
             for msg in initial_messages:
@@ -32,6 +44,28 @@ class PageMessageCollection:
     def __getitem__(self, item: int) -> BaseReceivedAntplusPageTypeT:
         return self._messages[item]
 
+    def __contains__(self, item: BaseReceivedAntplusPageTypeT) -> bool:
+        return item in self._get_position_by_message()
+
+    def _get_position_by_message(self) -> dict[BaseReceivedAntplusPageTypeT, int]:
+        if self._position_by_message is None:
+            self._position_by_message = {}
+            for idx, msg in enumerate(self._messages):
+                self._position_by_message.setdefault(msg, idx)
+        return self._position_by_message
+
+    def _create_view(self, indices: list[int]) -> PageMessageCollectionView:
+        return PageMessageCollectionView(source=self, source_indices=indices)
+
+    def _create_copy(self, indices: list[int]) -> PageMessageCollection:
+        result = PageMessageCollection()
+        result._messages = [self._messages[idx] for idx in indices]  # pylint: disable=protected-access
+        result._timestamps = [self._timestamps[idx] for idx in indices]  # pylint: disable=protected-access
+        return result
+
+    def _create_filtered(self, indices: list[int], as_view: bool) -> PageMessageCollection:
+        return self._create_view(indices) if as_view else self._create_copy(indices)
+
     @property
     def messages(self) -> list[BaseReceivedAntplusPageTypeT]:
         """
@@ -39,21 +73,32 @@ class PageMessageCollection:
         """
         return self._messages.copy()
 
-    def append(self, message: BaseReceivedAntplusPageTypeT) -> None:
+    def append(self, message: BaseReceivedAntplusPageTypeT) -> int:
         """
         Adds a message to the collection. It will be automatically inserted in the correct order according to its
         timestamp.
 
         :param message: the message that should be added to the collection
+        :return: the index the message was inserted at
         """
         from .pages.base_received_antplus_page import BaseReceivedAntplusPage  # pylint: disable=import-outside-toplevel
 
         if not isinstance(message, BaseReceivedAntplusPage):
             raise TypeError(f'messages need to be a subclass of type {BaseReceivedAntplusPage}')
 
-        self._messages.append(message)
-
-        self._sort_by_timestamp()
+        timestamp = message.monotonic_timestamp
+        if not self._timestamps or self._timestamps[-1] <= timestamp:
+            # fast path: messages are normally received in order
+            if self._position_by_message is not None:
+                self._position_by_message.setdefault(message, len(self._messages))
+            self._messages.append(message)
+            self._timestamps.append(timestamp)
+            return len(self._messages) - 1
+        idx = bisect.bisect_right(self._timestamps, timestamp)
+        self._messages.insert(idx, message)
+        self._timestamps.insert(idx, timestamp)
+        self._position_by_message = None
+        return idx
 
     def index(
             self,
@@ -69,26 +114,67 @@ class PageMessageCollection:
         :param stop: last index to look at
         :return: the index within the internal messsage list
         """
+        idx = self._get_position_by_message().get(value)
+        if idx is not None and start <= idx < stop:
+            return idx
         return self._messages.index(value, start, stop)
 
-    def _sort_by_timestamp(self):
-        self._messages.sort(key=lambda x: x.timestamp)
+    def get_source_index(self, idx: int) -> int:
+        """
+        Returns the index of the message at the given position within the collection this collection was created from.
+        For a collection that is no view, this is the index itself.
+
+        :param idx: the index of the message within this collection
+        :return: the index of the same message within the source collection
+        """
+        return range(len(self._messages))[idx]
+
+    def iter_with_source_index(self) -> Iterator[tuple[int, BaseReceivedAntplusPageTypeT]]:
+        """
+        Iterates over all messages and provides them together with their index within the source collection (see
+        :meth:`PageMessageCollection.get_source_index`).
+
+        :return: an iterator of tuples ``(source_index, message)``
+        """
+        for idx, msg in enumerate(self._messages):
+            yield self.get_source_index(idx), msg
+
+    def get_previous_distinct_values(self, field_name: str) -> list[Any]:
+        """
+        This method determines for every message the value of the given field, the nearest previous message had, that
+        holds a different value than the message itself. This allows to look up the previous distinct value for all
+        messages in linear time.
+
+        :param field_name: the field name the previous distinct values should be determined for
+        :return: a list with the previous distinct value for every message (None if there is no such previous message)
+        """
+        result = []
+        previous_distinct_value = None
+        last_value = None
+        for msg in self._messages:
+            cur_value = getattr(msg, field_name)
+            if result and cur_value != last_value:
+                previous_distinct_value = last_value
+            result.append(previous_distinct_value)
+            last_value = cur_value
+        return result
 
     def filter_by_type(
             self,
-            page_type: type[BaseReceivedAntplusPageTypeT]
+            page_type: type[BaseReceivedAntplusPageTypeT],
+            as_view: bool = False
     ) -> PageMessageCollection[BaseReceivedAntplusPageTypeT]:
         """
         Returns a new collection that holds all messages from the given type
 
         :param page_type: the page type to filter this message collection
+        :param as_view: True if a read-only :class:`PageMessageCollectionView` should be returned, that keeps the index
+                        of every message within this collection, instead of a new independent collection
         :return: a new collection that holds all messages from the given type
         """
-        result = self.__class__()
-        for msg in self._messages:
-            if msg.__class__ == page_type:
-                result.append(msg)
-        return result
+        return self._create_filtered(
+            [idx for idx, msg in enumerate(self._messages) if msg.__class__ == page_type], as_view=as_view
+        )
 
     def get_unique_values_for_field(
             self,
@@ -114,6 +200,129 @@ class PageMessageCollection:
                 all_values.add(getattr(msg, field_name))
         return all_values
 
+    def get_column(
+            self,
+            field_name: str,
+            dtype: Union[np.dtype, type, None] = None,
+            unwrap_bit_width: Union[int, None] = None,
+    ) -> np.ndarray:
+        """
+        This method returns the values of one field of all messages within this collection as one array. It raises an
+        exception if there is a message type that does not provide the ``field_name`` as property.
+
+        :param field_name: the field name the column should be returned for
+        :param dtype: the optional data type of the returned array (determined automatically if not given)
+        :param unwrap_bit_width: if given, the values are interpreted as rollover counter of this bit width and will be
+                                 unwrapped (see :func:`balderhub.ant.lib.utils.unwrap_counter`)
+        :return: the array with one value per message (in the order of this collection)
+        """
+        column = np.array([getattr(msg, field_name) for msg in self._messages], dtype=dtype)
+        if unwrap_bit_width is not None:
+            column = unwrap_counter(column, bit_width=unwrap_bit_width)
+        return column
+
+    def get_timestamp_column(self) -> np.ndarray:
+        """
+        :return: an array with the monotonic timestamp (see :meth:`BaseReceivedAntplusPage.monotonic_timestamp`) of
+                 every message within this collection
+        """
+        return np.array(self._timestamps, dtype=np.float64)
+
+    def get_raw_data_matrix(self) -> np.ndarray:
+        """
+        This method returns the raw data of all messages within this collection as one matrix. This allows to
+        calculate whole columns vectorized without accessing the message objects again.
+
+        :return: an uint8 array with shape ``(len(self), 8)`` that holds the raw data of one message per row
+        """
+        return np.frombuffer(b''.join(msg.raw_data for msg in self._messages), dtype=np.uint8).reshape(-1, 8)
+
+    def get_flagged_extended_data_matrix(self) -> np.ndarray:
+        """
+        This method returns the raw FLAGGED-EXTENDED-DATA (see
+        :meth:`BaseReceivedAntplusPage.flagged_extended_raw_data`) of all messages within this collection as one
+        matrix. Messages without extended data are described by a row of zeros.
+
+        :return: an uint8 array with shape ``(len(self), FLAGGED_EXTENDED_DATA_MAX_SIZE)`` that holds the extended data
+                 (starting with the flag byte) of one message per row
+        """
+        return np.frombuffer(
+            b''.join(msg.flagged_extended_raw_data.ljust(FLAGGED_EXTENDED_DATA_MAX_SIZE, b'\x00')
+                     for msg in self._messages),
+            dtype=np.uint8
+        ).reshape(-1, FLAGGED_EXTENDED_DATA_MAX_SIZE)
+
+    def get_extended_data_column(
+            self,
+            field_name: str,
+            dtype: Union[np.dtype, type, None] = None,
+            fill_value: Any = None,
+    ) -> np.ndarray:
+        """
+        This method returns the values of one field of the flagged extended data (see
+        :class:`balderhub.ant.lib.utils.FlaggedExtendedData`) of all messages within this collection as one array. If no
+        ``fill_value`` is given, it raises an exception if a message was not received with this information. The
+        values are extracted vectorized from the extended data matrix (see
+        :meth:`PageMessageCollection.get_flagged_extended_data_matrix`), so that the Channel ID fields are also provided
+        for messages that were received with LEGACY-EXTENDED-DATA.
+
+        :param field_name: the field name of the flagged extended data
+        :param dtype: the optional data type of the returned array (defaults to int64)
+        :param fill_value: the value that should be used for messages without this information
+        :return: the array with one value per message (in the order of this collection)
+        """
+        return get_flagged_extended_data_field(
+            self.get_flagged_extended_data_matrix(), field_name, fill_value=fill_value, dtype=dtype
+        )
+
+    def get_rssi_column(self) -> np.ndarray:
+        """
+        :return: returns a float array with the RSSI value in dBm for every message (NaN for messages that were received
+                 without RSSI information)
+        """
+        return self.get_extended_data_column('rssi', dtype=np.float64, fill_value=np.nan)
+
+    def get_channel_id_columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: returns a tuple with three int arrays that hold the device number, the device type and the
+                 transmission type for every message (-1 for messages that were received without Channel ID)
+        """
+        matrix = self.get_flagged_extended_data_matrix()
+        return (
+            get_flagged_extended_data_field(matrix, 'device_number', fill_value=-1),
+            get_flagged_extended_data_field(matrix, 'device_type', fill_value=-1),
+            get_flagged_extended_data_field(matrix, 'trans_type', fill_value=-1),
+        )
+
+    def get_hw_timestamp_column(self, unwrap: bool = True) -> np.ndarray:
+        """
+        This method returns the hardware timestamps of all messages within this collection in seconds. This requires
+        that every message was received with the flagged extended TIMESTAMP information.
+
+        .. note::
+            The hardware timestamp rolls over every two seconds. The unwrapping uses the monotonic host timestamps to
+            determine the number of rollovers between two consecutive messages (see
+            :func:`balderhub.ant.lib.utils.unwrap_hw_timestamp_ticks`).
+
+        :param unwrap: True if the 16 bit rollovers should be unwrapped, False if the raw values should be returned
+        :return: the array with the hardware timestamp in seconds for every message
+        """
+        column = self.get_extended_data_column('hw_timestamp', dtype=np.int64)
+        if unwrap:
+            column = unwrap_hw_timestamp_ticks(column, self._timestamps)
+        return column / HW_TIMESTAMP_FREQUENCY_HZ
+
+    def get_hw_timeline_column(self) -> np.ndarray:
+        """
+        This method returns the receive time of all messages within this collection reconstructed from the hardware
+        timestamps (see :func:`balderhub.ant.lib.utils.reconstruct_hw_timeline`). The values use the same time base as
+        the monotonic timestamps, but are free of the host scheduling jitter. This requires that every message was
+        received with the flagged extended TIMESTAMP information.
+
+        :return: the array with the reconstructed receive time in seconds for every message
+        """
+        return reconstruct_hw_timeline(self.get_extended_data_column('hw_timestamp', dtype=np.int64), self._timestamps)
+
     def get_unique_value_for_field(self, field_name: str) -> Any | None:
         """
         This method returns the unique value for one field. It throws an error if the method finds more than one values
@@ -162,21 +371,174 @@ class PageMessageCollection:
 
     def filter_for_timestamp(
             self,
-            start: datetime = None,
-            end: datetime = None
+            start: Union[float, datetime, None] = None,
+            end: Union[float, datetime, None] = None,
+            as_view: bool = False
     ) -> PageMessageCollection[BaseReceivedAntplusPageTypeT]:
         """
-        This method returns all messages which timestamp is between the given start and/or end date
-        :param start: start (exclusive) timestamp, the messages can have to be returned
-        :param end: end (exclusive) timestamp, the messages can have to be returned
+        This method returns all messages which timestamp is between the given start and/or end timestamp. Timestamps
+        can be given as monotonic ``time.perf_counter()`` values or as datetime (will be converted with the clock
+        anchor of the messages).
+
+        :param start: start (inclusive) timestamp, the messages can have to be returned
+        :param end: end (inclusive) timestamp, the messages can have to be returned
+        :param as_view: True if a read-only :class:`PageMessageCollectionView` should be returned, that keeps the index
+                        of every message within this collection, instead of a new independent collection
         :return: a new collection that matches the given filter criteria
         """
-        result = self.__class__()
+        if not self._messages:
+            return self._create_filtered([], as_view=as_view)
 
-        for msg in self._messages:
-            if start is not None and msg.timestamp < start:
-                continue
-            if end is not None and msg.timestamp > end:
-                continue
-            result.append(msg)
+        clock_anchor = self._messages[0].clock_anchor
+        if isinstance(start, datetime):
+            start = clock_anchor.to_monotonic(start)
+        if isinstance(end, datetime):
+            end = clock_anchor.to_monotonic(end)
+
+        start_idx = 0 if start is None else bisect.bisect_left(self._timestamps, start)
+        end_idx = len(self._timestamps) if end is None else bisect.bisect_right(self._timestamps, end)
+        return self._create_filtered(list(range(start_idx, max(start_idx, end_idx))), as_view=as_view)
+
+
+class PageMessageCollectionView(PageMessageCollection):
+    """
+    Read-only collection that is returned by the filter methods of :class:`PageMessageCollection` if they are called
+    with ``as_view=True``. Every message keeps its index within the source collection (a view of a view refers to the
+    original source collection).
+    """
+
+    def __init__(self, source: PageMessageCollection, source_indices: list[int]):
+        super().__init__()
+        self._messages = [source[idx] for idx in source_indices]
+        self._timestamps = [source._timestamps[idx] for idx in source_indices]  # pylint: disable=protected-access
+        if isinstance(source, PageMessageCollectionView):
+            source_indices = [source.get_source_index(idx) for idx in source_indices]
+            source = source.source
+        self._source = source
+        self._source_indices = source_indices
+
+    @property
+    def source(self) -> PageMessageCollection:
+        """
+        :return: the collection this view was created from
+        """
+        return self._source
+
+    @property
+    def source_indices(self) -> list[int]:
+        """
+        :return: returns a copy of the source indices of all messages within this view
+        """
+        return self._source_indices.copy()
+
+    def append(self, message: BaseReceivedAntplusPageTypeT) -> int:
+        raise TypeError(f'can not append messages to a {self.__class__.__name__}')
+
+    def get_source_index(self, idx: int) -> int:
+        return self._source_indices[idx]
+
+
+class RetentionPolicy(NamedTuple):
+    """
+    Describes which received messages are retained by a :class:`RingPageMessageCollection` (None disables the limit)
+    """
+    #: the maximum number of retained messages
+    max_count: Union[int, None] = None
+    #: the maximum age of a retained message in seconds (relative to the newest message)
+    max_age_sec: Union[float, None] = None
+
+
+class RingPageMessageCollection(PageMessageCollection):
+    """
+    Collection that only retains the newest messages according to a :class:`RetentionPolicy`. The messages are held
+    within a ring buffer, older messages are evicted while appending new ones, so that the memory does not grow with the
+    duration of a channel session.
+
+    Positions within this collection move with every eviction. The position a message had within the complete session
+    can be determined with :meth:`RingPageMessageCollection.get_session_index`. Views that are returned by the filter
+    methods refer to this collection with the positions their messages had when the view was created (the retained
+    messages are not copied).
+    """
+
+    def __init__(self, retention_policy: RetentionPolicy):
+        """
+        :param retention_policy: the policy that defines which messages are retained
+        """
+        if retention_policy.max_count is not None and retention_policy.max_count < 1:
+            raise ValueError('the maximum count of a retention policy needs to be at least 1')
+        super().__init__()
+        self._retention_policy = retention_policy
+        self._messages = collections.deque()
+        self._timestamps = collections.deque()
+        self._evicted_count = 0
+
+    def __getitem__(self, item: Union[int, slice]) -> BaseReceivedAntplusPageTypeT:
+        if isinstance(item, slice):
+            return list(self._messages)[item]
+        return self._messages[item]
+
+    @property
+    def retention_policy(self) -> RetentionPolicy:
+        """
+        :return: the policy that defines which messages are retained
+        """
+        return self._retention_policy
+
+    @property
+    def evicted_count(self) -> int:
+        """
+        :return: the number of messages that were evicted so far
+        """
+        return self._evicted_count
+
+    @property
+    def total_count(self) -> int:
+        """
+        :return: the number of messages that were appended to this collection (including the evicted ones)
+        """
+        return self._evicted_count + len(self._messages)
+
+    @property
+    def messages(self) -> list[BaseReceivedAntplusPageTypeT]:
+        return list(self._messages)
+
+    def get_session_index(self, idx: int) -> int:
+        """
+        :param idx: the index of a retained message within this collection
+        :return: the index of the message within all messages that were appended to this collection
+        """
+        return self._evicted_count + range(len(self._messages))[idx]
+
+    def snapshot(self) -> PageMessageCollection:
+        """
+        :return: a new collection that holds the messages that are retained at the moment
+        """
+        result = PageMessageCollection()
+        result._messages = list(self._messages)  # pylint: disable=protected-access
+        result._timestamps = list(self._timestamps)  # pylint: disable=protected-access
         return result
+
+    def append(self, message: BaseReceivedAntplusPageTypeT) -> int:
+        """
+        Adds a message to the collection and evicts all messages that are not retained anymore.
+
+        :param message: the message that should be added to the collection
+        :return: the index of the message within all messages that were appended to this collection (see
+                 :meth:`RingPageMessageCollection.get_session_index`)
+        """
+        session_idx = self._evicted_count + super().append(message)
+        self._evict()
+        return session_idx
+
+    def _evict(self) -> None:
+        max_count = self._retention_policy.max_count
+        max_age_sec = self._retention_policy.max_age_sec
+        evicted_before = self._evicted_count
+        while (max_count is not None and len(self._messages) > max_count) \
+                or (max_age_sec is not None and self._timestamps[-1] - self._timestamps[0] > max_age_sec):
+            self._messages.popleft()
+            self._timestamps.popleft()
+            self._evicted_count += 1
+        if self._evicted_count != evicted_before:
+            # the positions of all messages have changed
+            self._position_by_message = None
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+from typing import NamedTuple, Union, TYPE_CHECKING
+
+import numpy as np
+
+from .ack_transfer import AckTransferResult
+from .gap_index import GapIndex
+from .page_message_collection import PageMessageCollectionView
+from .pages import BaseAntplusPage, BaseReceivedAntplusPage
+from .pages.common import Common70RequestDataPage
+
+if TYPE_CHECKING:
+    from .channel_session import AntplusChannelSession
+
+
+class PageRequest(NamedTuple):
+    """
+    Describes one Common70 page request of a page-request sweep
+    """
+    #: the page that should be requested
+    page_type: type[BaseAntplusPage]
+    #: the requested number of transmissions
+    transmit_no: int
+    #: True if the request is sent as ACK message and asks for ACK messages as response, otherwise it is sent as
+    #: BROADCAST message and asks for BROADCAST messages
+    as_ack: bool = False
+
+    @property
+    def expected_response_count(self) -> int:
+        """
+        :return: the number of responses the device is expected to send
+        """
+        return max(1, self.transmit_no)
+
+    def create_request_page(self) -> Common70RequestDataPage:
+        """
+        :return: the request page that asks for the described response
+        """
+        if not 0 < self.transmit_no <= 0x7F:
+            raise ValueError(f"illegal value for transmit_no: {self.transmit_no}")
+        return Common70RequestDataPage.create(
+            (0x80 if self.as_ack else 0x00) | self.transmit_no, self.page_type.PAGE_ID, 0x01
+        )
+
+
+class PageRequestResult:
+    """
+    Result of one request of a page-request sweep. It holds all messages that were received within the response window
+    of the request. The windows of all requests of a sweep do not overlap and are separated by a guard interval, so
+    every response is correlated to exactly one request (by the page id and the window it was received in).
+    """
+
+    def __init__(
+            self,
+            request: PageRequest,
+            sent_timestamp: float,
+            window_end_timestamp: float,
+            session: AntplusChannelSession,
+            transfer: Union[AckTransferResult, BaseException, None] = None,
+    ):
+        """
+        :param request: the request this result belongs to
+        :param sent_timestamp: the monotonic ``time.perf_counter()`` timestamp the request was sent at (for ACK requests
+                               the time the transfer was completed)
+        :param window_end_timestamp: the monotonic ``time.perf_counter()`` timestamp the response window ended at
+        :param session: the channel session the request was sent in (the messages of the response window are taken
+                        from it)
+        :param transfer: the result of the ACK transfer or its error, if the request could not be sent (only for ACK
+                         requests)
+        """
+        self._request = request
+        self._sent_timestamp = sent_timestamp
+        self._window_end_timestamp = window_end_timestamp
+        self._broadcast_messages = session.broadcast_messages.filter_for_timestamp(
+            start=sent_timestamp, end=window_end_timestamp, as_view=True)
+        self._ack_messages = session.ack_messages.filter_for_timestamp(
+            start=sent_timestamp, end=window_end_timestamp, as_view=True)
+        self._gap_index = session.create_gap_index_for(self._broadcast_messages)
+        self._transfer = transfer
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<{self._request.page_type.__name__} x{self._request.transmit_no} "
+                f"({'ACK' if self._request.as_ack else 'BROADCAST'}) | responses={len(self.responses)}>")
+
+    @property
+    def request(self) -> PageRequest:
+        """
+        :return: the request this result belongs to
+        """
+        return self._request
+
+    @property
+    def sent_timestamp(self) -> float:
+        """
+        :return: the monotonic ``time.perf_counter()`` timestamp the request was sent at (for ACK requests the time the
+                 transfer was completed)
+        """
+        return self._sent_timestamp
+
+    @property
+    def window_end_timestamp(self) -> float:
+        """
+        :return: the monotonic ``time.perf_counter()`` timestamp the response window ended at
+        """
+        return self._window_end_timestamp
+
+    @property
+    def broadcast_messages(self) -> PageMessageCollectionView:
+        """
+        :return: all BROADCAST messages received within the response window
+        """
+        return self._broadcast_messages
+
+    @property
+    def ack_messages(self) -> PageMessageCollectionView:
+        """
+        :return: all ACK messages received within the response window
+        """
+        return self._ack_messages
+
+    @property
+    def gap_index(self) -> GapIndex:
+        """
+        :return: the gap index of the BROADCAST messages received within the response window
+        """
+        return self._gap_index
+
+    @property
+    def missing_count(self) -> int:
+        """
+        :return: the number of BROADCAST messages that are missing within the response window
+        """
+        return self._gap_index.missing_count
+
+    @property
+    def loss_ratio(self) -> float:
+        """
+        :return: the ratio (0..1) of missing BROADCAST messages to all expected BROADCAST messages within the response
+                 window
+        """
+        return self._gap_index.loss_ratio
+
+    @property
+    def transfer(self) -> Union[AckTransferResult, None]:
+        """
+        :return: the result of the ACK transfer (only for ACK requests that were sent successfully)
+        """
+        return self._transfer if isinstance(self._transfer, AckTransferResult) else None
+
+    @property
+    def transfer_error(self) -> Union[BaseException, None]:
+        """
+        :return: the error of the ACK transfer, if the request could not be sent
+        """
+        return self._transfer if isinstance(self._transfer, BaseException) else None
+
+    @property
+    def broadcast_responses(self) -> PageMessageCollectionView:
+        """
+        :return: all BROADCAST messages of the requested page type within the response window
+        """
+        return self._broadcast_messages.filter_by_type(page_type=self._request.page_type, as_view=True)
+
+    @property
+    def ack_responses(self) -> PageMessageCollectionView:
+        """
+        :return: all ACK messages of the requested page type within the response window
+        """
+        return self._ack_messages.filter_by_type(page_type=self._request.page_type, as_view=True)
+
+    @property
+    def responses(self) -> PageMessageCollectionView:
+        """
+        :return: all messages of the requested page type that were received over the requested message type
+        """
+        return self.ack_responses if self._request.as_ack else self.broadcast_responses
+
+    @property
+    def first_response(self) -> Union[BaseReceivedAntplusPage, None]:
+        """
+        :return: the first message of the requested page type (over BROADCAST or ACK) or None if there is none
+        """
+        candidates = [msgs[0] for msgs in (self.broadcast_responses, self.ack_responses) if len(msgs) > 0]
+        return min(candidates, key=lambda msg: msg.monotonic_timestamp, default=None)
+
+    @property
+    def response_latency_sec(self) -> Union[float, None]:
+        """
+        :return: the time between sending the request and receiving the first response in seconds or None if there was
+                 no response
+        """
+        first_response = self.first_response
+        if first_response is None:
+            return None
+        return first_response.monotonic_timestamp - self._sent_timestamp
+
+    @property
+    def missing_count_before_first_response(self) -> int:
+        """
+        :return: the number of BROADCAST messages that are missing between sending the request and receiving the first
+                 response - every one of them could have been a lost response (all missing messages of the window if
+                 there was no response)
+        """
+        first_response = self.first_response
+        if first_response is None:
+            return self._gap_index.missing_count
+        received_before_count = int(np.searchsorted(
+            self._broadcast_messages.get_timestamp_column(), first_response.monotonic_timestamp))
+        return self._gap_index.get_missing_count_between(0, received_before_count)
+
+    def get_allowed_response_latency_sec(self, max_latency_sec: float) -> float:
+        """
+        :param max_latency_sec: the maximum time in seconds the device may need to send the first response
+        :return: the maximum time in seconds between sending the request and receiving the first response, that can be
+                 explained by the device latency and the responses that got lost before (each one delays the first
+                 received response by one channel period)
+        """
+        return max_latency_sec + self.missing_count_before_first_response * self._gap_index.channel_period_sec
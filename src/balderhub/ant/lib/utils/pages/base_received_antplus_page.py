@@ -1,11 +1,13 @@
-import time
 from typing import Optional, Union, TypeVar
 
 from abc import ABC
-from datetime import datetime, timedelta
+from datetime import datetime
 
+from balderhub.ant.lib.utils.clock_anchor import ClockAnchor
+from balderhub.ant.lib.utils.extended_data import FLAG_CHANNEL_ID, ChannelId, FlaggedExtendedData
 from balderhub.ant.lib.utils.extended_meta.base_extended_meta_legacy import BaseExtendedMetaLegacy
 from balderhub.ant.lib.utils.extended_meta.base_extended_meta_flagged import BaseExtendedMetaFlagged
+from balderhub.ant.lib.utils.extended_meta.extended_meta_legacy_channel_id import ExtendedMetaLegacyChannelId
 from .base_antplus_page import BaseAntplusPage
 
 BaseReceivedAntplusPageTypeT = TypeVar('BaseReceivedAntplusPageTypeT', bound='BaseReceivedAntplusPage')
@@ -21,11 +23,18 @@ class BaseReceivedAntplusPage(BaseAntplusPage, ABC):
             raw_data: bytes,
             timestamp: float,
             extended_metas: Optional[Union[list[BaseExtendedMetaLegacy], list[BaseExtendedMetaFlagged]]] = None,
+            clock_anchor: Optional[ClockAnchor] = None,
+            extended_data: Optional[FlaggedExtendedData] = None,
     ):
 
         super().__init__(raw_data=raw_data)
 
-        self._extended_metas = []
+        if extended_metas and extended_data is not None:
+            raise ValueError('provide either the extended meta objects or the extended data, not both')
+
+        # if the message was received with extended data, the meta objects are only created when they are requested
+        self._extended_data = extended_data
+        self._extended_metas = None if extended_data is not None else []
 
         if extended_metas:
             base_class = BaseExtendedMetaFlagged \
@@ -44,6 +53,7 @@ class BaseReceivedAntplusPage(BaseAntplusPage, ABC):
                 self._extended_metas.append(meta)
 
         self._timestamp = timestamp
+        self._clock_anchor = ClockAnchor.get_default() if clock_anchor is None else clock_anchor
 
 
     def __repr__(self):
@@ -64,6 +74,90 @@ class BaseReceivedAntplusPage(BaseAntplusPage, ABC):
             This is not ment to be a timestamp determined by the ANT host directly. This timestamp is created as soon as
             the message receives the balderhub python implementation.
 
+        .. note::
+            This value is only meant for displaying. Use :meth:`BaseReceivedAntplusPage.monotonic_timestamp` for
+            sorting, filtering and calculations.
+
         :return: returns the timestamp the message was received by the feature
         """
-        return datetime.now() - timedelta(seconds=time.perf_counter() - self._timestamp)
+        return self._clock_anchor.to_datetime(self._timestamp)
+
+    @property
+    def monotonic_timestamp(self) -> float:
+        """
+        :return: returns the monotonic ``time.perf_counter()`` timestamp the message was received by the feature
+        """
+        return self._timestamp
+
+    @property
+    def clock_anchor(self) -> ClockAnchor:
+        """
+        :return: returns the clock anchor that maps the monotonic timestamp of this message to the wall clock
+        """
+        return self._clock_anchor
+
+    @property
+    def extended_metas(self) -> Union[list[BaseExtendedMetaLegacy], list[BaseExtendedMetaFlagged]]:
+        """
+        :return: returns a copy of the extended metadata objects the message was received with
+        """
+        if self._extended_metas is None:
+            self._extended_metas = self._extended_data.create_metas()
+        return self._extended_metas.copy()
+
+    @property
+    def extended_data(self) -> Union[FlaggedExtendedData, None]:
+        """
+        :return: returns the plain fields of the FLAGGED-EXTENDED-DATA the message was received with or None if the
+                 message was not received with flagged extended data
+        """
+        if self._extended_data is None and self._extended_metas \
+                and isinstance(self._extended_metas[0], BaseExtendedMetaFlagged):
+            self._extended_data = FlaggedExtendedData.from_metas(self._extended_metas)
+        return self._extended_data
+
+    @property
+    def flagged_extended_raw_data(self) -> bytes:
+        """
+        :return: returns the raw FLAGGED-EXTENDED-DATA (including the flag byte) the message was received with - a
+                 message that was received with LEGACY-EXTENDED-DATA Channel ID information returns the same information
+                 in the flagged layout, a message without extended data returns empty bytes
+        """
+        extended_data = self.extended_data
+        if extended_data is not None:
+            return extended_data.raw_data
+        if self._extended_metas and isinstance(self._extended_metas[0], ExtendedMetaLegacyChannelId):
+            return bytes([FLAG_CHANNEL_ID]) + self._extended_metas[0].raw_data
+        return b''
+
+    @property
+    def rssi(self) -> Union[int, None]:
+        """
+        :return: returns the RSSI value in dBm the message was received with or None if this information is not
+                 available
+        """
+        extended_data = self.extended_data
+        return None if extended_data is None else extended_data.rssi
+
+    @property
+    def hw_timestamp(self) -> Union[int, None]:
+        """
+        :return: returns the raw hardware timestamp (32768 Hz, rolls over every two seconds) the message was received
+                 with or None if this information is not available
+        """
+        extended_data = self.extended_data
+        return None if extended_data is None else extended_data.hw_timestamp
+
+    @property
+    def channel_id(self) -> Union[ChannelId, None]:
+        """
+        :return: returns the Channel ID of the device the message was received from or None if this information is not
+                 available
+        """
+        extended_data = self.extended_data
+        if extended_data is not None:
+            return extended_data.channel_id
+        if self._extended_metas and isinstance(self._extended_metas[0], ExtendedMetaLegacyChannelId):
+            meta = self._extended_metas[0]
+            return ChannelId(meta.device_number, meta.device_type, meta.trans_type)
+        return None
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import timedelta
+import numpy as np
 
 from .base_hrm_page import BaseHrmPage
 from ...page_message_collection import PageMessageCollection
@@ -41,35 +41,21 @@ class Hrm1CumulativeOperationTimePage(BaseHrmPage):
         """
         relevant_msgs = of_msg_collection.filter_by_type(page_type=cls)
 
-        # TODO improve validation algorithm
         # counter should increase every two seconds
         if len(relevant_msgs) == 0:
             raise ValueError(f'did not receive any messages for {cls.__name__}')
-        assert (relevant_msgs[-1].timestamp - relevant_msgs[0].timestamp) <= timedelta(seconds=2.25), \
-            "did not get enough messages to be able to validate Operation-Time counter"
+        if len(relevant_msgs) == 1:
+            # a single message (f.e. the response of a request) has no time reference the counter can be checked against
+            return
+        timestamps = relevant_msgs.get_timestamp_column()
 
-        cleared_optimes = [msg.cumulative_operating_time_raw for msg in relevant_msgs]
-        idx_before = 0
-        for idx in range(1, len(cleared_optimes)):
-            if cleared_optimes[idx_before] <= cleared_optimes[idx]:
-                # no overflow -> continue
-                continue
-            # increase value for all following items
-            for sub_idx in range(idx, len(cleared_optimes)):
-                cleared_optimes[sub_idx] += 0xFFFFFF
-            idx_before = idx
+        # the operating time is a 24 bit counter
+        optimes_raw = relevant_msgs.get_column('cumulative_operating_time_raw', unwrap_bit_width=24)
+        diff_optimes_sec = (optimes_raw - optimes_raw[0]) * 2
 
         # determine synchron time
-        sync_timestamp = relevant_msgs[0].timestamp
-        sync_optime = relevant_msgs[0].cumulative_operating_time_raw
+        diff_timestamps_sec = timestamps - timestamps[0]
 
-        for idx in range(1, len(relevant_msgs)):
-            msg = relevant_msgs[idx]
-            diff_timestamp = msg.timestamp - sync_timestamp
-
-            diff_optime_raw = cleared_optimes[idx] - sync_optime
-            diff_optime_sec = diff_optime_raw * 2
-
-            # check if difftime is the same (accuracy needs to be around 2 seconds)
-            assert diff_optime_sec - 2 < diff_timestamp < diff_optime_sec + 2, \
-                f"detect illegal times since message {msg}"
+        # check if difftime is the same (accuracy needs to be around 2 seconds)
+        invalid_idxs = np.flatnonzero(np.abs(diff_timestamps_sec - diff_optimes_sec) >= 2)
+        assert len(invalid_idxs) == 0, f"detect illegal times since message {relevant_msgs[int(invalid_idxs[0])]}"
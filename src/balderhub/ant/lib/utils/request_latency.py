@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import array
+import logging
+from typing import NamedTuple, Union
+
+import numpy as np
+
+from .page_request_sweep import PageRequestResult
+from .pages import BaseAntplusPage
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyPercentiles(NamedTuple):
+    """
+    Summary of a latency distribution (all values in seconds - None if no latency was recorded)
+    """
+    #: the number of recorded latencies
+    count: int
+    #: the median latency
+    p50_sec: Union[float, None]
+    #: the 95th percentile of the latencies
+    p95_sec: Union[float, None]
+    #: the 99th percentile of the latencies
+    p99_sec: Union[float, None]
+    #: the maximum latency
+    max_sec: Union[float, None]
+
+
+class RequestLatencyTracker:
+    """
+    Records the latency between sending a page request and receiving the first response, separated by the requested
+    page and the transmission type (BROADCAST or ACK). All latencies are measured with the monotonic
+    ``time.perf_counter()`` clock, that is also used for the timestamps of the received pages.
+    """
+
+    def __init__(self):
+        self._latencies: dict[tuple[type[BaseAntplusPage], bool], array.array] = {}
+        self._unanswered_counts: dict[tuple[type[BaseAntplusPage], bool], int] = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self.get_percentiles()}>"
+
+    @property
+    def keys(self) -> list[tuple[type[BaseAntplusPage], bool]]:
+        """
+        :return: all combinations of requested page and ``as_ack`` flag that were recorded so far
+        """
+        return sorted(set(self._latencies) | set(self._unanswered_counts),
+                      key=lambda key: (key[0].PAGE_ID, key[1]))
+
+    def record(self, page_type: type[BaseAntplusPage], as_ack: bool, latency_sec: Union[float, None]) -> None:
+        """
+        Records the latency of one request.
+
+        :param page_type: the requested page
+        :param as_ack: True if the request asked for ACK responses
+        :param latency_sec: the time between the request and the first response or None if the request was not answered
+        """
+        key = (page_type, as_ack)
+        if latency_sec is None:
+            self._unanswered_counts[key] = self._unanswered_counts.get(key, 0) + 1
+            return
+        if key not in self._latencies:
+            self._latencies[key] = array.array('d')
+        self._latencies[key].append(latency_sec)
+
+    def update(self, result: PageRequestResult) -> None:
+        """
+        Records the latency of a request of a page-request sweep.
+
+        :param result: the result of the request
+        """
+        self.record(result.request.page_type, result.request.as_ack, result.response_latency_sec)
+
+    @staticmethod
+    def _get_matching(page_type: Union[type[BaseAntplusPage], None], as_ack: Union[bool, None], source: dict) -> list:
+        return [value for (cur_page_type, cur_as_ack), value in source.items()
+                if (page_type is None or cur_page_type == page_type) and (as_ack is None or cur_as_ack == as_ack)]
+
+    def get_latencies(
+            self,
+            page_type: Union[type[BaseAntplusPage], None] = None,
+            as_ack: Union[bool, None] = None
+    ) -> np.ndarray:
+        """
+        :param page_type: if given, only the latencies of requests for this page are returned
+        :param as_ack: if given, only the latencies of requests with this transmission type are returned
+        :return: a float64 array with all matching latencies in seconds
+        """
+        matching = self._get_matching(page_type, as_ack, self._latencies)
+        if not matching:
+            return np.empty(0, dtype=np.float64)
+        return np.concatenate([np.frombuffer(latencies, dtype=np.float64) for latencies in matching])
+
+    def get_unanswered_count(
+            self,
+            page_type: Union[type[BaseAntplusPage], None] = None,
+            as_ack: Union[bool, None] = None
+    ) -> int:
+        """
+        :param page_type: if given, only requests for this page are considered
+        :param as_ack: if given, only requests with this transmission type are considered
+        :return: the number of matching requests that were not answered
+        """
+        return sum(self._get_matching(page_type, as_ack, self._unanswered_counts))
+
+    def get_percentiles(
+            self,
+            page_type: Union[type[BaseAntplusPage], None] = None,
+            as_ack: Union[bool, None] = None
+    ) -> LatencyPercentiles:
+        """
+        :param page_type: if given, only the latencies of requests for this page are considered
+        :param as_ack: if given, only the latencies of requests with this transmission type are considered
+        :return: the p50/p95/p99 summary of all matching latencies
+        """
+        latencies = self.get_latencies(page_type=page_type, as_ack=as_ack)
+        if latencies.size == 0:
+            return LatencyPercentiles(0, None, None, None, None)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return LatencyPercentiles(int(latencies.size), float(p50), float(p95), float(p99), float(latencies.max()))
+
+    def get_report(self) -> dict[tuple[type[BaseAntplusPage], bool], LatencyPercentiles]:
+        """
+        :return: the p50/p95/p99 summary for every combination of requested page and ``as_ack`` flag
+        """
+        return {key: self.get_percentiles(page_type=key[0], as_ack=key[1]) for key in self.keys}
+
+    def log_report(self, level: int = logging.INFO) -> None:
+        """
+        Logs the p50/p95/p99 summary for every combination of requested page and ``as_ack`` flag (see
+        :meth:`RequestLatencyTracker.get_report`).
+
+        :param level: the logging level the summaries should be logged with
+        """
+        for (page_type, as_ack), percentiles in self.get_report().items():
+            logger.log(level, f'response latency for {page_type.__name__} ({"ACK" if as_ack else "BROADCAST"}): '
+                              f'{percentiles}')
@@ -0,0 +1,535 @@
+from __future__ import annotations
+
+from typing import NamedTuple, Union, TypeVar
+
+from .gap_index import GapIndex
+from .heart_beat_index import HeartBeatIndex
+from .link_quality import LinkQualityMonitor
+from .pages import BaseReceivedAntplusPage
+from .transmission_pattern import HrmTransmissionPattern, HrmTransmissionPhaseEstimator
+
+
+class StreamingViolation(NamedTuple):
+    """
+    Describes one violation that was detected by a :class:`BaseStreamingValidator`
+    """
+    #: the name of the validator that detected the violation
+    validator: str
+    #: the monotonic ``time.perf_counter()`` timestamp of the page that caused the violation
+    timestamp: float
+    #: the index of the page that caused the violation within all pages provided to the validator
+    page_idx: int
+    #: human-readable description of the violation
+    description: str
+
+
+class BaseStreamingValidator:
+    """
+    Base class for all validators that check the received pages of a channel while they are received. A streaming
+    validator only keeps the state it needs to validate the next page, so that its memory usage does not grow with the
+    duration of the session.
+
+    The validators are fed by a :class:`StreamingValidationRunner`.
+    """
+
+    def __init__(self):
+        self._page_count = 0
+        self._violation_count = 0
+        self._first_violation: Union[StreamingViolation, None] = None
+        self._last_violation: Union[StreamingViolation, None] = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self.get_summary()}>"
+
+    @property
+    def name(self) -> str:
+        """
+        :return: the name of this validator that is used within the violations and summaries
+        """
+        return self.__class__.__name__
+
+    @property
+    def page_count(self) -> int:
+        """
+        :return: the number of pages this validator has checked so far
+        """
+        return self._page_count
+
+    @property
+    def violation_count(self) -> int:
+        """
+        :return: the number of violations this validator has detected so far
+        """
+        return self._violation_count
+
+    @property
+    def first_violation(self) -> Union[StreamingViolation, None]:
+        """
+        :return: the first violation this validator has detected or None if there was no violation yet
+        """
+        return self._first_violation
+
+    @property
+    def last_violation(self) -> Union[StreamingViolation, None]:
+        """
+        :return: the last violation this validator has detected or None if there was no violation yet
+        """
+        return self._last_violation
+
+    def _validate(self, page: BaseReceivedAntplusPage, page_idx: int, missing_before: int) -> Union[str, None]:
+        """
+        Validates a new received page.
+
+        :param page: the received page
+        :param page_idx: the index of the page within all pages provided to the validator
+        :param missing_before: the number of messages that are missing directly before this page
+        :return: the description of the violation or None if the page is valid
+        """
+        raise NotImplementedError
+
+    def update(
+            self,
+            page: BaseReceivedAntplusPage,
+            page_idx: int,
+            missing_before: int
+    ) -> Union[StreamingViolation, None]:
+        """
+        Validates a new received page (pages need to be provided in receive order).
+
+        :param page: the received page
+        :param page_idx: the index of the page within all pages provided to the validator
+        :param missing_before: the number of messages that are missing directly before this page
+        :return: the detected violation or None if the page is valid
+        """
+        self._page_count += 1
+        description = self._validate(page, page_idx, missing_before)
+        if description is None:
+            return None
+        violation = StreamingViolation(self.name, page.monotonic_timestamp, page_idx, description)
+        self._violation_count += 1
+        if self._first_violation is None:
+            self._first_violation = violation
+        self._last_violation = violation
+        return violation
+
+    def get_summary(self) -> str:
+        """
+        :return: a short human-readable summary of the current state of this validator
+        """
+        return f"pages={self._page_count} | violations={self._violation_count}"
+
+
+class BeatCountContinuityValidator(BaseStreamingValidator):
+    """
+    Validates that the heart beat count of the HRM pages increases by exactly one with every new beat. Skipped beats
+    are only accepted if messages are missing in between.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._beats = HeartBeatIndex()
+        self._lost_beat_count = 0
+
+    @property
+    def beat_count(self) -> int:
+        """
+        :return: the number of beats that were detected so far
+        """
+        return self._beats.total_count
+
+    @property
+    def lost_beat_count(self) -> int:
+        """
+        :return: the number of beats that were skipped together with missing messages
+        """
+        return self._lost_beat_count
+
+    def _validate(self, page: BaseReceivedAntplusPage, page_idx: int, missing_before: int) -> Union[str, None]:
+        new_beat = self._beats.update(page, page_idx=page_idx, timestamp=page.monotonic_timestamp)
+        if new_beat is None or len(self._beats) < 2:
+            return None
+        beat_before = self._beats[-2]
+        # only the last beat is necessary for validating the next one
+        self._beats.discard_before(new_beat.first_page_idx)
+
+        if new_beat.beat_count > beat_before.beat_count + 1 and missing_before > 0:
+            # beats got lost together with the messages
+            self._lost_beat_count += new_beat.beat_count - beat_before.beat_count - 1
+            return None
+        if new_beat.beat_count != beat_before.beat_count + 1:
+            # a changed event time within the same beat is detected here too
+            return (f"received unexpected beat count {new_beat.beat_count_raw} (beat before was "
+                    f"{beat_before.beat_count_raw})")
+        return None
+
+    def get_summary(self) -> str:
+        return f"{super().get_summary()} | beats={self.beat_count} | lost-beats={self._lost_beat_count}"
+
+
+class HeartBeatEventTimeValidator(BaseStreamingValidator):
+    """
+    Validates that the difference between the heart beat event times of two consecutive beats is within the given
+    range. Beats that do not follow their previous beat directly (see :class:`BeatCountContinuityValidator`) are not
+    considered.
+    """
+
+    def __init__(self, allowed_min_rr_sec: float, allowed_max_rr_sec: float, number_of_beats_to_skip: int = 0):
+        """
+        :param allowed_min_rr_sec: the minimal allowed time between two beats in seconds
+        :param allowed_max_rr_sec: the maximal allowed time between two beats in seconds
+        :param number_of_beats_to_skip: the number of first beats that are not validated
+        """
+        super().__init__()
+        self._allowed_min_diff_time = int(allowed_min_rr_sec * 1024)
+        self._allowed_max_diff_time = int(allowed_max_rr_sec * 1024)
+        self._number_of_beats_to_skip = number_of_beats_to_skip
+        self._beats = HeartBeatIndex()
+        self._min_diff_time: Union[int, None] = None
+        self._max_diff_time: Union[int, None] = None
+
+    @property
+    def min_rr_sec(self) -> Union[float, None]:
+        """
+        :return: the minimal time between two validated beats in seconds or None if no beat was validated yet
+        """
+        return None if self._min_diff_time is None else self._min_diff_time / 1024
+
+    @property
+    def max_rr_sec(self) -> Union[float, None]:
+        """
+        :return: the maximal time between two validated beats in seconds or None if no beat was validated yet
+        """
+        return None if self._max_diff_time is None else self._max_diff_time / 1024
+
+    def _validate(self, page: BaseReceivedAntplusPage, page_idx: int, missing_before: int) -> Union[str, None]:
+        new_beat = self._beats.update(page, page_idx=page_idx, timestamp=page.monotonic_timestamp)
+        if new_beat is None or len(self._beats) < 2:
+            return None
+        beat_before = self._beats[-2]
+        self._beats.discard_before(new_beat.first_page_idx)
+
+        if self._beats.total_count - 1 <= self._number_of_beats_to_skip:
+            return None
+        if new_beat.beat_count != beat_before.beat_count + 1:
+            return None
+
+        diff_time = new_beat.event_time - beat_before.event_time
+        self._min_diff_time = diff_time if self._min_diff_time is None else min(self._min_diff_time, diff_time)
+        self._max_diff_time = diff_time if self._max_diff_time is None else max(self._max_diff_time, diff_time)
+        if not self._allowed_min_diff_time <= diff_time <= self._allowed_max_diff_time:
+            return (f"difference between heart beat {beat_before.beat_count_raw} and heart beat "
+                    f"{new_beat.beat_count_raw} is {diff_time} (expected value between {self._allowed_min_diff_time} "
+                    f"and {self._allowed_max_diff_time})")
+        return None
+
+    def get_summary(self) -> str:
+        return f"{super().get_summary()} | min-rr={self.min_rr_sec} | max-rr={self.max_rr_sec}"
+
+
+class PacketLossValidator(BaseStreamingValidator):
+    """
+    Validates that the ratio of missing messages over the whole session does not exceed the allowed value. The ratio is
+    only validated after a minimal number of messages was expected, so that a single early gap does not stop the
+    session.
+    """
+
+    def __init__(self, allowed_loss_ratio: float, min_expected_count: int = 240):
+        """
+        :param allowed_loss_ratio: value between 0 and 1 that defines the accepted packet loss
+        :param min_expected_count: the number of expected messages (received and missing) before the ratio is validated
+        """
+        super().__init__()
+        self._allowed_loss_ratio = allowed_loss_ratio
+        self._min_expected_count = min_expected_count
+        self._missing_count = 0
+        self._longest_gap = 0
+
+    @property
+    def missing_count(self) -> int:
+        """
+        :return: the number of missing messages so far
+        """
+        return self._missing_count
+
+    @property
+    def longest_gap(self) -> int:
+        """
+        :return: the highest number of consecutive missing messages so far
+        """
+        return self._longest_gap
+
+    @property
+    def loss_ratio(self) -> float:
+        """
+        :return: the ratio of missing messages compared to all expected messages (between 0 and 1)
+        """
+        expected_count = self._page_count + self._missing_count
+        return self._missing_count / expected_count if expected_count else 0.
+
+    def _validate(self, page: BaseReceivedAntplusPage, page_idx: int, missing_before: int) -> Union[str, None]:
+        self._missing_count += missing_before
+        self._longest_gap = max(self._longest_gap, missing_before)
+        if self._page_count + self._missing_count < self._min_expected_count:
+            return None
+        if self.loss_ratio > self._allowed_loss_ratio:
+            return (f"detect {self._missing_count} missing messages ({self.loss_ratio * 100:.2f}%) - longest gap: "
+                    f"{self._longest_gap}")
+        return None
+
+    def get_summary(self) -> str:
+        return (f"{super().get_summary()} | missing={self._missing_count} ({self.loss_ratio * 100:.2f}%) "
+                f"| longest-gap={self._longest_gap}")
+
+
+class RssiValidator(BaseStreamingValidator):
+    """
+    Validates that the RSSI of the received pages does not get marginal (see :meth:`LinkQualityMonitor.is_marginal`).
+    The RSSI is only validated if the rolling window is filled completely. Pages without an RSSI value are not
+    considered.
+    """
+
+    def __init__(self, min_rssi_dbm: float, channel_period_sec: float, percentile: float = 10, window_size: int = 240):
+        """
+        :param min_rssi_dbm: the minimal RSSI value that is expected
+        :param channel_period_sec: the channel period in seconds
+        :param percentile: the percentile of the rolling window that needs to be above ``min_rssi_dbm``
+        :param window_size: the number of the last RSSI values that are considered
+        """
+        super().__init__()
+        self._min_rssi_dbm = min_rssi_dbm
+        self._percentile = percentile
+        self._monitor = LinkQualityMonitor(channel_period_sec, window_size=window_size)
+
+    @property
+    def monitor(self) -> LinkQualityMonitor:
+        """
+        :return: the link quality monitor that holds the RSSI statistics
+        """
+        return self._monitor
+
+    def _validate(self, page: BaseReceivedAntplusPage, page_idx: int, missing_before: int) -> Union[str, None]:
+        self._monitor.update(page)
+        if missing_before > 0:
+            # the missing messages are validated by the `PacketLossValidator` - only keep the recent gap details
+            self._monitor.gap_index.discard_before(page_idx - self._monitor.window_size)
+        if page.rssi is None or self._monitor.rssi_count < self._monitor.window_size:
+            return None
+        if self._monitor.is_marginal(self._min_rssi_dbm, percentile=self._percentile):
+            return (f"the {self._percentile}th percentile of the last {self._monitor.window_size} RSSI values is "
+                    f"{self._monitor.get_rolling_percentile(self._percentile):.1f} dBm (expected at least "
+                    f"{self._min_rssi_dbm} dBm)")
+        return None
+
+    def get_summary(self) -> str:
+        mean = self._monitor.rolling_mean_dbm
+        return (f"{super().get_summary()} | rssi-pages={self._monitor.rssi_count} "
+                f"| rolling-mean={'-' if mean is None else f'{mean:.1f}'} dBm")
+
+
+class BackgroundPageCadenceValidator(BaseStreamingValidator):
+    """
+    Validates that the background pages are transmitted with the cadence of the :class:`HrmTransmissionPattern`. Every
+    page needs to match the page that is expected for its slot (as soon as the first background burst start was
+    observed, see :class:`HrmTransmissionPhaseEstimator`) and a background page needs to be received at least every
+    ``max_missed_bursts + 1`` background bursts.
+    """
+
+    def __init__(self, pattern: HrmTransmissionPattern, channel_period_sec: float, max_missed_bursts: int = 1):
+        """
+        :param pattern: the expected transmission pattern
+        :param channel_period_sec: the channel period in seconds
+        :param max_missed_bursts: the number of consecutive background bursts that are allowed to be missing
+        """
+        super().__init__()
+        self._pattern = pattern
+        self._estimator = HrmTransmissionPhaseEstimator(pattern, channel_period_sec)
+        self._max_background_interval_sec = (max_missed_bursts + 1) * pattern.block_length * channel_period_sec
+        self._last_background_timestamp: Union[float, None] = None
+        self._background_page_count = 0
+        self._deviation_count = 0
+
+    @property
+    def estimator(self) -> HrmTransmissionPhaseEstimator:
+        """
+        :return: the estimator that tracks the position within the transmission pattern
+        """
+        return self._estimator
+
+    @property
+    def background_page_count(self) -> int:
+        """
+        :return: the number of background pages received so far
+        """
+        return self._background_page_count
+
+    @property
+    def deviation_count(self) -> int:
+        """
+        :return: the number of pages that did not match the page that was expected for their slot
+        """
+        return self._deviation_count
+
+    def _validate(self, page: BaseReceivedAntplusPage, page_idx: int, missing_before: int) -> Union[str, None]:
+        page_type = page.__class__
+        timestamp = page.monotonic_timestamp
+        result = None
+        if self._estimator.is_synchronized:
+            slot = self._estimator.get_slot_for_timestamp(timestamp)
+            expected_page = self._pattern.get_expected_page_for_slot(slot)
+            if page_type != expected_page:
+                self._deviation_count += 1
+                result = (f"received {page_type.__name__} in slot {slot % self._pattern.length}, but expected "
+                          f"{expected_page.__name__}")
+                if page_type in self._pattern.background_pages and self._pattern.is_background_slot(slot):
+                    result += (" (the burst timing matches - check that the rotation order of the expected "
+                               "background pages matches the device)")
+        self._estimator.update(page_type, timestamp)
+
+        if self._last_background_timestamp is None:
+            # start measuring with the first page
+            self._last_background_timestamp = timestamp
+        if page_type in self._pattern.background_pages:
+            self._background_page_count += 1
+            self._last_background_timestamp = timestamp
+        elif result is None and timestamp - self._last_background_timestamp > self._max_background_interval_sec:
+            result = (f"did not receive any background page within the last "
+                      f"{timestamp - self._last_background_timestamp:.2f} seconds")
+            # report it again after the next interval
+            self._last_background_timestamp = timestamp
+        return result
+
+    def get_summary(self) -> str:
+        return (f"{super().get_summary()} | background-pages={self._background_page_count} "
+                f"| deviations={self._deviation_count} | synchronized={self._estimator.is_synchronized}")
+
+
+ValidatorT = TypeVar('ValidatorT', bound=BaseStreamingValidator)
+
+
+class StreamingValidationRunner:
+    """
+    Feeds every received page into a list of :class:`BaseStreamingValidator` objects. The runner detects the missing
+    messages between the pages with a :class:`GapIndex` (only its counters are kept) and collects the violations of all
+    validators.
+
+    Only the first ``max_kept_violations`` violations are kept, so that the memory usage is bounded also if the session
+    fails permanently. The method :meth:`StreamingValidationRunner.update` can be directly registered as callback (see
+    :meth:`AntplusControllerFeature.register_broadcast_message_callback`).
+    """
+
+    def __init__(self, validators: list[BaseStreamingValidator], channel_period_sec: float,
+                 max_kept_violations: int = 100):
+        """
+        :param validators: the validators that should be executed for every page
+        :param channel_period_sec: the channel period in seconds
+        :param max_kept_violations: the maximum number of violations that are kept
+        """
+        if channel_period_sec <= 0:
+            raise ValueError(f'channel period needs to be positive (is {channel_period_sec})')
+        self._validators = list(validators)
+        self._max_kept_violations = max_kept_violations
+
+        self._gap_index = GapIndex(channel_period_sec=channel_period_sec)
+        self._first_timestamp: Union[float, None] = None
+        self._last_timestamp: Union[float, None] = None
+        self._violations: list[StreamingViolation] = []
+        self._violation_count = 0
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<received={self.received_count} | missing={self.missing_count} "
+                f"| violations={self._violation_count}>")
+
+    @property
+    def validators(self) -> list[BaseStreamingValidator]:
+        """
+        :return: returns a copy of the list of all validators
+        """
+        return list(self._validators)
+
+    @property
+    def received_count(self) -> int:
+        """
+        :return: the number of pages that were validated so far
+        """
+        return self._gap_index.received_count
+
+    @property
+    def missing_count(self) -> int:
+        """
+        :return: the number of messages that were detected as missing so far
+        """
+        return self._gap_index.missing_count
+
+    @property
+    def duration_sec(self) -> float:
+        """
+        :return: the time in seconds between the first and the last validated page
+        """
+        if self._first_timestamp is None:
+            return 0.
+        return self._last_timestamp - self._first_timestamp
+
+    @property
+    def violation_count(self) -> int:
+        """
+        :return: the number of all detected violations (including the ones that are not kept)
+        """
+        return self._violation_count
+
+    @property
+    def violations(self) -> list[StreamingViolation]:
+        """
+        :return: returns a copy of the kept violations (the first ``max_kept_violations`` ones)
+        """
+        return list(self._violations)
+
+    @property
+    def is_violated(self) -> bool:
+        """
+        :return: True if at least one violation was detected
+        """
+        return self._violation_count > 0
+
+    def get_validator(self, validator_type: type[ValidatorT]) -> ValidatorT:
+        """
+        :param validator_type: the type of the requested validator
+        :return: the first validator of the given type
+        """
+        for validator in self._validators:
+            if isinstance(validator, validator_type):
+                return validator
+        raise KeyError(f'runner has no validator of type {validator_type}')
+
+    def update(self, page: BaseReceivedAntplusPage) -> list[StreamingViolation]:
+        """
+        Validates a new received page with all validators (pages need to be provided in receive order).
+
+        :param page: the received page
+        :return: the violations that were detected for this page
+        """
+        timestamp = page.monotonic_timestamp
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        self._last_timestamp = timestamp
+        page_idx = self._gap_index.received_count
+        missing_before = self._gap_index.update(timestamp)
+        if missing_before > 0:
+            # the details of the gaps are not required - only keep the counters, so that the memory usage stays bounded
+            self._gap_index.discard_before(page_idx + 1)
+
+        new_violations = []
+        for validator in self._validators:
+            violation = validator.update(page, page_idx=page_idx, missing_before=missing_before)
+            if violation is not None:
+                new_violations.append(violation)
+        self._violation_count += len(new_violations)
+        remaining_space = self._max_kept_violations - len(self._violations)
+        if remaining_space > 0:
+            self._violations.extend(new_violations[:remaining_space])
+        return new_violations
+
+    def get_summary(self) -> dict[str, str]:
+        """
+        :return: a dictionary with the summary of every validator (key is the name of the validator)
+        """
+        return {validator.name: validator.get_summary() for validator in self._validators}
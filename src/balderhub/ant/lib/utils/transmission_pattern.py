@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Sequence, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .pages.hrm.base_hrm_page import BaseHrmPage
+    from ..scenario_features.antplus_hrm_device_config import AntplusHrmDeviceConfig
+
+
+class TransmissionPatternDeviation:
+    """
+    Describes one received page that does not match the page the transmission pattern expects at its slot
+    """
+
+    def __init__(
+            self,
+            received_idx: int,
+            slot: int,
+            expected_page: type[BaseHrmPage],
+            received_page: type[BaseHrmPage]
+    ):
+        self._received_idx = received_idx
+        self._slot = slot
+        self._expected_page = expected_page
+        self._received_page = received_page
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<idx={self._received_idx} | slot={self._slot} "
+                f"| expected={self._expected_page.__name__} | received={self._received_page.__name__}>")
+
+    @property
+    def received_idx(self) -> int:
+        """
+        :return: the index of the deviating page within the received sequence
+        """
+        return self._received_idx
+
+    @property
+    def slot(self) -> int:
+        """
+        :return: the absolute slot number the deviating page was assigned to
+        """
+        return self._slot
+
+    @property
+    def expected_page(self) -> type[BaseHrmPage]:
+        """
+        :return: the page type the transmission pattern expects at this slot
+        """
+        return self._expected_page
+
+    @property
+    def received_page(self) -> type[BaseHrmPage]:
+        """
+        :return: the page type that was received at this slot
+        """
+        return self._received_page
+
+
+class HrmTransmissionPatternAlignment:
+    """
+    Result of aligning a received page-type sequence against a :class:`HrmTransmissionPattern`.
+
+    Slots are counted absolutely, starting with the pattern position of the first received page (the ``phase``). The
+    position within the pattern of any slot is ``slot % pattern.length``.
+    """
+
+    def __init__(
+            self,
+            pattern: HrmTransmissionPattern,
+            phase: Union[int, None],
+            received_count: int,
+            deviations: list[TransmissionPatternDeviation],
+            missing_slots: list[int],
+            last_slot: Union[int, None],
+    ):
+        self._pattern = pattern
+        self._phase = phase
+        self._received_count = received_count
+        self._deviations = deviations
+        self._missing_slots = missing_slots
+        self._last_slot = last_slot
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<phase={self._phase} | received={self._received_count} "
+                f"| deviations={len(self._deviations)} | missing={len(self._missing_slots)}>")
+
+    @property
+    def pattern(self) -> HrmTransmissionPattern:
+        """
+        :return: the pattern the sequence was aligned against
+        """
+        return self._pattern
+
+    @property
+    def phase(self) -> Union[int, None]:
+        """
+        :return: the pattern position of the first received page or None if the phase could not be determined (no
+                 background page was observed)
+        """
+        return self._phase
+
+    @property
+    def received_count(self) -> int:
+        """
+        :return: the number of pages that were aligned
+        """
+        return self._received_count
+
+    @property
+    def matched_count(self) -> int:
+        """
+        :return: the number of pages that matched the expected page at their slot
+        """
+        return self._received_count - len(self._deviations)
+
+    @property
+    def deviations(self) -> list[TransmissionPatternDeviation]:
+        """
+        :return: all received pages that do not match the page expected at their slot
+        """
+        return self._deviations.copy()
+
+    @property
+    def missing_slots(self) -> list[int]:
+        """
+        :return: all absolute slot numbers between the first and the last received page, no page was received for
+        """
+        return self._missing_slots.copy()
+
+    @property
+    def last_slot(self) -> Union[int, None]:
+        """
+        :return: the absolute slot number of the last received page or None if the phase could not be determined
+        """
+        return self._last_slot
+
+    @property
+    def is_valid(self) -> bool:
+        """
+        :return: True if the phase could be determined and every received page matches the pattern
+        """
+        return self._phase is not None and len(self._deviations) == 0
+
+
+class HrmTransmissionPattern:
+    """
+    Model of the fixed transmission pattern of an ANT+ Heart-Rate-Monitor.
+
+    The device sends its main page. Every 65th message, it sends a background page instead, that is repeated
+    :attr:`BACKGROUND_PAGE_REPETITIONS` times. The background pages rotate through the set of background pages. One
+    block of the pattern consists of :attr:`MAIN_PAGES_PER_BLOCK` main pages followed by one background burst, the full
+    pattern consists of one block per background page.
+
+    The rotation order is the order the background pages are given in. The ANT+ profile does not define this order, so
+    the order of :meth:`AntplusHrmDeviceConfig.expected_background_pages` is only an assumption. Use
+    :meth:`HrmTransmissionPattern.with_observed_rotation` to derive the real order from a received sequence before
+    aligning it. The burst timing (:meth:`HrmTransmissionPattern.is_background_slot`,
+    :meth:`HrmTransmissionPattern.get_slots_until_next_background_burst`) does not depend on the rotation order.
+    """
+
+    #: number of main pages that are sent between two background bursts
+    MAIN_PAGES_PER_BLOCK = 64
+    #: number of times a background page is repeated within one burst
+    BACKGROUND_PAGE_REPETITIONS = 4
+
+    def __init__(
+            self,
+            main_page: type[BaseHrmPage],
+            background_pages: Sequence[type[BaseHrmPage]],
+    ):
+        if len(background_pages) == 0:
+            raise ValueError('the transmission pattern needs at least one background page')
+        if len(set(background_pages)) != len(background_pages):
+            raise ValueError(f'background pages need to be unique: {background_pages}')
+        if main_page in background_pages:
+            raise ValueError(f'main page {main_page.__name__} can not be a background page at the same time')
+
+        self._main_page = main_page
+        self._background_pages = tuple(background_pages)
+        self._background_page_rotation_idx = {page: idx for idx, page in enumerate(self._background_pages)}
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<main={self._main_page.__name__} "
+                f"| background={[page.__name__ for page in self._background_pages]}>")
+
+    @classmethod
+    def from_device_config(cls, config: AntplusHrmDeviceConfig) -> HrmTransmissionPattern:
+        """
+        Creates the pattern the device described by the given configuration is expected to transmit.
+
+        :param config: the device configuration
+        :return: the transmission pattern for this device
+        """
+        return cls(main_page=config.expected_main_page, background_pages=config.expected_background_pages)
+
+    @property
+    def main_page(self) -> type[BaseHrmPage]:
+        """
+        :return: the main page of this pattern
+        """
+        return self._main_page
+
+    @property
+    def background_pages(self) -> tuple[type[BaseHrmPage], ...]:
+        """
+        :return: the background pages of this pattern in the order of their rotation
+        """
+        return self._background_pages
+
+    @property
+    def block_length(self) -> int:
+        """
+        :return: the number of slots of one block (main pages followed by one background burst)
+        """
+        return self.MAIN_PAGES_PER_BLOCK + self.BACKGROUND_PAGE_REPETITIONS
+
+    @property
+    def length(self) -> int:
+        """
+        :return: the number of slots until the pattern repeats itself
+        """
+        return self.block_length * len(self._background_pages)
+
+    def is_background_slot(self, slot: int) -> bool:
+        """
+        :param slot: the absolute slot number
+        :return: True if the pattern expects a background page at this slot
+        """
+        return slot % self.block_length >= self.MAIN_PAGES_PER_BLOCK
+
+    def get_expected_page_for_slot(self, slot: int) -> type[BaseHrmPage]:
+        """
+        :param slot: the absolute slot number
+        :return: the page type the pattern expects at the given slot
+        """
+        if not self.is_background_slot(slot):
+            return self._main_page
+        return self._background_pages[(slot // self.block_length) % len(self._background_pages)]
+
+    def get_slots_until_next_background_burst(self, slot: int) -> int:
+        """
+        :param slot: the absolute slot number
+        :return: the number of slots from the given slot until the next background burst starts (a burst that is
+                 already running at the given slot is not considered)
+        """
+        pos_in_block = slot % self.block_length
+        if pos_in_block < self.MAIN_PAGES_PER_BLOCK:
+            return self.MAIN_PAGES_PER_BLOCK - pos_in_block
+        return self.block_length - pos_in_block + self.MAIN_PAGES_PER_BLOCK
+
+    def _get_burst_start_slot_for(self, page_type: type[BaseHrmPage]) -> int:
+        return self._background_page_rotation_idx[page_type] * self.block_length + self.MAIN_PAGES_PER_BLOCK
+
+    def _count_observed_successors(
+            self,
+            page_types: Sequence[type[BaseHrmPage]],
+            slot_offsets: Sequence[int]
+    ) -> dict[type[BaseHrmPage], Counter]:
+        successor_counts = {}
+        # page type, first and last slot offset of the last observed burst
+        burst_type, burst_start, burst_end = None, None, None
+        for idx, cur_type in enumerate(page_types):
+            if cur_type not in self._background_page_rotation_idx:
+                continue
+            cur_offset = slot_offsets[idx]
+            if burst_type == cur_type and cur_offset - burst_end < self.BACKGROUND_PAGE_REPETITIONS:
+                # repetition within the same burst
+                burst_end = cur_offset
+                continue
+            if burst_type is not None \
+                    and abs(cur_offset - burst_start - self.block_length) < self.BACKGROUND_PAGE_REPETITIONS:
+                # only consecutive bursts define a successor - otherwise a complete burst could be lost in between
+                successor_counts.setdefault(burst_type, Counter())[cur_type] += 1
+            burst_type, burst_start, burst_end = cur_type, cur_offset, cur_offset
+        return successor_counts
+
+    def with_observed_rotation(
+            self,
+            page_types: Sequence[type[BaseHrmPage]],
+            slot_offsets: Union[Sequence[int], None] = None
+    ) -> HrmTransmissionPattern:
+        """
+        Derives the rotation order of the background pages from a received sequence. Every two consecutive background
+        bursts define the successor of the first burst's page (the most often observed successor wins). Pages whose
+        successor was not observed keep their position of :meth:`HrmTransmissionPattern.background_pages`.
+
+        The derived order is only as good as the received sequence - a device that does not rotate through all
+        background pages still results in deviations, when the sequence is aligned against the returned pattern.
+
+        :param page_types: the received page-type sequence
+        :param slot_offsets: the slot offset of every page relative to the first one (if None, it is assumed that no
+                             page was lost)
+        :return: a new pattern with the same main and background pages, that uses the observed rotation order
+        """
+        if slot_offsets is None:
+            slot_offsets = range(len(page_types))
+        if len(slot_offsets) != len(page_types):
+            raise ValueError(f'received {len(slot_offsets)} slot offsets for {len(page_types)} pages')
+        successors = {
+            page: counts.most_common(1)[0][0]
+            for page, counts in self._count_observed_successors(page_types, slot_offsets).items()
+        }
+        # start every chain with a page that is not the successor of another page - if the rotation was observed
+        # completely, all pages have a predecessor and the chain starts with the first configured page
+        heads = [page for page in self._background_pages if page not in successors.values()]
+        rotation = []
+        for cur_page in heads + list(self._background_pages):
+            while cur_page is not None and cur_page not in rotation:
+                rotation.append(cur_page)
+                cur_page = successors.get(cur_page)
+        return self.__class__(main_page=self._main_page, background_pages=rotation)
+
+    def determine_phase(
+            self,
+            page_types: Sequence[type[BaseHrmPage]],
+            slot_offsets: Union[Sequence[int], None] = None
+    ) -> Union[int, None]:
+        """
+        Determines the pattern position of the first page of the given sequence. The phase is anchored on the first
+        background burst whose start (or end) could be observed completely.
+
+        :param page_types: the received page-type sequence
+        :param slot_offsets: the slot offset of every page relative to the first one (if None, it is assumed that no
+                             page was lost)
+        :return: the pattern position of the first page or None if no background burst boundary was observed
+        """
+        if slot_offsets is None:
+            slot_offsets = range(len(page_types))
+
+        # prefer a burst start, because it does not rely on the burst length
+        for idx in range(1, len(page_types)):
+            cur_type = page_types[idx]
+            if cur_type not in self._background_page_rotation_idx:
+                continue
+            if page_types[idx - 1] != cur_type and slot_offsets[idx - 1] == slot_offsets[idx] - 1:
+                return (self._get_burst_start_slot_for(cur_type) - slot_offsets[idx]) % self.length
+        # fall back to a burst end
+        for idx in range(0, len(page_types) - 1):
+            cur_type = page_types[idx]
+            if cur_type not in self._background_page_rotation_idx:
+                continue
+            if page_types[idx + 1] != cur_type and slot_offsets[idx + 1] == slot_offsets[idx] + 1:
+                burst_end_slot = self._get_burst_start_slot_for(cur_type) + self.BACKGROUND_PAGE_REPETITIONS - 1
+                return (burst_end_slot - slot_offsets[idx]) % self.length
+        return None
+
+    def align(
+            self,
+            page_types: Sequence[type[BaseHrmPage]],
+            slot_offsets: Union[Sequence[int], None] = None,
+            max_skipped_slots: Union[int, None] = None,
+    ) -> HrmTransmissionPatternAlignment:
+        """
+        Aligns a received page-type sequence against this pattern in linear time.
+
+        If ``slot_offsets`` are given (f.e. determined by the receive timestamps and the channel period), every page is
+        compared with the page expected at its slot and all slots without a page are reported as missing. Without
+        offsets, the alignment assumes one slot per received page and resynchronizes on a mismatch by skipping up to
+        ``max_skipped_slots`` slots, if the received page is expected there (these slots are reported as missing).
+
+        :param page_types: the received page-type sequence
+        :param slot_offsets: the slot offset of every page relative to the first one (needs to be strictly increasing)
+        :param max_skipped_slots: the maximum number of slots the alignment is allowed to skip for resynchronization
+                                  (defaults to :attr:`BACKGROUND_PAGE_REPETITIONS`)
+        :return: the alignment result
+        """
+        if slot_offsets is not None and len(slot_offsets) != len(page_types):
+            raise ValueError(f'received {len(slot_offsets)} slot offsets for {len(page_types)} pages')
+        if max_skipped_slots is None:
+            max_skipped_slots = self.BACKGROUND_PAGE_REPETITIONS
+
+        phase = self.determine_phase(page_types, slot_offsets)
+        if phase is None:
+            # without phase, the only thing that can be checked is that all pages are main pages
+            deviations = [
+                TransmissionPatternDeviation(idx, idx, self._main_page, cur_type)
+                for idx, cur_type in enumerate(page_types) if cur_type != self._main_page
+            ]
+            return HrmTransmissionPatternAlignment(self, None, len(page_types), deviations, [], None)
+
+        if slot_offsets is not None:
+            return self._align_by_slot_offsets(page_types, slot_offsets, phase)
+        return self._align_by_resynchronization(page_types, phase, max_skipped_slots)
+
+    def _align_by_slot_offsets(
+            self,
+            page_types: Sequence[type[BaseHrmPage]],
+            slot_offsets: Sequence[int],
+            phase: int
+    ) -> HrmTransmissionPatternAlignment:
+        deviations = []
+        missing_slots = []
+        last_slot = None
+        for idx, cur_type in enumerate(page_types):
+            cur_slot = phase + slot_offsets[idx]
+            if last_slot is not None:
+                if cur_slot <= last_slot:
+                    raise ValueError(f'slot offsets need to be strictly increasing (index {idx})')
+                missing_slots.extend(range(last_slot + 1, cur_slot))
+            expected_type = self.get_expected_page_for_slot(cur_slot)
+            if cur_type != expected_type:
+                deviations.append(TransmissionPatternDeviation(idx, cur_slot, expected_type, cur_type))
+            last_slot = cur_slot
+        return HrmTransmissionPatternAlignment(self, phase, len(page_types), deviations, missing_slots, last_slot)
+
+    def _align_by_resynchronization(
+            self,
+            page_types: Sequence[type[BaseHrmPage]],
+            phase: int,
+            max_skipped_slots: int
+    ) -> HrmTransmissionPatternAlignment:
+        deviations = []
+        missing_slots = []
+        cur_slot = phase
+        for idx, cur_type in enumerate(page_types):
+            expected_type = self.get_expected_page_for_slot(cur_slot)
+            if cur_type != expected_type:
+                for skip in range(1, max_skipped_slots + 1):
+                    if self.get_expected_page_for_slot(cur_slot + skip) == cur_type:
+                        missing_slots.extend(range(cur_slot, cur_slot + skip))
+                        cur_slot += skip
+                        break
+                else:
+                    deviations.append(TransmissionPatternDeviation(idx, cur_slot, expected_type, cur_type))
+            cur_slot += 1
+        last_slot = cur_slot - 1 if page_types else None
+        return HrmTransmissionPatternAlignment(self, phase, len(page_types), deviations, missing_slots, last_slot)
+
+
+class HrmTransmissionPhaseEstimator:
+    """
+    Incrementally estimates the current position within a :class:`HrmTransmissionPattern` by observing the received
+    pages together with their receive timestamps. The estimator anchors itself on every background burst start it
+    observes and predicts the following slots by using the channel period.
+
+    The predicted burst times do not depend on the rotation order of the background pages, only the page that is
+    expected for a slot does (see :meth:`HrmTransmissionPattern.with_observed_rotation`).
+    """
+
+    def __init__(self, pattern: HrmTransmissionPattern, channel_period_sec: float):
+        if channel_period_sec <= 0:
+            raise ValueError(f'channel period needs to be positive (is {channel_period_sec})')
+        self._pattern = pattern
+        self._channel_period_sec = channel_period_sec
+
+        self._anchor_slot = None
+        self._anchor_timestamp = None
+        self._last_page_type = None
+        self._last_timestamp = None
+
+    @property
+    def pattern(self) -> HrmTransmissionPattern:
+        """
+        :return: the pattern this estimator works with
+        """
+        return self._pattern
+
+    @property
+    def channel_period_sec(self) -> float:
+        """
+        :return: the channel period in seconds
+        """
+        return self._channel_period_sec
+
+    @property
+    def is_synchronized(self) -> bool:
+        """
+        :return: True if the estimator has observed a background burst start and is able to predict the pattern
+        """
+        return self._anchor_slot is not None
+
+    def reset(self) -> None:
+        """
+        Resets the estimator (f.e. after the channel was reopened)
+        """
+        self._anchor_slot = None
+        self._anchor_timestamp = None
+        self._last_page_type = None
+        self._last_timestamp = None
+
+    def update(self, page_type: type[BaseHrmPage], timestamp: float) -> None:
+        """
+        Updates the estimator with a new received page. The pages need to be provided in the order they were received.
+
+        :param page_type: the type of the received page
+        :param timestamp: the receive timestamp of the page in seconds
+        """
+        if page_type in self._pattern.background_pages and self._last_page_type != page_type \
+                and self._last_timestamp is not None \
+                and round((timestamp - self._last_timestamp) / self._channel_period_sec) == 1:
+            # observed a background burst start -> (re-)anchor
+            self._anchor_slot = self._pattern.background_pages.index(page_type) * self._pattern.block_length \
+                                + self._pattern.MAIN_PAGES_PER_BLOCK
+            self._anchor_timestamp = timestamp
+        self._last_page_type = page_type
+        self._last_timestamp = timestamp
+
+    def _get_timestamp_for_slot(self, slot: int) -> float:
+        return self._anchor_timestamp + (slot - self._anchor_slot) * self._channel_period_sec
+
+    def get_slot_for_timestamp(self, timestamp: float) -> int:
+        """
+        :param timestamp: the timestamp in seconds (same time base as the timestamps provided to
+                          :meth:`HrmTransmissionPhaseEstimator.update`)
+        :return: the absolute slot number the pattern is expected to be in at the given time
+        """
+        if not self.is_synchronized:
+            raise ValueError('estimator is not synchronized yet - no background burst start was observed')
+        return self._anchor_slot + round((timestamp - self._anchor_timestamp) / self._channel_period_sec)
+
+    def predict_next_background_burst(self, after_timestamp: float) -> float:
+        """
+        :param after_timestamp: the timestamp in seconds the prediction should be done for
+        :return: the timestamp in seconds the next background burst (that is not already running at the given time)
+                 is expected to start
+        """
+        slot = self.get_slot_for_timestamp(after_timestamp)
+        return self._get_timestamp_for_slot(slot + self._pattern.get_slots_until_next_background_burst(slot))
+
+    def get_background_free_window(self, at_timestamp: float) -> tuple[float, float]:
+        """
+        :param at_timestamp: the timestamp in seconds the window should be determined for
+        :return: a tuple with the start and the end timestamp of the next time window without any background page
+                 (the start is ``at_timestamp`` if no background burst is running at this time)
+        """
+        slot = self.get_slot_for_timestamp(at_timestamp)
+        next_burst_start = self.predict_next_background_burst(at_timestamp)
+        if not self._pattern.is_background_slot(slot):
+            return at_timestamp, next_burst_start
+        # a burst is running -> the window starts after its last slot
+        burst_end_slot = slot - (slot % self._pattern.block_length) + self._pattern.block_length
+        return self._get_timestamp_for_slot(burst_end_slot), next_burst_start
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, NamedTuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class TransmitSchedulerStatistics(NamedTuple):
+    """
+    Snapshot of the statistics of a :class:`TransmitScheduler`
+    """
+    #: the number of payloads that were handed over to the ANT device
+    released_count: int
+    #: the number of broadcast payloads that were dropped because the same payload was still queued
+    coalesced_count: int
+    #: the number of payloads that are currently queued
+    queued_count: int
+    #: the mean time in seconds the released payloads were queued
+    mean_queue_delay_sec: float
+    #: the maximum time in seconds a released payload was queued
+    max_queue_delay_sec: float
+
+
+class _TransmitSlot:
+    """one preallocated slot of the transmit queue"""
+
+    def __init__(self, payload_size: int):
+        self.buffer = [0] * payload_size
+        self.send_callback: Union[Callable[[list[int]], None], None] = None
+        self.error_callback: Union[Callable[[Exception], None], None] = None
+        self.coalesce = False
+        self.enqueue_timestamp = 0.
+
+
+class _TransmitSlotRing:
+    """ring of preallocated transmit slots (not thread-safe - guarded by the condition of the scheduler)"""
+
+    def __init__(self, size: int, payload_size: int):
+        self.slots = [_TransmitSlot(payload_size) for _ in range(size)]
+        # index of the oldest queued slot
+        self.head = 0
+        # number of queued slots (including the one that is currently handed over)
+        self.count = 0
+        # True while the oldest slot is handed over to the ANT device
+        self.releasing = False
+
+    @property
+    def is_full(self) -> bool:
+        """
+        :return: True if there is no free slot
+        """
+        return self.count >= len(self.slots)
+
+    def contains_coalescable(self, raw_data: bytes, send_callback: Callable[[list[int]], None]) -> bool:
+        """
+        :param raw_data: the payload
+        :param send_callback: the send callback of the payload
+        :return: True if the same coalescable payload is still queued (and not handed over yet) for the same callback
+        """
+        for offset in range(1 if self.releasing else 0, self.count):
+            slot = self.slots[(self.head + offset) % len(self.slots)]
+            if slot.coalesce and slot.send_callback == send_callback and bytes(slot.buffer) == raw_data:
+                return True
+        return False
+
+    def push(self) -> _TransmitSlot:
+        """
+        :return: the next free slot, that is queued now
+        """
+        slot = self.slots[(self.head + self.count) % len(self.slots)]
+        self.count += 1
+        return slot
+
+    def pop(self) -> None:
+        """
+        Releases the oldest slot after it was handed over.
+        """
+        slot = self.slots[self.head]
+        slot.send_callback = None
+        slot.error_callback = None
+        self.head = (self.head + 1) % len(self.slots)
+        self.count -= 1
+        self.releasing = False
+
+    def discard(self) -> None:
+        """
+        Discards all queued slots (except of the one that is currently handed over).
+        """
+        self.count = 1 if self.releasing else 0
+
+
+class _TransmitStatistics:
+    """statistics of the released payloads"""
+
+    def __init__(self, queue_delay_histogram: Union[Histogram, None]):
+        self.released_count = 0
+        self.coalesced_count = 0
+        self.queue_delay_sum = 0.
+        self.queue_delay_max = 0.
+        self.queue_delay_histogram = queue_delay_histogram
+
+    def add_released(self, queue_delay: float) -> None:
+        """
+        Adds a released payload.
+
+        :param queue_delay: the time in seconds the payload was queued
+        """
+        self.released_count += 1
+        self.queue_delay_sum += queue_delay
+        self.queue_delay_max = max(self.queue_delay_max, queue_delay)
+        if self.queue_delay_histogram is not None:
+            self.queue_delay_histogram.observe(queue_delay)
+
+
+class TransmitScheduler:
+    """
+    Transmit queue for one channel that releases at most one payload per channel period. The ANT device can only
+    transmit one message per channel period, so bursts of outgoing pages (f.e. of a page-request sweep) are queued
+    instead of overrunning the device. A payload that is submitted while the channel was idle for at least one channel
+    period is released immediately.
+
+    All payloads are copied into preallocated buffers (one fixed-size list per queue slot) that are directly handed over
+    to the send callbacks. The send callbacks must not keep a reference to the buffer after returning. They are executed
+    within the scheduler thread, so errors are reported to the error callback of the payload (see
+    :meth:`TransmitScheduler.submit`).
+    """
+
+    def __init__(
+            self,
+            channel_period_sec: float,
+            queue_size: int = 32,
+            payload_size: int = 8,
+            queue_delay_histogram: Union[Histogram, None] = None
+    ):
+        """
+        :param channel_period_sec: the channel period in seconds
+        :param queue_size: the maximum number of queued payloads
+        :param payload_size: the size of every payload in bytes
+        :param queue_delay_histogram: optional histogram every queue delay of a released payload is observed in
+        """
+        if queue_size < 1:
+            raise ValueError('queue size needs to be at least 1')
+        self._channel_period_sec = channel_period_sec
+        self._ring = _TransmitSlotRing(queue_size, payload_size)
+        self._last_release_timestamp = None
+        self._statistics = _TransmitStatistics(queue_delay_histogram)
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}<queued={self._ring.count} | released={self._statistics.released_count} "
+                f"| coalesced={self._statistics.coalesced_count}>")
+
+    @property
+    def channel_period_sec(self) -> float:
+        """
+        :return: the channel period in seconds
+        """
+        return self._channel_period_sec
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if the scheduler thread is running
+        """
+        return self._running
+
+    def get_statistics(self) -> TransmitSchedulerStatistics:
+        """
+        :return: a snapshot of the current statistics
+        """
+        with self._cond:
+            statistics = self._statistics
+            return TransmitSchedulerStatistics(
+                released_count=statistics.released_count,
+                coalesced_count=statistics.coalesced_count,
+                queued_count=self._ring.count,
+                mean_queue_delay_sec=statistics.queue_delay_sum / statistics.released_count
+                if statistics.released_count else 0.,
+                max_queue_delay_sec=statistics.queue_delay_max,
+            )
+
+    def start(self) -> None:
+        """
+        Starts the scheduler thread
+        """
+        if self._running:
+            raise ValueError('scheduler is already running')
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='ant-transmit-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: float = 5) -> None:
+        """
+        Stops the scheduler thread.
+
+        :param flush: True if all queued payloads should be released before stopping, otherwise they are discarded
+        :param timeout: the maximum time in seconds to wait for the thread
+        """
+        if not self._running:
+            return
+        with self._cond:
+            self._running = False
+            if not flush:
+                # only keep the payload that is currently handed over
+                self._ring.discard()
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            raise RuntimeError('transmit scheduler thread failed to shut down')
+        self._thread = None
+
+    def submit(
+            self,
+            raw_data: bytes,
+            send_callback: Callable[[list[int]], None],
+            coalesce: bool = False,
+            timeout: Union[float, None] = None,
+            error_callback: Union[Callable[[Exception], None], None] = None
+    ) -> bool:
+        """
+        Queues a new payload. The method blocks as long as the queue is full.
+
+        :param raw_data: the payload that should be transmitted
+        :param send_callback: the callback that hands over the payload (as list of integers) to the ANT device
+        :param coalesce: True if the payload should be dropped if the same payload is still queued for the same
+                         callback (should only be used for broadcast payloads)
+        :param timeout: the maximum time in seconds to wait for a free queue slot (waits endlessly if None - use 0 for
+                        not blocking at all)
+        :param error_callback: optional callback that gets the error (within the scheduler thread) if the send callback
+                               fails (the error is only logged if None)
+        :return: True if the payload was queued or False if it was coalesced with an already queued one
+        """
+        raw_data = bytes(raw_data)
+        ring = self._ring
+        if len(raw_data) != len(ring.slots[0].buffer):
+            raise ValueError(f'expected a payload of {len(ring.slots[0].buffer)} bytes, but got {len(raw_data)} bytes')
+        with self._cond:
+            if not self._running:
+                raise ValueError('scheduler is not running')
+            if coalesce and ring.contains_coalescable(raw_data, send_callback):
+                self._statistics.coalesced_count += 1
+                return False
+            if not self._cond.wait_for(lambda: not ring.is_full or not self._running, timeout):
+                raise TimeoutError(f'no free transmit slot within {timeout} seconds')
+            if not self._running:
+                raise ValueError('scheduler was stopped while waiting for a free slot')
+            slot = ring.push()
+            slot.buffer[:] = raw_data
+            slot.send_callback = send_callback
+            slot.error_callback = error_callback
+            slot.coalesce = coalesce
+            slot.enqueue_timestamp = time.perf_counter()
+            self._cond.notify_all()
+        return True
+
+    @staticmethod
+    def _hand_over(slot: _TransmitSlot) -> None:
+        try:
+            slot.send_callback(slot.buffer)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            if slot.error_callback is None:
+                logger.exception('failed to hand over queued payload to the ANT device')
+                return
+            try:
+                slot.error_callback(exc)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('failed to report the error of a queued payload')
+
+    def _run(self) -> None:
+        ring = self._ring
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: ring.count > 0 or not self._running)
+                if ring.count == 0:
+                    # not running anymore and all payloads are released
+                    return
+                now = time.perf_counter()
+                if self._last_release_timestamp is not None:
+                    remaining = self._last_release_timestamp + self._channel_period_sec - now
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                slot = ring.slots[ring.head]
+                ring.releasing = True
+            self._hand_over(slot)
+            with self._cond:
+                self._statistics.add_released(now - slot.enqueue_timestamp)
+                ring.pop()
+                self._last_release_timestamp = now
+                self._cond.notify_all()
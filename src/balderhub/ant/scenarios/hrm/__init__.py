@@ -1,4 +1,4 @@
-from .base_hrm_scenario import BaseHrmScenario
+from .base_hrm_scenario import BaseHrmScenario, dump_flight_recorder_on_failure
 from .scenario_hrm_battery_messureing import ScenarioHrmBatteryMeasuring
 from .scenario_hrm_full_transmission_pattern import ScenarioHrmDeviceProfileFullTransmissionPattern
 from .scenario_hrm_manual_request_for_ack import ScenarioManualRequestForAck
@@ -6,6 +6,7 @@ from .scenario_hrm_manual_request_for_brdcst import ScenarioHrmManualRequestForB
 
 __all__ = [
     "BaseHrmScenario",
+    "dump_flight_recorder_on_failure",
     "ScenarioHrmBatteryMeasuring",
     "ScenarioHrmDeviceProfileFullTransmissionPattern",
     "ScenarioManualRequestForAck",
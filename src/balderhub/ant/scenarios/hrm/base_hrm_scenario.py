@@ -1,4 +1,7 @@
+import functools
+import inspect
 import logging
+from typing import Callable
 
 import balder
 
@@ -10,6 +13,29 @@ from balderhub.ant.lib.scenario_features.heart_rate_monitor_device_profile impor
 logger = logging.getLogger(__name__)
 
 
+def dump_flight_recorder_on_failure(test_method: Callable) -> Callable:
+    """
+    Decorator for test methods of HRM scenarios, that dumps the flight recorder of the ``HeartRateHost`` controller into
+    a capture file (see :meth:`BaseHrmScenario.dump_flight_recorder`) if the test fails. The decorator needs to be the
+    innermost one (directly above the method), so that other balder decorators get the wrapped method.
+
+    :param test_method: the test method of the scenario
+    :return: the wrapped test method
+    """
+    @functools.wraps(test_method)
+    def wrapper(*args, **kwargs):
+        try:
+            return test_method(*args, **kwargs)
+        except Exception:
+            # balder provides the scenario as keyword argument
+            scenario = kwargs['self'] if 'self' in kwargs else args[0]
+            scenario.dump_flight_recorder(test_method.__name__)
+            raise
+    # balder resolves fixtures and parameters by the arguments of the test method
+    wrapper.__signature__ = inspect.signature(test_method)
+    return wrapper
+
+
 class BaseHrmScenario(balder.Scenario):
     """Base test scenario for working with Heart-Rate Monitor devices"""
 
@@ -23,3 +49,18 @@ class BaseHrmScenario(balder.Scenario):
     class HeartRateHost(balder.Device):
         """device receiving the heart rate data"""
         controller = AntplusControllerHrmFeature(AntPlusDevice='HeartRateSensor')
+
+    def dump_flight_recorder(self, name: str) -> None:
+        """
+        Dumps the flight recorder of the controller (see :meth:`AntplusControllerFeature.dump_flight_recorder`). Errors
+        while dumping are only logged, so that they do not hide the original failure.
+
+        :param name: the name that identifies the dump (f.e. the name of the failed test)
+        """
+        try:
+            path = self.HeartRateHost.controller.dump_flight_recorder(f"{self.__class__.__name__}-{name}")
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception('failed to dump the flight recorder')
+            return
+        if path is not None:
+            logger.error(f'dumped flight recorder of failed `{name}` to `{path}`')
@@ -1,12 +1,10 @@
-import time
-
 import balder
 from balder.connections import DCPowerConnection
 
 import balderhub.battery.lib.scenario_features
 from balderhub.battery.lib.scenario_features import BatteryTestCriteriaConfig
 
-from balderhub.ant.scenarios.hrm.base_hrm_scenario import BaseHrmScenario
+from balderhub.ant.scenarios.hrm.base_hrm_scenario import BaseHrmScenario, dump_flight_recorder_on_failure
 
 from balderhub.ant.lib.utils import pages, PageMessageCollection
 from balderhub.heart.lib.scenario_features import HeartBeatFeature, StrapDockingFeature
@@ -59,11 +57,12 @@ class ScenarioHrmBatteryMeasuring(BaseHrmScenario):
     @balder.fixture('testcase')
     def wait_for_reset(self, power_off_device):  # pylint: disable=unused-argument
         """wait a second before entering any testcase"""
-        time.sleep(1)
+        self.HeartRateHost.controller.observe_channel(1)
 
     @balder.parametrize_by_feature(
         "battery_level", (HeartRateSensor, 'test_config', 'validation_with_battery_levels')
     )
+    @dump_flight_recorder_on_failure
     def test_check_different_measurements(self, battery_level):
         """
         Test that validates if the different battery levels are presented by the dut while changing them with the
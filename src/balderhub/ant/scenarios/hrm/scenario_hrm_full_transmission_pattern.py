@@ -1,6 +1,5 @@
 import logging
 import math
-import time
 
 import balder
 from balder.connections import DCPowerConnection
@@ -9,7 +8,7 @@ from balderhub.ant.lib.utils import pages
 import balderhub.battery.lib.scenario_features
 from balderhub.heart.lib.scenario_features import HeartBeatFeature, StrapDockingFeature
 
-from .base_hrm_scenario import BaseHrmScenario
+from .base_hrm_scenario import BaseHrmScenario, dump_flight_recorder_on_failure
 from ...lib.utils.support import filter_hrm_messages_by_toggle_bit_change
 
 logger = logging.getLogger(__name__)
@@ -122,13 +121,14 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
 
         logger.info(f'now wait for {time_to_wait:.2f} seconds to make sure that we receive '
                     f'{self.transmission_pattern_sequence_count} full transmission patterns')
-        time.sleep(time_to_wait)
+        self.HeartRateHost.controller.observe_channel(time_to_wait)
         logger.info('close ANT device channel')
         self.HeartRateHost.controller.close_channel()
 
         logger.info('stop heart beat')
         self.Heart.heart.stop()
 
+    @dump_flight_recorder_on_failure
     def test_general_profile_consistency(self):
         """
         This test executed the profile validation method
@@ -145,38 +145,63 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
         assert len(errors_only) == 0, ("detect errors within the profile: \n" +
                                        '\n'.join([f"- {k}: ERROR MESSAGE `{v}`" for k, v in errors_only]) + '\n')
 
+    @dump_flight_recorder_on_failure
+    def test_transmission_pattern(self):
+        """
+        This test aligns all received pages against the transmission pattern that is expected according to the device
+        configuration and makes sure that every page was sent within its expected slot.
+        """
+        alignment = self.HeartRateHost.controller.align_received_messages_to_transmission_pattern()
+        logger.info(f'aligned received messages to transmission pattern: {alignment}')
+
+        assert alignment.phase is not None, \
+            "unable to determine the phase of the transmission pattern - no background burst was observed completely"
+        assert len(alignment.deviations) == 0, \
+            (f"detect {len(alignment.deviations)} pages that do not match the expected transmission pattern "
+             f"{alignment.pattern}: {alignment.deviations}")
+
+        expected_slot_count = alignment.received_count + len(alignment.missing_slots)
+        loss_ratio = len(alignment.missing_slots) / expected_slot_count
+        assert loss_ratio <= self.HeartRateSensor.test_criteria.allowed_packet_loss_percent, \
+            (f"detect {len(alignment.missing_slots)} missing slots within transmission pattern "
+             f"({loss_ratio * 100:.2f}%): {alignment.missing_slots}")
+
+    @dump_flight_recorder_on_failure
     def test_validate_heart_beat_counts(self):
         """
-        This test reads all messages and makes sure that there is no beat loss.
+        This test reads all received heart beats and makes sure that there is no beat loss.
         """
-        messages = self.HeartRateHost.controller.received_broadcast_messages
-
-        last_beat_count = messages[0].heart_beat_count
-        for idx, cur_msg in enumerate(messages):
-
-            if last_beat_count == cur_msg.heart_beat_count:
+        beats = self.HeartRateHost.controller.heart_beat_index
+        gap_index = self.HeartRateHost.controller.session.create_gap_index_for()
+
+        assert len(beats) > 0, "did not receive any heart beats"
+        assert gap_index.loss_ratio <= self.HeartRateSensor.test_criteria.allowed_packet_loss_percent, \
+            (f"detect {gap_index.missing_count} missing messages ({gap_index.loss_percent:.2f}%) - longest gap: "
+             f"{gap_index.longest_gap}")
+
+        for idx in range(1, len(beats)):
+            beat_before, cur_beat = beats[idx - 1], beats[idx]
+            if cur_beat.beat_count > beat_before.beat_count + 1 \
+                    and gap_index.get_missing_count_between(beat_before.last_page_idx, cur_beat.first_page_idx) > 0:
+                # beats got lost together with the messages, that are within the allowed packet loss
+                logger.debug(f'skip check between beat {beat_before.beat_count_raw} and {cur_beat.beat_count_raw} '
+                             f'(idx={cur_beat.first_page_idx}) because of missing messages in between')
                 continue
+            assert cur_beat.beat_count == beat_before.beat_count + 1, \
+                (f"received unexpected beat count {cur_beat.beat_count_raw} (beat before was "
+                 f"{beat_before.beat_count_raw}) in message at index {cur_beat.first_page_idx}")
 
-            normalized_cur_beat_count = \
-                cur_msg.heart_beat_count \
-                    if last_beat_count < cur_msg.heart_beat_count \
-                    else (cur_msg.heart_beat_count + 0x100)
-
-            assert normalized_cur_beat_count == last_beat_count + 1, \
-                (f"received unexpected beat count {cur_msg.heart_beat_count} (beat before was {last_beat_count}) "
-                 f"in message {cur_msg} at index {idx}")
-
-            last_beat_count = cur_msg.heart_beat_count
-
+    @dump_flight_recorder_on_failure
     def test_validate_heart_beat_event_time(self):
         """
         This test reads the beat time of all events and check that these values have a exact diff-time of the set heart
         rate.
         """
 
-        messages = self.HeartRateHost.controller.received_broadcast_messages
+        beats = self.HeartRateHost.controller.heart_beat_index
+        gap_index = self.HeartRateHost.controller.session.create_gap_index_for()
 
-        assert len(messages) > 0, "did not receive any messages"
+        assert len(beats) > 0, "did not receive any heart beats"
 
         expected_diff_time_sec =  60 / self.DO_SEQUENCE_WITH_HEART_RATE
         allowed_min_diff_time_sec, allowed_max_diff_time_sec = \
@@ -184,47 +209,36 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
         allowed_min_diff_time = int(allowed_min_diff_time_sec * 1024)
         allowed_max_diff_time = int(allowed_max_diff_time_sec * 1024)
 
-        logger.info('calculate normalized heat beat event time')
-        skipped_beat_counts = 0
-        last_beat_msg_idx = 0
-        for idx, cur_message in enumerate(messages):
-            last_beat_msg = messages[last_beat_msg_idx]
-            # handle overflow if necessary
-            cur_message_beat_count = cur_message.heart_beat_count \
-                if cur_message.heart_beat_count > last_beat_msg.heart_beat_count \
-                else (cur_message.heart_beat_count + 0x100)
-
-            if last_beat_msg.heart_beat_count == cur_message.heart_beat_count:
-                # same beat -> make sure that time is still the same
-                assert last_beat_msg.heart_beat_event_time == cur_message.heart_beat_event_time
-                continue
-
-            # beat is different
+        number_of_beats_to_skip = self.HeartRateSensor.test_criteria.first_number_of_beats_to_skip
+        for idx in range(1, len(beats)):
+            beat_before, cur_beat = beats[idx - 1], beats[idx]
 
-            if skipped_beat_counts < self.HeartRateSensor.test_criteria.first_number_of_beats_to_skip:
-                logger.debug(f'skip check between beat {last_beat_msg.heart_beat_count} (idx={last_beat_msg_idx}) '
-                             f'and {cur_message.heart_beat_count} (idx={idx}) because test is configured to skip the '
-                             f'first {self.HeartRateSensor.test_criteria.first_number_of_beats_to_skip} beats')
-                skipped_beat_counts += 1
-            else:
-                # -> check that it is exactly one higher
-                assert cur_message_beat_count == last_beat_msg.heart_beat_count + 1, \
-                    (f"unexpected beat count {cur_message.heart_beat_count} of msg at idx {idx} "
-                     f"(beat count before was {last_beat_msg.heart_beat_count}) )")
+            if idx <= number_of_beats_to_skip:
+                logger.debug(f'skip check between beat {beat_before.beat_count_raw} '
+                             f'(idx={beat_before.first_page_idx}) and {cur_beat.beat_count_raw} '
+                             f'(idx={cur_beat.first_page_idx}) because test is configured to skip the first '
+                             f'{number_of_beats_to_skip} beats')
+                continue
 
-                cur_message_event_time = (cur_message.heart_beat_event_time + 0x10000) \
-                    if cur_message.heart_beat_event_time < last_beat_msg.heart_beat_event_time \
-                    else cur_message.heart_beat_event_time
+            if cur_beat.beat_count > beat_before.beat_count + 1 \
+                    and gap_index.get_missing_count_between(beat_before.last_page_idx, cur_beat.first_page_idx) > 0:
+                # beats got lost together with missing messages (loss is validated in `test_validate_heart_beat_counts`)
+                continue
 
-                cur_message_diff_time = cur_message_event_time - last_beat_msg.heart_beat_event_time
+            # -> check that it is exactly one higher (a changed event time within the same beat is detected here too)
+            assert cur_beat.beat_count == beat_before.beat_count + 1, \
+                (f"unexpected beat count {cur_beat.beat_count_raw} of msg at idx {cur_beat.first_page_idx} "
+                 f"(beat count before was {beat_before.beat_count_raw})")
 
-                assert allowed_min_diff_time <= cur_message_diff_time <= allowed_max_diff_time, \
-                    (f"difference detected between heart beat {last_beat_msg.heart_beat_count} "
-                     f"(idx: {last_beat_msg_idx}) and heart beat {cur_message.heart_beat_count} (idx: {idx}): "
-                     f"received: {cur_message_diff_time} (expected value between {allowed_min_diff_time} and "
-                     f"{allowed_max_diff_time} for configured {self.DO_SEQUENCE_WITH_HEART_RATE} BPM)")
-            last_beat_msg_idx = idx
+            cur_diff_time = cur_beat.event_time - beat_before.event_time
+            assert allowed_min_diff_time <= cur_diff_time <= allowed_max_diff_time, \
+                (f"difference detected between heart beat {beat_before.beat_count_raw} "
+                 f"(idx: {beat_before.first_page_idx}) and heart beat {cur_beat.beat_count_raw} "
+                 f"(idx: {cur_beat.first_page_idx}): received: {cur_diff_time} (expected value between "
+                 f"{allowed_min_diff_time} and {allowed_max_diff_time} for configured "
+                 f"{self.DO_SEQUENCE_WITH_HEART_RATE} BPM)")
 
+    @dump_flight_recorder_on_failure
     def test_main_page_0_default(self):
         """
         This test validates the content of the main page 0, if it is expected that this page is the main page.
@@ -240,10 +254,9 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
                  f"pages {existing_main_pages}")
             # nothing more to test, because data is empty
             all_msgs = self.HeartRateHost.controller.received_broadcast_messages
-            msgs_of_interest = all_msgs.filter_by_type(page_type=page_type)
+            msgs_of_interest = all_msgs.filter_by_type(page_type=page_type, as_view=True)
 
-            for cur_msg in msgs_of_interest:
-                msg_idx = all_msgs.index(cur_msg)
+            for msg_idx, cur_msg in msgs_of_interest.iter_with_source_index():
                 assert cur_msg.raw_data[1] == 0xFF, \
                     f"reserved byte 1 is not 0xFF, is {hex(cur_msg.raw_data[1])} for message at index {msg_idx}"
                 assert cur_msg.raw_data[2] == 0xFF, \
@@ -263,6 +276,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
                 (f"found not-expected main page `{page_type}` within determined MAIN "
                  f"pages {existing_background_pages}")
 
+    @dump_flight_recorder_on_failure
     def test_background_page_1_operating_time(self):
         """
         This test validates the content of the background page 1, which was sent during the session, if it was
@@ -295,6 +309,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
                 (f"found not-expected main page `{page_type}` within determined BACKGROUND "
                  f"pages {existing_background_pages}")
 
+    @dump_flight_recorder_on_failure
     def test_background_page_2_manufacturer(self):
         """
         This test validates the content of the background page 2, which was sent during the session, if it was
@@ -318,6 +333,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
 
         self.HeartRateHost.controller.validate_page_2_manufacturer()
 
+    @dump_flight_recorder_on_failure
     def test_background_page_3_product(self):
         """
         This test validates the content of the background page 3, which was sent during the session, if it was
@@ -341,6 +357,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
 
         self.HeartRateHost.controller.validate_page_3_product()
 
+    @dump_flight_recorder_on_failure
     def test_main_page_4_previous_beat(self):
         """
         This test validates the content of the main page 4, if it is expected that this page is the main page.
@@ -357,27 +374,27 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
             logger.info('validate that all previous heart-beat-event times are valid')
 
             all_msgs = self.HeartRateHost.controller.received_broadcast_messages
-            msgs_of_interest = filter_hrm_messages_by_toggle_bit_change(all_msgs).filter_by_type(page_type=page_type)
-
-            def get_last_different_heart_beat_event_time(for_idx):
-                cur_event_time = all_msgs[for_idx].heart_beat_event_time
-                for inner_idx in reversed(range(0, for_idx)):
-                    if all_msgs[inner_idx].heart_beat_event_time != cur_event_time:
-                        return all_msgs[inner_idx].heart_beat_event_time
-                raise ValueError('no other value found')
-
-            non_first_beat_msgs = [msg for msg in all_msgs if msg.heart_beat_count != all_msgs[0].heart_beat_count]
-            assert len(non_first_beat_msgs) > 0, "did not found messages with a heart beat"
-            first_beat_idx = all_msgs.index(non_first_beat_msgs[0])
-            for idx, msg in enumerate(all_msgs):
-                # iterating over all messages, because the current event time is always valid, but
-                # validating the previous-heart-beat-event-time only when toggle-bit changed (and instance of this type)
-                if msg in msgs_of_interest and idx >= first_beat_idx:
-                    last_heart_beat_event_time = get_last_different_heart_beat_event_time(idx)
-                    assert last_heart_beat_event_time == msg.previous_heart_beat_event_time_raw, \
-                        (f"received invalid previous-heart-beat-event-time "
-                         f"{msg.previous_heart_beat_event_time_raw} at index {idx} "
-                         f"(but last transmitted event time was {last_heart_beat_event_time})")
+            msgs_of_interest = filter_hrm_messages_by_toggle_bit_change(all_msgs, as_view=True).filter_by_type(
+                page_type=page_type, as_view=True
+            )
+
+            previous_event_times = all_msgs.get_previous_distinct_values('heart_beat_event_time')
+
+            first_beat_idx = next(
+                (idx for idx, msg in enumerate(all_msgs) if msg.heart_beat_count != all_msgs[0].heart_beat_count),
+                None
+            )
+            assert first_beat_idx is not None, "did not found messages with a heart beat"
+            # the current event time is always valid, but validating the previous-heart-beat-event-time only when
+            # toggle-bit changed (and instance of this type)
+            for idx, msg in msgs_of_interest.iter_with_source_index():
+                if idx < first_beat_idx:
+                    continue
+                last_heart_beat_event_time = previous_event_times[idx]
+                assert last_heart_beat_event_time == msg.previous_heart_beat_event_time_raw, \
+                    (f"received invalid previous-heart-beat-event-time "
+                     f"{msg.previous_heart_beat_event_time_raw} at index {idx} "
+                     f"(but last transmitted event time was {last_heart_beat_event_time})")
 
             logger.info(f'validated {len(msgs_of_interest)} messages -> all of them are valid')
 
@@ -397,6 +414,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
     #def test_main_page_5_swim_interval_summary(self):
     #    raise NotImplementedError
 
+    @dump_flight_recorder_on_failure
     def test_background_page_6_capabilities(self):
         """
         This test validates the content of the background page 6, which was sent during the session, if it was
@@ -418,9 +436,8 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
                 f"page type {page_type} not found in background page list: `{existing_background_pages}`"
 
             all_msgs = self.HeartRateHost.controller.received_broadcast_messages
-            msgs_of_interest = all_msgs.filter_by_type(page_type=page_type)
-            for msg in msgs_of_interest:
-                msg_idx = all_msgs.index(msg)
+            msgs_of_interest = all_msgs.filter_by_type(page_type=page_type, as_view=True)
+            for msg_idx, msg in msgs_of_interest.iter_with_source_index():
                 assert msg.raw_data[1] == 0xFF, \
                     f"reserved byte 1 is not 0xFF, is {hex(msg.raw_data[2])} for message at index {msg_idx}"
                 assert msg.raw_data[2] & ((1 << 4) | (1 << 5)) == 0x00, \
@@ -437,6 +454,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
             assert page_type not in existing_background_pages, \
                 f"page type {page_type} unexpectedly found in background page list: `{existing_background_pages}`"
 
+    @dump_flight_recorder_on_failure
     def test_background_page_7_battery(self):
         """
         This test validates the content of the background page 7, which was sent during the session, if it was
@@ -480,6 +498,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
                 (f"found not-expected backend page `{page_type}` within determined BACKGROUND "
                  f"pages {existing_background_pages}")
 
+    @dump_flight_recorder_on_failure
     def test_background_page_9_device_info(self):
         """
         This test validates the content of the background page 9, which was sent during the session, if it was
@@ -512,6 +531,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
                 (f"found not-expected background page `{page_type}` within determined BACKGROUND "
                  f"pages {existing_background_pages}")
 
+    @dump_flight_recorder_on_failure
     def test_no_other_background_pages_exists(self):
         """test that validates that every expected background page is within the recorded pages"""
         for existing_background_page in self.HeartRateHost.controller.determine_background_pages():
@@ -519,6 +539,7 @@ class ScenarioHrmDeviceProfileFullTransmissionPattern(BaseHrmScenario):
                 (f"detect a background page `{existing_background_page}` in data that is not existing in the "
                  f"expected background pages: {self.HeartRateSensor.ant_config.expected_background_pages}")
 
+    @dump_flight_recorder_on_failure
     def test_no_other_main_pages_exists(self):
         """test that validates that no other main pages, then the expected one, are within the recorded pages"""
 
@@ -1,5 +1,3 @@
-import time
-from datetime import timedelta, datetime
 import logging
 
 import balder
@@ -9,8 +7,9 @@ from balderhub.ant.lib.utils import pages
 import balderhub.battery.lib.scenario_features
 from balderhub.heart.lib.scenario_features import HeartBeatFeature, StrapDockingFeature
 
-from .base_hrm_scenario import BaseHrmScenario
-from ...lib.utils.page_message_collection import PageMessageCollection
+from .base_hrm_scenario import BaseHrmScenario, dump_flight_recorder_on_failure
+from ...lib.utils.page_message_collection import PageMessageCollectionView
+from ...lib.utils.page_request_sweep import PageRequest, PageRequestResult
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +27,10 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
     If :meth:`AntplusHrmDeviceConfig.manual_request_redirect_ack_as_broadcast` returns true every test within this
     scenario expects, that the DUT responds with a BROADCAST message even when requested for an ACK message (like it
     is done with every page-request within this scenario).
+
+    All requests of this scenario are sent back to back within one channel session by the
+    :meth:`AntplusControllerHrmFeature.run_page_request_sweep` method (see fixture ``request_sweep_results``). The tests
+    validate the results of this sweep.
     """
 
     # TODO further test ideas: wait till we expect exactly the background page and then request it (-> new scenario)
@@ -36,7 +39,8 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
     # TODO can I request another page after I've tried to request an invalid Common Page?
 
     DO_WITH_BATTERY_LEVEL = 1.0
-    ADDITIONAL_WAIT_SEC = 5
+    RESPONSE_MARGIN_SEC = 1
+    ACK_TRANSFER_TIMEOUT_SEC = 5
 
     class Heart(balder.Device):
         """device simulating the heart beat"""
@@ -93,46 +97,47 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
         :param transmit_no: the requested transmit number
         :return: the filled and ready to send request-page
         """
-        assert 0 < transmit_no <= 0x7F, f"illegal value for transmit_no: {transmit_no}"
-        return pages.common.Common70RequestDataPage.create(0x80 | transmit_no, page_to_request.PAGE_ID, 0x01)
+        return PageRequest(page_to_request, transmit_no, as_ack=True).create_request_page()
 
-    def _do_request_for_ack(
-            self,
-            page_to_request: type[pages.hrm.BaseHrmPage],
-            transmit_no: int
-    ) -> PageMessageCollection:
-        page_to_send = self.__class__.get_page_to_send(page_to_request=page_to_request, transmit_no=transmit_no)
-
-        # do sync and wait for the first background page to be fully transmitted - does not matter which background page
-        self.HeartRateHost.controller.wait_for_new_broadcast_message(
-            of_page_type=self.HeartRateSensor.ant_config.expected_background_pages,
-            timeout=20)  # increase timeout because 64 / 4 ~ 16 second
-        self.HeartRateHost.controller.wait_for_new_broadcast_message(
-            of_page_type=self.HeartRateSensor.ant_config.expected_main_page)
-        # after background page was fully transmitted -> send request (now it should normally return main pages)
-        timestamp_before = datetime.now()
-        self.HeartRateHost.controller.send_ack_message(page_to_send)
-        # TODO be careful if we wait more than 16 seconds -> then the expectation would be to receive a background page
-        # wait for all messages to be transmitted (with some additional seconds - we want to check that it continues
-        #  with main pages after that)
-        time.sleep(max(1, transmit_no) * 0.25 + self.ADDITIONAL_WAIT_SEC)
-
-        relevant_brdcst_msgs = self.HeartRateHost.controller.received_broadcast_messages.filter_for_timestamp(
-            start=timestamp_before)
-
-        relevant_ack_msgs = self.HeartRateHost.controller.received_ack_messages.filter_for_timestamp(
-            start=timestamp_before)
-        assert len(relevant_ack_msgs) == len(relevant_ack_msgs.filter_by_type(page_type=page_to_request)), \
+    @balder.fixture('variation')
+    def request_sweep_results(self, ant_connected):  # pylint: disable=unused-argument
+        """
+        fixture that sends the requests for all pages and transmission numbers of this scenario back to back within one
+        channel session and provides the results (by page type and transmission number) to the tests
+        """
+        requests = [
+            PageRequest(page_type, transmit_no, as_ack=True)
+            for page_type in self.HeartRateHost.controller.requestable_pages
+            for transmit_no in self.HeartRateSensor.test_criteria.request_transmission_numbers_for_ack
+        ]
+        results = self.HeartRateHost.controller.run_page_request_sweep(
+            requests, response_margin_sec=self.RESPONSE_MARGIN_SEC, ack_transfer_timeout=self.ACK_TRANSFER_TIMEOUT_SEC
+        )
+        self.HeartRateHost.controller.request_latency_tracker.log_report()
+        yield {(result.request.page_type, result.request.transmit_no): result for result in results}
+
+    def _validate_ack_response(self, result: PageRequestResult) -> PageMessageCollectionView:
+        page_to_request = result.request.page_type
+        transmit_no = result.request.transmit_no
+        assert result.transfer_error is None, f"failed to send the request: {result.transfer_error!r}"
+
+        relevant_brdcst_msgs = result.broadcast_messages
+        relevant_ack_msgs = result.ack_messages
+        assert len(relevant_ack_msgs) == len(result.ack_responses), \
             f"unexpectedly received ACK messages from another type than {page_to_request.__name__}: {relevant_ack_msgs}"
         assert len(relevant_ack_msgs) == max(transmit_no, 1), \
             (f"received unexpected message count - requested {transmit_no} times over Request page, "
              f"but received {len(relevant_ack_msgs)} messages of requested type")
 
-        assert (relevant_ack_msgs[0].timestamp - timestamp_before) < timedelta(seconds=1), \
-            "response time is higher than expected"  # TODO make configurable
+        max_latency_sec = self.HeartRateSensor.test_criteria.max_request_response_latency_sec
+        assert result.response_latency_sec is not None, \
+            f"did not receive any response for the request of page {page_to_request.__name__}"
+        assert result.response_latency_sec < max_latency_sec, \
+            (f"response time of {result.response_latency_sec * 1000:.1f} ms is higher than expected (max "
+             f"{max_latency_sec * 1000:.1f} ms)")
 
         # make sure that we only received main pages afterwards
-        brdcst_msgs_of_requested_page_type = relevant_brdcst_msgs.filter_by_type(page_type=page_to_request)
+        brdcst_msgs_of_requested_page_type = result.broadcast_responses
         assert len(brdcst_msgs_of_requested_page_type) == 0, \
             (f"received some broadcast messages from requested type {page_to_request.__name__} - unexpected because we "
              f"ask for ACK messages")
@@ -145,60 +150,51 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
                 and list(brdcst_msg_types)[0] == self.HeartRateSensor.ant_config.expected_main_page), \
             (f"received messages from unexpected type (only main pages were expected after all responses for Page 70 "
              f"Request have been transmitted): {brdcst_msgs_of_requested_page_type}")
-        return relevant_ack_msgs
+        return result.ack_responses
 
-    def _do_request_for_ack_but_expect_brdcst_response(
-            self,
-            page_to_request: type[pages.hrm.BaseHrmPage],
-            transmit_no: int
-    ) -> PageMessageCollection:
-        page_to_send = self.__class__.get_page_to_send(page_to_request=page_to_request, transmit_no=transmit_no)
-
-        # do sync and wait for the first background page to be fully transmitted - does not matter which background page
-        self.HeartRateHost.controller.wait_for_new_broadcast_message(
-            of_page_type=self.HeartRateSensor.ant_config.expected_background_pages,
-            timeout=20)  # increase timeout because 64 / 4 ~ 16 second
-        self.HeartRateHost.controller.wait_for_new_broadcast_message(
-            of_page_type=self.HeartRateSensor.ant_config.expected_main_page)
-        # after background page was fully transmitted -> send request (now it should normally return main pages)
-        timestamp_before = datetime.now()
-        self.HeartRateHost.controller.send_ack_message(page_to_send)
-        # TODO be careful if we wait more than 16 seconds -> then the expectation would be to receive a background page
-        # wait for all messages to be transmitted (with some additional seconds - we want to check that it continues
-        #  with main pages after that)
-        time.sleep(max(1, transmit_no) * 0.25 + self.ADDITIONAL_WAIT_SEC)
-
-        relevant_brdcst_msgs = self.HeartRateHost.controller.received_broadcast_messages.filter_for_timestamp(
-            start=timestamp_before)
+    def _validate_brdcst_response_for_ack_request(self, result: PageRequestResult) -> PageMessageCollectionView:
+        page_to_request = result.request.page_type
+        transmit_no = result.request.transmit_no
+        assert result.transfer_error is None, f"failed to send the request: {result.transfer_error!r}"
 
         # make sure that we did not receive any ACK messages
-        relevant_ack_msgs = self.HeartRateHost.controller.received_ack_messages.filter_for_timestamp(
-            start=timestamp_before
-        )
+        relevant_ack_msgs = result.ack_messages
         assert len(relevant_ack_msgs) == 0, \
             (f"received unexpected ACK messages while requesting page {page_to_request.__name__} by ACK, but while "
              f"expecting that test return messages as broadcast (setting in "
              f"`{self.HeartRateSensor.ant_config.__class__}.manual_request_redirect_ack_as_broadcast`): "
              f"{relevant_ack_msgs}")
 
-        # TODO this needs to cleaned up for message-loss
-        # make sure that we received exactly the transmit-no count of messages
-        msgs_of_requested_page_type = relevant_brdcst_msgs.filter_by_type(page_type=page_to_request)
+        # make sure that we received the transmit-no count of messages (missing messages are tolerated as long as
+        # they are within the allowed packet loss)
+        msgs_of_requested_page_type = result.broadcast_responses
+        assert result.loss_ratio <= self.HeartRateSensor.test_criteria.allowed_packet_loss_percent, \
+            (f"detect {result.missing_count} missing messages ({result.loss_ratio * 100:.2f}%) while requesting "
+             f"page {page_to_request.__name__}")
 
-        assert len(msgs_of_requested_page_type) == transmit_no, \
+        assert transmit_no - result.missing_count <= len(msgs_of_requested_page_type) <= transmit_no, \
             (f"received unexpected count of messages - received {len(msgs_of_requested_page_type)} messages of "
-             f"type {page_to_request.__name__}, but expected length was {transmit_no}")
+             f"type {page_to_request.__name__}, but expected length was {transmit_no} (with "
+             f"{result.missing_count} missing messages)")
+        assert len(msgs_of_requested_page_type) > 0, \
+            (f"did not receive any message of type {page_to_request.__name__} (all {transmit_no} responses are within "
+             f"the {result.missing_count} missing messages)")
 
-        first_msg = msgs_of_requested_page_type[0]
         last_msg = msgs_of_requested_page_type[-1]
 
-        # check Request-Page Message response time (time between request and first response)
-        # TODO this needs to cleaned up for message-loss
-        assert (first_msg.timestamp - timestamp_before) < timedelta(seconds=1), \
-            "response time is higher than expected"  # TODO make configurable
+        # check Request-Page Message response time (time between request and first response) - the first responses
+        # could be lost too, so every missing message before the first received response extends the allowed latency
+        max_latency_sec = result.get_allowed_response_latency_sec(
+            self.HeartRateSensor.test_criteria.max_request_response_latency_sec)
+        assert result.response_latency_sec is not None, \
+            f"did not receive any response for the request of page {page_to_request.__name__}"
+        assert result.response_latency_sec < max_latency_sec, \
+            (f"response time of {result.response_latency_sec * 1000:.1f} ms is higher than expected (max "
+             f"{max_latency_sec * 1000:.1f} ms with {result.missing_count_before_first_response} missing messages "
+             f"before the first response)")
 
         # make sure that we only received main pages afterwards
-        remaining_msgs = relevant_brdcst_msgs.filter_for_timestamp(start=last_msg.timestamp + timedelta(seconds=0.1))
+        remaining_msgs = result.broadcast_messages.filter_for_timestamp(start=last_msg.monotonic_timestamp + 0.1)
 
         assert len(remaining_msgs) > 0, ("expect some more main page messages after last transferred requested page "
                                          "messages, but did not receive anything more")
@@ -209,43 +205,18 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
              f"Request have been transmitted): {remaining_msgs}")
         return msgs_of_requested_page_type
 
-    def _do_request_for_ack_but_expect_no_response(
-            self,
-            page_to_request: type[pages.hrm.BaseHrmPage],
-            transmit_no: int
-    ) -> None:
-        page_to_send = self.__class__.get_page_to_send(page_to_request=page_to_request, transmit_no=transmit_no)
-
-        # do sync and wait for the first background page to be fully transmitted - does not matter which background page
-        self.HeartRateHost.controller.wait_for_new_broadcast_message(
-            of_page_type=self.HeartRateSensor.ant_config.expected_background_pages,
-            timeout=20  # increase timeout because 64 / 4 ~ 16 second
-        )
-        self.HeartRateHost.controller.wait_for_new_broadcast_message(
-            of_page_type=self.HeartRateSensor.ant_config.expected_main_page
-        )
+    def _validate_no_response_for_ack_request(self, result: PageRequestResult) -> None:
+        page_to_request = result.request.page_type
+        assert result.transfer_error is None, f"failed to send the request: {result.transfer_error!r}"
 
-        # after background page was fully transmitted -> send request (now it should normally return main pages)
-        timestamp_before = datetime.now()
-        self.HeartRateHost.controller.send_ack_message(page_to_send)
-        # wait for all messages to be transmitted (with some additional seconds - we want to make sure that no pages
-        # has been transmitted)
-        time.sleep(max(1, transmit_no) * 0.25 + self.ADDITIONAL_WAIT_SEC)
         # make sure that we did not receive any ACK messages
-        relevant_ack_msgs = self.HeartRateHost.controller.received_ack_messages.filter_for_timestamp(
-            start=timestamp_before
-        )
-
+        relevant_ack_msgs = result.ack_messages
         assert len(relevant_ack_msgs) == 0, \
             (f"received unexpected ACK messages while requesting a non-active page {page_to_request.__name__}: "
              f"{relevant_ack_msgs}")
 
-        relevant_brdcst_msgs = self.HeartRateHost.controller.received_broadcast_messages.filter_for_timestamp(
-            start=timestamp_before
-        )
-
         # make sure that we have only received main pages
-        msg_types = relevant_brdcst_msgs.get_message_types()
+        msg_types = result.broadcast_messages.get_message_types()
         assert len(msg_types) == 1 and list(msg_types)[0] == self.HeartRateSensor.ant_config.expected_main_page, \
             (f"received unexpected broadcast messages while requesting a non-active page "
              f"{page_to_request.__name__}: {msg_types}")
@@ -253,7 +224,8 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
     @balder.parametrize_by_feature(
         'transmit_no', (HeartRateSensor, 'test_criteria', 'request_transmission_numbers_for_ack')
     )
-    def test_ack_page_1_operating_time(self, transmit_no: int):
+    @dump_flight_recorder_on_failure
+    def test_ack_page_1_operating_time(self, request_sweep_results, transmit_no: int):
         """
         Test that validates the correct behavior, when the controller ask for a ACK message of
         :class:`Hrm1CumulativeOperationTimePage`. The test validates that the DUT answers the correct count of requested
@@ -268,26 +240,29 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
 
         If the test expects a response it will also validate the content of the messages.
 
+        :param request_sweep_results: FIXTURE value with the results of all page requests of this scenario
         :param transmit_no: PARAMETRIZED value describing the requested times the message should be sent
         """
         page_type = pages.hrm.Hrm1CumulativeOperationTimePage
+        result = request_sweep_results[(page_type, transmit_no)]
 
         if page_type in self.HeartRateSensor.ant_config.manual_request_possible_for:
             if self.HeartRateSensor.ant_config.manual_request_redirect_ack_as_broadcast:
-                response = self._do_request_for_ack_but_expect_brdcst_response(page_type, transmit_no)
+                response = self._validate_brdcst_response_for_ack_request(result)
             else:
-                response = self._do_request_for_ack(page_type, transmit_no)
+                response = self._validate_ack_response(result)
 
             page_type.validate_messages(
                     of_msg_collection=response,
             )
         else:
-            self._do_request_for_ack_but_expect_no_response(page_type, transmit_no)
+            self._validate_no_response_for_ack_request(result)
 
     @balder.parametrize_by_feature(
         'transmit_no', (HeartRateSensor, 'test_criteria', 'request_transmission_numbers_for_ack')
     )
-    def test_ack_page_2_manufacturer(self, transmit_no: int):
+    @dump_flight_recorder_on_failure
+    def test_ack_page_2_manufacturer(self, request_sweep_results, transmit_no: int):
         """
         Test that validates the correct behavior, when the controller ask for a ACK message of
         :class:`Hrm2ManufacturerInformationPage`. The test validates that the DUT answers the correct count of requested
@@ -302,15 +277,17 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
 
         If the test expects a response it will also validate the content of the messages.
 
+        :param request_sweep_results: FIXTURE value with the results of all page requests of this scenario
         :param transmit_no: PARAMETRIZED value describing the requested times the message should be sent
         """
         page_type = pages.hrm.Hrm2ManufacturerInformationPage
+        result = request_sweep_results[(page_type, transmit_no)]
 
         if page_type in self.HeartRateSensor.ant_config.manual_request_possible_for:
             if self.HeartRateSensor.ant_config.manual_request_redirect_ack_as_broadcast:
-                response = self._do_request_for_ack_but_expect_brdcst_response(page_type, transmit_no)
+                response = self._validate_brdcst_response_for_ack_request(result)
             else:
-                response = self._do_request_for_ack(page_type, transmit_no)
+                response = self._validate_ack_response(result)
 
             page_type.validate_messages(
                 of_msg_collection=response,
@@ -319,12 +296,13 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
             )
 
         else:
-            self._do_request_for_ack_but_expect_no_response(page_type, transmit_no)
+            self._validate_no_response_for_ack_request(result)
 
     @balder.parametrize_by_feature(
         'transmit_no', (HeartRateSensor, 'test_criteria', 'request_transmission_numbers_for_ack')
     )
-    def test_ack_page_3_product(self, transmit_no: int):
+    @dump_flight_recorder_on_failure
+    def test_ack_page_3_product(self, request_sweep_results, transmit_no: int):
         """
         Test that validates the correct behavior, when the controller ask for a ACK message of
         :class:`Hrm3ProductInformationPage`. The test validates that the DUT answers the correct count of requested
@@ -339,15 +317,17 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
 
         If the test expects a response it will also validate the content of the messages.
 
+        :param request_sweep_results: FIXTURE value with the results of all page requests of this scenario
         :param transmit_no: PARAMETRIZED value describing the requested times the message should be sent
         """
         page_type = pages.hrm.Hrm3ProductInformationPage
+        result = request_sweep_results[(page_type, transmit_no)]
 
         if page_type in self.HeartRateSensor.ant_config.manual_request_possible_for:
             if self.HeartRateSensor.ant_config.manual_request_redirect_ack_as_broadcast:
-                response = self._do_request_for_ack_but_expect_brdcst_response(page_type, transmit_no)
+                response = self._validate_brdcst_response_for_ack_request(result)
             else:
-                response = self._do_request_for_ack(page_type, transmit_no)
+                response = self._validate_ack_response(result)
 
             page_type.validate_messages(
                 of_msg_collection=response,
@@ -356,12 +336,13 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
                 expected_model_number=self.HeartRateSensor.ant_config.model_number,
             )
         else:
-            self._do_request_for_ack_but_expect_no_response(page_type, transmit_no)
+            self._validate_no_response_for_ack_request(result)
 
     @balder.parametrize_by_feature(
         'transmit_no', (HeartRateSensor, 'test_criteria', 'request_transmission_numbers_for_ack')
     )
-    def test_ack_page_6_capabilities(self, transmit_no: int):
+    @dump_flight_recorder_on_failure
+    def test_ack_page_6_capabilities(self, request_sweep_results, transmit_no: int):
         """
         Test that validates the correct behavior, when the controller ask for a ACK message of
         :class:`Hrm6CapabilitiesPage`. The test validates that the DUT answers the correct count of requested
@@ -376,25 +357,28 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
 
         If the test expects a response it will also validate the content of the messages.
 
+        :param request_sweep_results: FIXTURE value with the results of all page requests of this scenario
         :param transmit_no: PARAMETRIZED value describing the requested times the message should be sent
         """
         page_type = pages.hrm.Hrm6CapabilitiesPage
+        result = request_sweep_results[(page_type, transmit_no)]
 
         if page_type in self.HeartRateSensor.ant_config.manual_request_possible_for:
             if self.HeartRateSensor.ant_config.manual_request_redirect_ack_as_broadcast:
-                __response = self._do_request_for_ack_but_expect_brdcst_response(page_type, transmit_no)
+                __response = self._validate_brdcst_response_for_ack_request(result)
             else:
-                __response = self._do_request_for_ack(page_type, transmit_no)
+                __response = self._validate_ack_response(result)
 
                 # TODO validate message content
                 raise NotImplementedError()
         else:
-            self._do_request_for_ack_but_expect_no_response(page_type, transmit_no)
+            self._validate_no_response_for_ack_request(result)
 
     @balder.parametrize_by_feature(
         'transmit_no', (HeartRateSensor, 'test_criteria', 'request_transmission_numbers_for_ack')
     )
-    def test_ack_page_7_battery(self, transmit_no: int):
+    @dump_flight_recorder_on_failure
+    def test_ack_page_7_battery(self, request_sweep_results, transmit_no: int):
         """
         Test that validates the correct behavior, when the controller ask for a ACK message of
         :class:`Hrm7BatteryStatusPage`. The test validates that the DUT answers the correct count of requested
@@ -409,15 +393,17 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
 
         If the test expects a response it will also validate the content of the messages.
 
+        :param request_sweep_results: FIXTURE value with the results of all page requests of this scenario
         :param transmit_no: PARAMETRIZED value describing the requested times the message should be sent
         """
         page_type = pages.hrm.Hrm7BatteryStatusPage
+        result = request_sweep_results[(page_type, transmit_no)]
 
         if page_type in self.HeartRateSensor.ant_config.manual_request_possible_for:
             if self.HeartRateSensor.ant_config.manual_request_redirect_ack_as_broadcast:
-                response = self._do_request_for_ack_but_expect_brdcst_response(page_type, transmit_no)
+                response = self._validate_brdcst_response_for_ack_request(result)
             else:
-                response = self._do_request_for_ack(page_type, transmit_no)
+                response = self._validate_ack_response(result)
 
             expected_bat_voltage = \
                 self.BatterySimulator.sim.discharge_characteristic.get_voltage_for(self.DO_WITH_BATTERY_LEVEL) \
@@ -432,12 +418,13 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
                 expected_battery_voltage=expected_bat_voltage,
             )
         else:
-            self._do_request_for_ack_but_expect_no_response(page_type, transmit_no)
+            self._validate_no_response_for_ack_request(result)
 
     @balder.parametrize_by_feature(
         'transmit_no', (HeartRateSensor, 'test_criteria', 'request_transmission_numbers_for_ack')
     )
-    def test_ack_page_9_device_info(self, transmit_no: int):
+    @dump_flight_recorder_on_failure
+    def test_ack_page_9_device_info(self, request_sweep_results, transmit_no: int):
         """
         Test that validates the correct behavior, when the controller ask for a ACK message of
         :class:`Hrm9DeviceInformationPage`. The test validates that the DUT answers the correct count of requested
@@ -452,18 +439,20 @@ class ScenarioManualRequestForAck(BaseHrmScenario):
 
         If the test expects a response it will also validate the content of the messages.
 
+        :param request_sweep_results: FIXTURE value with the results of all page requests of this scenario
         :param transmit_no: PARAMETRIZED value describing the requested times the message should be sent
         """
         page_type = pages.hrm.Hrm9DeviceInformationPage
+        result = request_sweep_results[(page_type, transmit_no)]
 
         if page_type in self.HeartRateSensor.ant_config.manual_request_possible_for:
             if self.HeartRateSensor.ant_config.manual_request_redirect_ack_as_broadcast:
-                response = self._do_request_for_ack_but_expect_brdcst_response(page_type, transmit_no)
+                response = self._validate_brdcst_response_for_ack_request(result)
             else:
-                response = self._do_request_for_ack(page_type, transmit_no)
+                response = self._validate_ack_response(result)
 
             page_type.validate_messages(
                 of_msg_collection=response,
             )
         else:
-            self._do_request_for_ack_but_expect_no_response(page_type, transmit_no)
+            self._validate_no_response_for_ack_request(result)
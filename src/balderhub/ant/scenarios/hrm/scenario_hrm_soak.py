@@ -0,0 +1,226 @@
+import logging
+
+import balder
+from balder.connections import DCPowerConnection
+
+import balderhub.battery.lib.scenario_features
+from balderhub.heart.lib.scenario_features import HeartBeatFeature, StrapDockingFeature
+
+from .base_hrm_scenario import BaseHrmScenario, dump_flight_recorder_on_failure
+from ...lib.utils.streaming_validation import BackgroundPageCadenceValidator, BaseStreamingValidator, \
+    BeatCountContinuityValidator, HeartBeatEventTimeValidator, PacketLossValidator, RssiValidator, \
+    StreamingValidationRunner
+
+logger = logging.getLogger(__name__)
+
+
+class ScenarioHrmSoak(BaseHrmScenario):
+    """
+    Test scenario that keeps the ANT channel open for hours (see :meth:`AntplusTestCriteriaConfig.soak_duration_sec`)
+    and validates the stability of the HRM device while the messages are received. All checks are executed as streaming
+    validators (see :class:`StreamingValidationRunner`), so that the memory usage of the validation does not grow with
+    the duration of the session. A summary of all validators is logged periodically (see
+    :meth:`AntplusTestCriteriaConfig.soak_summary_interval_sec`) and the session stops early with the first violation.
+
+    The scenario is not exported by :mod:`balderhub.ant.scenarios.hrm`, so that it only runs if it is activated
+    explicitly with ``from balderhub.ant.scenarios.hrm.scenario_hrm_soak import ScenarioHrmSoak``.
+
+    .. note::
+        The controller keeps all received messages of the session, as long as it does not define a
+        :meth:`AntplusControllerFeature.retention_policy`. Make sure to define one for multi-hour sessions.
+    """
+
+    #: the interval in seconds the received messages are consumed and checked for violations
+    CHECK_INTERVAL_SEC = 1.
+
+    DO_WITH_HEART_RATE = 60
+
+    DO_WITH_BATTERY_LEVEL = 1.0
+
+    class Heart(balder.Device):
+        """heart beat simulating device"""
+        heart = HeartBeatFeature()
+
+    @balder.connect('HeartRateSensor', over_connection=DCPowerConnection)
+    class BatterySimulator(balder.Device):
+        """device manipulating the battery voltage"""
+        sim = balderhub.battery.lib.scenario_features.RemovableBatterySimFeature()
+
+    @balder.connect(Heart, over_connection=balder.Connection)  # pylint: disable=undefined-variable
+    class HeartRateSensor(BaseHrmScenario.HeartRateSensor):
+        """device detecting the row heart rate"""
+        strap = StrapDockingFeature()
+
+    @balder.connect(HeartRateSensor, over_connection=balder.Connection)  # pylint: disable=undefined-variable
+    class HeartRateHost(BaseHrmScenario.HeartRateHost):
+        """device receiving the heart rate data"""
+
+    def create_validation_runner(self) -> StreamingValidationRunner:
+        """
+        :return: returns a new runner with all validators that are executed within the soak session
+        """
+        criteria = self.HeartRateSensor.test_criteria
+        channel_period_sec = self.HeartRateHost.controller.channel_period / 32768
+        allowed_min_rr_sec, allowed_max_rr_sec = criteria.get_allowed_min_max_rr_value_for(60 / self.DO_WITH_HEART_RATE)
+        return StreamingValidationRunner(
+            [
+                BeatCountContinuityValidator(),
+                HeartBeatEventTimeValidator(
+                    allowed_min_rr_sec,
+                    allowed_max_rr_sec,
+                    number_of_beats_to_skip=criteria.first_number_of_beats_to_skip
+                ),
+                PacketLossValidator(criteria.allowed_packet_loss_percent),
+                RssiValidator(criteria.min_rssi_dbm, channel_period_sec),
+                BackgroundPageCadenceValidator(
+                    self.HeartRateHost.controller.get_transmission_pattern(),
+                    channel_period_sec
+                ),
+            ],
+            channel_period_sec=channel_period_sec
+        )
+
+    @staticmethod
+    def _log_summary(runner: StreamingValidationRunner, observed_sec: float) -> None:
+        logger.info(f'soak session summary after {observed_sec:.0f} seconds: {runner}')
+        for name, summary in runner.get_summary().items():
+            logger.info(f'  - {name}: {summary}')
+
+    @balder.fixture('variation')
+    def heart_beat_established(self):
+        """make sure that heart beat is established, before entering the variation"""
+        yield from self.Heart.heart.fixt_make_sure_heart_beat_established(
+            with_bpm=self.DO_WITH_HEART_RATE,
+            restore_entry_state=True
+        )
+
+    @balder.fixture('variation')
+    def chest_strap_attached(self, heart_beat_established):  # pylint: disable=unused-argument
+        """make sure that chest strap is attached, before entering the variation"""
+        yield from self.HeartRateSensor.strap.fixt_make_sure_to_be_attached(restore_entry_state=True)
+
+    @balder.fixture('variation')
+    def device_powered_on(self, heart_beat_established, chest_strap_attached):  # pylint: disable=unused-argument
+        """make sure that device is powered on, before entering the variation"""
+        yield from self.BatterySimulator.sim.fixt_make_sure_device_is_powered_on(
+            with_level=self.DO_WITH_BATTERY_LEVEL,
+            restore_entry_state=True
+        )
+
+    @balder.fixture('variation')
+    def ant_is_disconnected(self, device_powered_on):  # pylint: disable=unused-argument
+        """make sure that ANT is disconnected, before entering the variation"""
+        yield from self.HeartRateHost.controller.fixt_make_sure_ant_channel_is_closed()
+
+    @balder.fixture('variation')
+    def soak_session(self, ant_is_disconnected):  # pylint: disable=unused-argument
+        """
+        fixture that runs the soak session - the received messages are validated while they are received, the session
+        stops early as soon as one validator detects a violation
+
+        :return: the :class:`StreamingValidationRunner` holding the results of all validators
+        """
+        controller = self.HeartRateHost.controller
+        soak_duration_sec = self.HeartRateSensor.test_criteria.soak_duration_sec
+        summary_interval_sec = self.HeartRateSensor.test_criteria.soak_summary_interval_sec
+
+        if controller.retention_policy is None:
+            logger.warning('controller does not define a retention policy - all messages of the soak session are kept '
+                           'in memory')
+
+        runner = self.create_validation_runner()
+        controller.session.register_broadcast_message_callback(runner.update)
+
+        logger.info(f'set heart beat to {self.DO_WITH_HEART_RATE}')
+        self.Heart.heart.start(self.DO_WITH_HEART_RATE)
+
+        logger.info(f'connect with ANT device and observe the channel for {soak_duration_sec:.0f} seconds')
+        controller.open_channel()
+        observed_sec = 0.
+        next_summary_sec = summary_interval_sec
+        try:
+            while observed_sec < soak_duration_sec:
+                time_to_wait = min(self.CHECK_INTERVAL_SEC, soak_duration_sec - observed_sec)
+                controller.observe_channel(time_to_wait)
+                observed_sec += time_to_wait
+                # consume all messages that were received in the meantime - this executes the validators
+                _ = controller.received_broadcast_messages
+                if runner.is_violated:
+                    logger.error(f'stop soak session after {observed_sec:.0f} seconds because of violation: '
+                                 f'{runner.violations[0]}')
+                    break
+                if observed_sec >= next_summary_sec:
+                    self._log_summary(runner, observed_sec)
+                    next_summary_sec += summary_interval_sec
+        finally:
+            logger.info('close ANT device channel')
+            controller.close_channel()
+            controller.session.unregister_broadcast_message_callback(runner.update)
+
+            logger.info('stop heart beat')
+            self.Heart.heart.stop()
+        self._log_summary(runner, observed_sec)
+
+        yield runner
+
+    @staticmethod
+    def _assert_no_violation(validator: BaseStreamingValidator):
+        assert validator.violation_count == 0, \
+            (f"{validator.name} detects {validator.violation_count} violations (first one: "
+             f"{validator.first_violation})")
+
+    @dump_flight_recorder_on_failure
+    def test_session_duration(self, soak_session: StreamingValidationRunner):
+        """
+        This test makes sure that the channel was observed for the whole soak duration, without stopping early
+        because of a violation.
+        """
+        soak_duration_sec = self.HeartRateSensor.test_criteria.soak_duration_sec
+        assert soak_session.received_count > 0, "did not receive any messages"
+        assert not soak_session.is_violated, \
+            (f"soak session was stopped early after {soak_session.duration_sec:.0f} of {soak_duration_sec:.0f} "
+             f"seconds because of the violations: {soak_session.violations}")
+
+    @dump_flight_recorder_on_failure
+    def test_beat_count_continuity(self, soak_session: StreamingValidationRunner):
+        """
+        This test makes sure that no heart beat got lost during the soak session (except the ones that were lost
+        together with the messages).
+        """
+        validator = soak_session.get_validator(BeatCountContinuityValidator)
+        assert validator.beat_count > 0, "did not receive any heart beats"
+        self._assert_no_violation(validator)
+
+    @dump_flight_recorder_on_failure
+    def test_heart_beat_event_time_cadence(self, soak_session: StreamingValidationRunner):
+        """
+        This test makes sure that the heart beat event times matched the set heart rate during the soak session.
+        """
+        self._assert_no_violation(soak_session.get_validator(HeartBeatEventTimeValidator))
+
+    @dump_flight_recorder_on_failure
+    def test_packet_loss(self, soak_session: StreamingValidationRunner):
+        """
+        This test makes sure that the packet loss of the soak session is within the allowed range.
+        """
+        self._assert_no_violation(soak_session.get_validator(PacketLossValidator))
+
+    @dump_flight_recorder_on_failure
+    def test_rssi(self, soak_session: StreamingValidationRunner):
+        """
+        This test makes sure that the RSSI of the received messages did not get marginal during the soak session.
+        """
+        validator = soak_session.get_validator(RssiValidator)
+        if validator.monitor.rssi_count == 0:
+            logger.warning('controller does not provide any RSSI values - skip validation of the RSSI')
+        self._assert_no_violation(validator)
+
+    @dump_flight_recorder_on_failure
+    def test_background_page_cadence(self, soak_session: StreamingValidationRunner):
+        """
+        This test makes sure that the background pages were sent according to the expected transmission pattern
+        during the soak session.
+        """
+        validator = soak_session.get_validator(BackgroundPageCadenceValidator)
+        assert validator.background_page_count > 0, "did not receive any background pages"
+        self._assert_no_violation(validator)